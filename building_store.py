@@ -0,0 +1,171 @@
+"""
+Building Store
+Compiled on-disk columnar store of the building set: ragged coordinate arrays, offsets,
+floor area and bounds saved as separate .npy files and memory-mapped on open, so a new
+process gets the buildings without downloading, parsing or reprojecting them and several
+worker processes share the same pages
+"""
+
+import json
+import numpy as np
+import geopandas as gpd
+import shapely
+from pathlib import Path
+
+from geoclass import LayerIndex
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+DEFAULT_STORE_DIR = 'Data/building_store'
+STORE_VERSION = 1
+
+def compile_building_store(buildings, store_dir=DEFAULT_STORE_DIR, columns=('M2_PL_TOT',), spatial_order=True):
+    """
+    Write a building GeoDataFrame to a memory-mappable store.
+
+    Parameters:
+    -----------
+    buildings : GeoDataFrame
+        Building data from load_building_data
+    store_dir : str
+        Output directory
+    columns : sequence of str
+        Numeric attribute columns to store (one .npy file each)
+    spatial_order : bool, default True
+        Store buildings in Z-order, so contiguous ranges are compact spatial
+        partitions (see partitioning)
+
+    Returns:
+    --------
+    Path
+        Store directory
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    if buildings.crs != CRS_PARIS:
+        buildings = buildings.to_crs(CRS_PARIS)
+    if spatial_order:
+        from partitioning import spatial_order as z_order
+        buildings = buildings.iloc[z_order(shapely.bounds(buildings.geometry.values))]
+
+    # Mixed Polygon/MultiPolygon sets are promoted to MultiPolygon
+    geom_type, coords, offsets = shapely.to_ragged_array(buildings.geometry.values)
+    np.save(store_dir / 'coords.npy', coords)
+    for level, offset in enumerate(offsets):
+        np.save(store_dir / f'offsets_{level}.npy', offset)
+    np.save(store_dir / 'bounds.npy', shapely.bounds(buildings.geometry.values))
+    for column in columns:
+        np.save(store_dir / f'{column}.npy', buildings[column].to_numpy(dtype=np.float64))
+
+    meta = {
+        'version': STORE_VERSION,
+        'count': len(buildings),
+        'crs': CRS_PARIS,
+        'geometry_type': int(geom_type),
+        'offset_levels': len(offsets),
+        'columns': list(columns),
+        'spatial_order': bool(spatial_order),
+    }
+    with open(store_dir / 'meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Compiled {len(buildings)} buildings into {store_dir} ({len(coords)} vertices)")
+    return store_dir
+
+class BuildingStore:
+    """
+    Read-only view of a compiled building store.
+
+    Every array is memory-mapped: opening is near-instant and costs no private
+    memory; geometries are only materialized (for a slice or the whole set) when
+    requested.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        """
+        Parameters:
+        -----------
+        store_dir : str
+            Directory written by compile_building_store
+        """
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / 'meta.json') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported building store version in {self.store_dir}")
+
+        self.crs = self.meta['crs']
+        self.geometry_type = shapely.GeometryType(self.meta['geometry_type'])
+        self.coords = np.load(self.store_dir / 'coords.npy', mmap_mode='r')
+        self.offsets = tuple(np.load(self.store_dir / f'offsets_{level}.npy', mmap_mode='r')
+                             for level in range(self.meta['offset_levels']))
+        self.bounds = np.load(self.store_dir / 'bounds.npy', mmap_mode='r')
+        self.columns = {column: np.load(self.store_dir / f'{column}.npy', mmap_mode='r')
+                        for column in self.meta['columns']}
+
+    @staticmethod
+    def exists(store_dir=DEFAULT_STORE_DIR):
+        return (Path(store_dir) / 'meta.json').exists()
+
+    def __len__(self):
+        return self.meta['count']
+
+    def geometries(self, start=0, stop=None):
+        """
+        Materialize the geometries of a contiguous range of buildings.
+
+        Parameters:
+        -----------
+        start, stop : int
+            Building range (default: all buildings)
+
+        Returns:
+        --------
+        ndarray of shapely geometries
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        # Offsets are ordered innermost first: walk them from the geometry level down
+        lo, hi = start, stop
+        sliced = []
+        for offset in reversed(self.offsets):
+            window = np.asarray(offset[lo:hi + 1])
+            sliced.append(window - window[0])
+            lo, hi = int(window[0]), int(window[-1])
+        coords = np.asarray(self.coords[lo:hi])
+        return shapely.from_ragged_array(self.geometry_type, coords, tuple(reversed(sliced)))
+
+    def vertex_counts(self):
+        """
+        Number of coordinates of each building, read from the offsets only.
+
+        Returns:
+        --------
+        ndarray of int
+        """
+        # Map each building's first/last offset down to coordinate positions
+        positions = np.asarray(self.offsets[-1])
+        for offset in reversed(self.offsets[:-1]):
+            positions = np.asarray(offset)[positions]
+        return np.diff(positions)
+
+    def to_geodataframe(self, start=0, stop=None):
+        """
+        Building GeoDataFrame equivalent to load_building_data (stored columns only).
+
+        Returns:
+        --------
+        GeoDataFrame
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        data = {column: np.asarray(values[start:stop]) for column, values in self.columns.items()}
+        return gpd.GeoDataFrame(data, geometry=self.geometries(start, stop), crs=self.crs)
+
+    def index(self):
+        """
+        LayerIndex over all buildings, reusing the stored bounds.
+
+        Returns:
+        --------
+        LayerIndex
+        """
+        return LayerIndex(self.geometries(), crs=self.crs, bounds=np.asarray(self.bounds))
@@ -0,0 +1,463 @@
+"""
+Warm Worker Daemon
+Long-running local server that keeps the geographic layers, building data, non-buildable
+masks and spatial indexes in memory and serves density tables, point lookups, polygon
+densities and map renders over localhost HTTP (JSON), with a client and a reload command
+for data refreshes
+
+    python daemon.py serve --levels arrondissements iris
+    python daemon.py status
+    python daemon.py reload
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urlerror, request as urlrequest
+
+# Constants
+DEFAULT_HOST = '127.0.0.1'  # local only: the daemon has no authentication
+DEFAULT_PORT = 8765
+
+class WarmState:
+    """
+    Inputs and derived structures held by the daemon.
+
+    Everything is loaded once by load() and reused by every request; a lock
+    serializes computations and reloads, so a reload never swaps data under a
+    running request.
+    """
+
+    def __init__(self, levels=None, variants=None, cache_dir=None, memory_budget_mb=None, store_dir=None,
+                 component_overlaps=False):
+        """
+        Parameters:
+        -----------
+        levels, variants : list of str, optional
+            Levels and density variants kept warm (default: all)
+        cache_dir : str, optional
+            On-disk cache of the geographic layers (see GeoDataParis)
+        memory_budget_mb : float, optional
+            Serve densities from the building store, aggregated out-of-core
+        store_dir : str, optional
+            Building store directory (default: building_store.DEFAULT_STORE_DIR)
+        component_overlaps : bool
+            Compute buildable areas from per-component overlap matrices
+        """
+        self.levels = levels
+        self.variants = variants
+        self.cache_dir = cache_dir
+        self.memory_budget_mb = memory_budget_mb
+        self.store_dir = store_dir
+        self.component_overlaps = component_overlaps
+        self.lock = threading.RLock()
+        self.started_at = time.time()
+        self.loaded_at = None
+        self.reloads = 0
+
+    def load(self):
+        """(Re)load every input and build the spatial indexes."""
+        from building_store import DEFAULT_STORE_DIR
+        from extract_density_dataframes import plan_inputs, load_inputs
+        from geoclass import GeoDataParis
+
+        with self.lock:
+            self._clear_caches()
+            start = time.perf_counter()
+            # Maps are planned so the overlay masks are loaded as well
+            self.plan = plan_inputs(self.levels, self.variants, maps=True)
+            self.inputs = load_inputs(self.plan, geo=GeoDataParis(self.cache_dir),
+                                      memory_budget_mb=self.memory_budget_mb,
+                                      store_dir=self.store_dir or DEFAULT_STORE_DIR,
+                                      component_overlaps=self.component_overlaps)
+            for level in self.plan['levels']:
+                self.inputs['geo'].get_index(level)
+            self.tables = {}
+            self.locator = None
+            self.polygon_engine = None
+            self.loaded_at = time.time()
+            print(f"Daemon inputs loaded in {time.perf_counter() - start:.1f}s")
+
+    def reload(self):
+        """Drop everything and load the inputs again (after a data refresh)."""
+        with self.lock:
+            self.reloads += 1
+            self.load()
+
+    @staticmethod
+    def _clear_caches():
+        import geoclass
+        import incidence
+        geoclass.clear_caches()
+        incidence.clear_caches()
+
+    def status(self):
+        geo = self.inputs['geo'] if self.loaded_at else None
+        buildings = self.inputs.get('buildings') if self.loaded_at else None
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'levels': self.plan['levels'] if self.loaded_at else [],
+            'variants': self.plan['variants'] if self.loaded_at else [],
+            'layers': geo.list_available_data() if geo is not None else [],
+            'buildings': len(buildings) if buildings is not None else 0,
+            'cached_tables': [level for level, _ in self.tables] if self.loaded_at else [],
+        }
+
+    def _check_level(self, level):
+        if level not in self.plan['levels']:
+            raise ValueError(f"Level '{level}' is not loaded (available: {self.plan['levels']})")
+
+    def _variants(self, variants):
+        variants = list(variants) if variants else list(self.plan['variants'])
+        unknown = [variant for variant in variants if variant not in self.plan['variants']]
+        if unknown:
+            raise ValueError(f"Variants {unknown} are not loaded (available: {self.plan['variants']})")
+        return variants
+
+    def density(self, level, variants=None):
+        """
+        Density table of one level (computed once per level and variants).
+
+        Returns:
+        --------
+        GeoDataFrame
+        """
+        from extract_density_dataframes import create_level_dataframe, DEFAULT_MEMORY_BUDGET_MB
+
+        self._check_level(level)
+        variants = self._variants(variants)
+        key = (level, tuple(variants))
+        with self.lock:
+            if key not in self.tables:
+                self.tables[key] = create_level_dataframe(
+                    level, geo=self.inputs['geo'], buildings=self.inputs['buildings'],
+                    non_buildable=self.inputs['non_buildable'], all_non_buildable=self.inputs['all_non_buildable'],
+                    variants=variants, memory_budget_mb=self.memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB,
+                    components=self.inputs['components'])
+            return self.tables[key]
+
+    def lookup(self, x, y, crs='EPSG:4326'):
+        """
+        Zones and density metrics of points, over every loaded level.
+
+        Returns:
+        --------
+        DataFrame
+        """
+        from zonelocator import ZoneLocator
+
+        with self.lock:
+            if self.locator is None:
+                tables = {level: self.density(level) for level in self.plan['levels']}
+                self.locator = ZoneLocator(geo=self.inputs['geo'], density_tables=tables,
+                                           levels=self.plan['levels'])
+            return self.locator.locate_batch(x, y, crs=crs)
+
+    def polygon_density(self, feature_collection, crs='EPSG:4326', method='intersects'):
+        """
+        Densities inside arbitrary polygons given as a GeoJSON FeatureCollection.
+
+        Returns:
+        --------
+        GeoDataFrame
+        """
+        import geopandas as gpd
+        from building_store import BuildingStore
+        from polygon_density import PolygonDensityEngine
+
+        polygons = gpd.GeoDataFrame.from_features(feature_collection['features'], crs=crs)
+        with self.lock:
+            if self.polygon_engine is None:
+                buildings = self.inputs['buildings']
+                if isinstance(buildings, BuildingStore):
+                    buildings = buildings.to_geodataframe()
+                self.polygon_engine = PolygonDensityEngine(buildings, self.inputs['non_buildable'],
+                                                           self.inputs['all_non_buildable'])
+            return self.polygon_engine.compute(polygons, method=method)
+
+    def render(self, level, variants=None):
+        """
+        Render the density maps of one level.
+
+        Returns:
+        --------
+        list of str
+            Rendered variants
+        """
+        from decoupagegeo import render_density_maps
+
+        variants = self._variants(variants)
+        with self.lock:
+            table = self.density(level, variants)
+            maps = render_density_maps(table, self.inputs['geo'].get_layer(level), level, variants,
+                                       non_buildable=self.inputs['non_buildable'],
+                                       all_non_buildable=self.inputs['all_non_buildable'],
+                                       green_spaces=self.inputs['green_spaces'])
+            return list(maps)
+
+def _records(df):
+    """JSON records of a (Geo)DataFrame, without geometry."""
+    geometry = getattr(df, '_geometry_column_name', None)
+    if geometry is not None:
+        df = df.drop(columns=[geometry])
+    return json.loads(df.to_json(orient='records'))
+
+def _allowed_hosts(host, port):
+    """Host header values accepted by a daemon bound to host:port (guards against DNS rebinding)."""
+    names = {host}
+    if host in ('127.0.0.1', '::1', 'localhost'):
+        names |= {'127.0.0.1', '[::1]', 'localhost'}
+    return {f"{name}:{port}" for name in names} | names
+
+def _resolve_output_dir(root, requested):
+    """
+    Directory a density table may be saved to: the daemon's output directory or one of its subdirectories.
+
+    Raises:
+    -------
+    PermissionError
+        If the daemon has no output directory or the path escapes it
+    """
+    if root is None:
+        raise PermissionError("Saving is disabled (start the daemon with --output-dir)")
+    root = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(root, requested))
+    if os.path.commonpath([root, target]) != root:
+        raise PermissionError(f"Output directory {requested!r} is outside the daemon output directory")
+    return target
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON request handler; the server carries the WarmState, its allowed Host values
+    and the only directory clients may save to.
+    """
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _payload(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _rejected(self, body=False):
+        """Send an error and return True if the request must not be served."""
+        if self.headers.get('Host') not in self.server.allowed_hosts:
+            self._send(403, {'error': f"Unexpected Host header {self.headers.get('Host')!r}"})
+            return True
+        if body and self.headers.get_content_type() != 'application/json':
+            self._send(415, {'error': "Requests must be sent as application/json"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self._rejected():
+            return
+        if self.path == '/status':
+            self._send(200, self.server.state.status())
+        else:
+            self._send(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self._rejected(body=True):
+            return
+        state = self.server.state
+        try:
+            payload = self._payload()
+            if self.path == '/density':
+                output_dir = None
+                if payload.get('output_dir') is not None:
+                    output_dir = _resolve_output_dir(self.server.output_dir, payload['output_dir'])
+                    # Created before the table is computed, so a bad path fails fast
+                    os.makedirs(output_dir, exist_ok=True)
+                table = state.density(payload['level'], payload.get('variants'))
+                if output_dir is not None:
+                    from extract_density_dataframes import save_level_dataframe
+                    save_level_dataframe(table, payload['level'], output_dir,
+                                         payload.get('output_format', 'csv'))
+                result = {'records': _records(table)}
+            elif self.path == '/lookup':
+                result = {'records': _records(state.lookup(payload['x'], payload['y'],
+                                                           payload.get('crs', 'EPSG:4326')))}
+            elif self.path == '/polygon-density':
+                result = {'records': _records(state.polygon_density(payload['features'],
+                                                                    payload.get('crs', 'EPSG:4326'),
+                                                                    payload.get('method', 'intersects')))}
+            elif self.path == '/render':
+                result = {'rendered': state.render(payload['level'], payload.get('variants'))}
+            elif self.path == '/reload':
+                state.reload()
+                result = state.status()
+            elif self.path == '/shutdown':
+                # shutdown() waits for serve_forever, so it must run outside this request thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                result = {'shutdown': True}
+            else:
+                self._send(404, {'error': f"Unknown endpoint {self.path}"})
+                return
+        except PermissionError as e:
+            self._send(403, {'error': str(e)})
+            return
+        except (KeyError, ValueError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        except Exception as e:  # keep the daemon alive, report to the client
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        self._send(200, result)
+
+    def log_message(self, format, *args):
+        print(f"  [{self.log_date_time_string()}] {format % args}")
+
+def serve(state, host=DEFAULT_HOST, port=DEFAULT_PORT, output_dir=None):
+    """
+    Load the inputs and serve requests until a shutdown request.
+
+    Parameters:
+    -----------
+    state : WarmState
+        Inputs to keep warm (loaded here)
+    host, port :
+        Listening address (localhost by default)
+    output_dir : str, optional
+        Directory density tables may be saved to; clients can only name it or one
+        of its subdirectories (saving is refused when None)
+    """
+    state.load()
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.state = state
+    server.allowed_hosts = _allowed_hosts(host, server.server_address[1])
+    server.output_dir = output_dir
+    print(f"Daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        print("Daemon stopped")
+
+class DaemonClient:
+    """
+    Client of a running daemon.
+
+        client = DaemonClient()
+        iris = client.density('iris', variants=['raw', 'corrected'])
+        client.reload()
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=3600):
+        """
+        Parameters:
+        -----------
+        host, port :
+            Daemon address
+        timeout : float
+            Request timeout in seconds (first requests may compute whole levels)
+        """
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+
+    def _call(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        req = urlrequest.Request(self.base_url + path, data=data, method='GET' if data is None else 'POST',
+                                 headers={'Content-Type': 'application/json'})
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urlerror.HTTPError as e:
+            message = json.loads(e.read() or b'{}').get('error', e.reason)
+            raise RuntimeError(f"Daemon error ({e.code}): {message}") from None
+
+    def status(self):
+        """Loaded levels, layers, building count, uptime and reload count."""
+        return self._call('/status')
+
+    def density(self, level, variants=None, output_dir=None, output_format='csv'):
+        """
+        Density table of one level (optionally also saved by the daemon).
+
+        Parameters:
+        -----------
+        output_dir : str, optional
+            Save the table there, relative to the daemon's --output-dir ('.' for the
+            directory itself)
+
+        Returns:
+        --------
+        DataFrame
+        """
+        import pandas as pd
+        payload = {'level': level, 'variants': variants, 'output_dir': output_dir, 'output_format': output_format}
+        return pd.DataFrame(self._call('/density', payload)['records'])
+
+    def lookup(self, x, y, crs='EPSG:4326'):
+        """
+        Zones and density metrics of points (see ZoneLocator.locate_batch).
+
+        Returns:
+        --------
+        DataFrame
+        """
+        import numpy as np
+        import pandas as pd
+        payload = {'x': np.atleast_1d(x).tolist(), 'y': np.atleast_1d(y).tolist(), 'crs': crs}
+        return pd.DataFrame(self._call('/lookup', payload)['records'])
+
+    def polygon_density(self, polygons_gdf, method='intersects'):
+        """
+        Densities inside arbitrary polygons (see PolygonDensityEngine.compute).
+
+        Returns:
+        --------
+        DataFrame
+        """
+        import pandas as pd
+        payload = {'features': json.loads(polygons_gdf.to_crs('EPSG:4326').to_json()), 'crs': 'EPSG:4326',
+                   'method': method}
+        return pd.DataFrame(self._call('/polygon-density', payload)['records'])
+
+    def render(self, level, variants=None):
+        """Render the density maps of one level; returns the rendered variants."""
+        return self._call('/render', {'level': level, 'variants': variants})['rendered']
+
+    def reload(self):
+        """Reload every input in the daemon (after a data refresh)."""
+        return self._call('/reload', {})
+
+    def shutdown(self):
+        """Stop the daemon."""
+        return self._call('/shutdown', {})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm worker daemon for the Paris density pipeline")
+    parser.add_argument('command', choices=['serve', 'status', 'reload', 'shutdown'])
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Listening/daemon address")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Listening/daemon port")
+    parser.add_argument('--levels', nargs='+', default=None, help="Levels kept warm (serve)")
+    parser.add_argument('--variants', nargs='+', default=None, help="Density variants kept warm (serve)")
+    parser.add_argument('--cache-dir', default=None, help="On-disk cache of the geographic layers (serve)")
+    parser.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                        help="Aggregate buildings out-of-core from the building store (serve)")
+    parser.add_argument('--store-dir', default=None, help="Building store directory (serve)")
+    parser.add_argument('--component-overlaps', action='store_true',
+                        help="Compute buildable areas from per-component overlap matrices (serve)")
+    parser.add_argument('--output-dir', default=None,
+                        help="Only directory clients may save density tables to (serve)")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(WarmState(levels=args.levels, variants=args.variants, cache_dir=args.cache_dir,
+                        memory_budget_mb=args.memory_budget, store_dir=args.store_dir,
+                        component_overlaps=args.component_overlaps),
+              host=args.host, port=args.port, output_dir=args.output_dir)
+    else:
+        client = DaemonClient(args.host, args.port)
+        print(json.dumps(getattr(client, args.command)(), indent=2))
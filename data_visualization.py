@@ -5,17 +5,50 @@ Creates comprehensive statistical visualizations and analysis from extracted dat
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import hashlib
+import json
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style for all plots
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
-plt.rcParams['figure.dpi'] = 100
-plt.rcParams['savefig.dpi'] = 300
+# matplotlib and seaborn are imported (and styled) on first use, so importing this
+# module, or running only the data-processing steps, stays fast
+_plot_modules = {}
+
+def _pyplot():
+    """
+    Import pyplot and apply the plot style on first use
+    """
+    if 'plt' not in _plot_modules:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Set style for all plots
+        plt.style.use('seaborn-v0_8')
+        sns.set_palette("husl")
+        plt.rcParams['figure.dpi'] = 100
+        plt.rcParams['savefig.dpi'] = 300
+        _plot_modules['plt'] = plt
+        _plot_modules['sns'] = sns
+    return _plot_modules['plt']
+
+def _seaborn():
+    """
+    Import seaborn (with the plot style applied) on first use
+    """
+    _pyplot()
+    return _plot_modules['sns']
+
+# Output settings: publication quality by default, 'draft' for quick previews
+DEFAULT_DPI = 300
+DEFAULT_FORMAT = 'png'
+DRAFT_DPI = 100
+
+# Bump to invalidate every cached figure when the plotting code changes
+PLOT_CACHE_VERSION = 1
 
 def load_dataframes():
     """
@@ -30,26 +63,85 @@ def load_dataframes():
     print(f"Loaded: Arrondissements ({arr_df.shape[0]} zones), Quartiers ({quartiers_df.shape[0]} zones), IRIS ({iris_df.shape[0]} zones)")
     return arr_df, quartiers_df, iris_df
 
-def create_density_distributions(df, level_name, save_dir="plots"):
+def plot_fingerprint(data, name, **params):
     """
-    Create density distribution plots for a geographic level
+    Fingerprint the data slice and parameters a figure is rendered from.
+
+    Parameters:
+    -----------
+    data : DataFrame or list of DataFrame
+        Exact input slice of the figure
+    name : str
+        Output name of the figure
+    **params :
+        Rendering parameters (dpi, format, counts...)
+
+    Returns:
+    --------
+    str
+        Hex digest
+    """
+    frames = data if isinstance(data, (list, tuple)) else [data]
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'version': PLOT_CACHE_VERSION, 'name': name, **params},
+                             sort_keys=True, default=str).encode())
+    for frame in frames:
+        digest.update(json.dumps([str(col) for col in frame.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+    return digest.hexdigest()
+
+def _fingerprint_path(path):
+    return f"{path}.fingerprint"
+
+def cached_figure(save_dir, name, fmt, fingerprint, force=False):
+    """
+    Return the output path if it was already rendered from the same fingerprint, else None
+    """
+    path = f"{save_dir}/{name}.{fmt}"
+    if force or not os.path.exists(path) or not os.path.exists(_fingerprint_path(path)):
+        return None
+    with open(_fingerprint_path(path)) as f:
+        if f.read().strip() != fingerprint:
+            return None
+    print(f"  Up to date, skipping {path}")
+    return path
+
+def save_figure(fig, save_dir, name, dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, fingerprint=None):
+    """
+    Save and close a figure as {save_dir}/{name}.{fmt}, recording its fingerprint next to it
+    """
+    path = f"{save_dir}/{name}.{fmt}"
+    fig.savefig(path, dpi=dpi, format=fmt, bbox_inches='tight')
+    plt = _pyplot()
+    plt.close(fig)
+    if fingerprint is not None:
+        with open(_fingerprint_path(path), 'w') as f:
+            f.write(fingerprint)
+    return path
+
+def _ultra_density_column(df):
+    """
+    Return the density column used for distribution plots (ultra-corrected when available)
     """
-    Path(save_dir).mkdir(exist_ok=True)
-
-    print(f"Creating density distributions for {level_name}...")
-
-    # Prepare data for plotting
     density_cols = [col for col in df.columns if 'density_m2_m2_' in col and 'ultra' in col]
     if not density_cols:
         density_cols = [col for col in df.columns if 'density_m2_m2_' in col]
+    return density_cols[0] if density_cols else None
 
-    if not density_cols:
-        print(f"No density columns found for {level_name}")
-        return
+def plot_density_histogram(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Overall density histogram with KDE for a geographic level
+    """
+    density_col = _ultra_density_column(df)
 
-    density_col = density_cols[0]  # Use ultra-corrected density
+    name = f"density_histogram_{level_name}"
+    fingerprint = plot_fingerprint(df[[density_col]], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
 
-    # 1. Overall histogram with KDE
+    plt = _pyplot()
+    sns = _seaborn()
     fig, ax = plt.subplots(1, 1, figsize=(12, 8))
     sns.histplot(data=df, x=density_col, bins=30, kde=True, ax=ax, alpha=0.7)
     ax.set_title(f'Building Density Distribution - {level_name.title()}\n(n={len(df)} zones)', fontsize=16, fontweight='bold')
@@ -57,47 +149,88 @@ def create_density_distributions(df, level_name, save_dir="plots"):
     ax.set_ylabel('Frequency', fontsize=12)
     ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/density_histogram_{level_name}.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-    # 2. Box plot
+def plot_density_boxplot(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Density box plot for a geographic level
+    """
+    density_col = _ultra_density_column(df)
+
+    name = f"density_boxplot_{level_name}"
+    fingerprint = plot_fingerprint(df[[density_col]], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
+    sns = _seaborn()
     fig, ax = plt.subplots(1, 1, figsize=(10, 6))
     sns.boxplot(data=df, y=density_col, ax=ax, color='skyblue', width=0.4)
     ax.set_title(f'Building Density Box Plot - {level_name.title()}', fontsize=14, fontweight='bold')
     ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
     ax.grid(True, alpha=0.3, axis='y')
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/density_boxplot_{level_name}.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-    # 3. Violin plot
+def plot_density_violin(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Density violin plot for a geographic level
+    """
+    density_col = _ultra_density_column(df)
+
+    name = f"density_violin_{level_name}"
+    fingerprint = plot_fingerprint(df[[density_col]], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
+    sns = _seaborn()
     fig, ax = plt.subplots(1, 1, figsize=(10, 6))
     sns.violinplot(data=df, y=density_col, ax=ax, color='lightgreen', inner='quartile')
     ax.set_title(f'Building Density Violin Plot - {level_name.title()}', fontsize=14, fontweight='bold')
     ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
     ax.grid(True, alpha=0.3, axis='y')
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/density_violin_{level_name}.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-def create_area_composition_charts(df, level_name, save_dir="plots"):
+def create_density_distributions(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
     """
-    Create area composition charts (buildable vs excluded areas)
+    Create density distribution plots for a geographic level
     """
     Path(save_dir).mkdir(exist_ok=True)
 
-    print(f"Creating area composition charts for {level_name}...")
+    print(f"Creating density distributions for {level_name}...")
 
-    # Check if we have the required columns
-    if 'buildable_percentage_ultra' not in df.columns or 'excluded_percentage_ultra' not in df.columns:
-        print(f"Missing area composition columns for {level_name}")
+    if _ultra_density_column(df) is None:
+        print(f"No density columns found for {level_name}")
         return
 
+    # 1. Overall histogram with KDE
+    plot_density_histogram(df, level_name, save_dir, dpi, fmt, force)
+
+    # 2. Box plot
+    plot_density_boxplot(df, level_name, save_dir, dpi, fmt, force)
+
+    # 3. Violin plot
+    plot_density_violin(df, level_name, save_dir, dpi, fmt, force)
+
+def plot_area_composition_pie(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Overall buildable vs excluded pie chart for a geographic level
+    """
     # Calculate averages for the level
     avg_buildable = df['buildable_percentage_ultra'].mean()
     avg_excluded = df['excluded_percentage_ultra'].mean()
 
-    # 1. Overall pie chart for the level
+    name = f"area_composition_pie_{level_name}"
+    fingerprint = plot_fingerprint(df[['buildable_percentage_ultra', 'excluded_percentage_ultra']], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
     fig, ax = plt.subplots(1, 1, figsize=(10, 8))
     wedges, texts, autotexts = ax.pie([avg_buildable, avg_excluded],
                                     labels=['Buildable Areas', 'Excluded Areas\n(Water + Rail + Green)'],
@@ -116,10 +249,20 @@ def create_area_composition_charts(df, level_name, save_dir="plots"):
     ax.set_title(f'Area Composition - {level_name.title()}\nAverage Across All Zones (n={len(df)})',
                 fontsize=16, fontweight='bold', pad=20)
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/area_composition_pie_{level_name}.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-    # 2. Buildable percentage distribution
+def plot_buildable_percentage_distribution(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Buildable percentage distribution for a geographic level
+    """
+    name = f"buildable_percentage_dist_{level_name}"
+    fingerprint = plot_fingerprint(df[['buildable_percentage_ultra']], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
+    sns = _seaborn()
     fig, ax = plt.subplots(1, 1, figsize=(12, 8))
     sns.histplot(data=df, x='buildable_percentage_ultra', bins=20, kde=True, ax=ax, color='skyblue')
     ax.set_title(f'Buildable Area Percentage Distribution - {level_name.title()}', fontsize=16, fontweight='bold')
@@ -127,18 +270,31 @@ def create_area_composition_charts(df, level_name, save_dir="plots"):
     ax.set_ylabel('Frequency', fontsize=12)
     ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/buildable_percentage_dist_{level_name}.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-def create_comparative_analysis(arr_df, quartiers_df, iris_df, save_dir="plots"):
+def create_area_composition_charts(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
     """
-    Create comparative analysis plots between geographic levels
+    Create area composition charts (buildable vs excluded areas)
     """
     Path(save_dir).mkdir(exist_ok=True)
 
-    print("Creating comparative analysis plots...")
+    print(f"Creating area composition charts for {level_name}...")
 
-    # Prepare comparison data
+    # Check if we have the required columns
+    if 'buildable_percentage_ultra' not in df.columns or 'excluded_percentage_ultra' not in df.columns:
+        print(f"Missing area composition columns for {level_name}")
+        return
+
+    # 1. Overall pie chart for the level
+    plot_area_composition_pie(df, level_name, save_dir, dpi, fmt, force)
+
+    # 2. Buildable percentage distribution
+    plot_buildable_percentage_distribution(df, level_name, save_dir, dpi, fmt, force)
+
+def _level_comparison_data(arr_df, quartiers_df, iris_df):
+    """
+    Stack the ultra-corrected densities of the three levels into one long dataframe
+    """
     comparison_data = []
 
     # Get density column
@@ -151,48 +307,85 @@ def create_comparative_analysis(arr_df, quartiers_df, iris_df, save_dir="plots")
             temp_df = temp_df.rename(columns={density_col: 'density'})
             comparison_data.append(temp_df)
 
-    if comparison_data:
-        combined_df = pd.concat(comparison_data, ignore_index=True)
+    if not comparison_data:
+        return None
+    return pd.concat(comparison_data, ignore_index=True)
 
-        # 1. Box plot comparison
-        fig, ax = plt.subplots(1, 1, figsize=(12, 8))
-        sns.boxplot(data=combined_df, x='level', y='density', ax=ax,
-                   palette=['#FF6B6B', '#4ECDC4', '#45B7D1'])
-        ax.set_title('Building Density Comparison by Geographic Level', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Geographic Level', fontsize=12)
-        ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
-        ax.grid(True, alpha=0.3, axis='y')
-
-        # Add sample size labels
-        for i, level in enumerate(['arrondissements', 'quartiers', 'iris']):
-            count = len([df for name, df in [('arrondissements', arr_df), ('quartiers', quartiers_df), ('iris', iris_df)] if name == level][0])
-            ax.text(i, ax.get_ylim()[0] - (ax.get_ylim()[1] - ax.get_ylim()[0]) * 0.05,
-                   f'n={count}', ha='center', va='top', fontsize=10, fontweight='bold')
-
-        plt.tight_layout()
-        plt.savefig(f"{save_dir}/density_comparison_levels.png", dpi=300, bbox_inches='tight')
-        plt.close()
+def plot_density_comparison_boxplot(combined_df, level_counts, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Box plot comparison of densities between geographic levels
+    """
+    name = "density_comparison_levels"
+    fingerprint = plot_fingerprint(combined_df, name, dpi=dpi, fmt=fmt, level_counts=level_counts)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
+    sns = _seaborn()
+    fig, ax = plt.subplots(1, 1, figsize=(12, 8))
+    sns.boxplot(data=combined_df, x='level', y='density', ax=ax,
+               palette=['#FF6B6B', '#4ECDC4', '#45B7D1'])
+    ax.set_title('Building Density Comparison by Geographic Level', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Geographic Level', fontsize=12)
+    ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
+    ax.grid(True, alpha=0.3, axis='y')
 
-        # 2. Violin plot comparison
-        fig, ax = plt.subplots(1, 1, figsize=(12, 8))
-        sns.violinplot(data=combined_df, x='level', y='density', ax=ax,
-                      palette=['#FF6B6B', '#4ECDC4', '#45B7D1'], inner='quartile')
-        ax.set_title('Building Density Distribution Comparison by Geographic Level', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Geographic Level', fontsize=12)
-        ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
-        ax.grid(True, alpha=0.3, axis='y')
-        plt.tight_layout()
-        plt.savefig(f"{save_dir}/density_violin_comparison.png", dpi=300, bbox_inches='tight')
-        plt.close()
-
-def create_correlation_analysis(df, level_name, save_dir="plots"):
+    # Add sample size labels
+    for i, level in enumerate(['arrondissements', 'quartiers', 'iris']):
+        count = level_counts[level]
+        ax.text(i, ax.get_ylim()[0] - (ax.get_ylim()[1] - ax.get_ylim()[0]) * 0.05,
+               f'n={count}', ha='center', va='top', fontsize=10, fontweight='bold')
+
+    plt.tight_layout()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
+
+def plot_density_comparison_violin(combined_df, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
     """
-    Create correlation analysis plots for a geographic level
+    Violin plot comparison of densities between geographic levels
+    """
+    name = "density_violin_comparison"
+    fingerprint = plot_fingerprint(combined_df, name, dpi=dpi, fmt=fmt)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
+    sns = _seaborn()
+    fig, ax = plt.subplots(1, 1, figsize=(12, 8))
+    sns.violinplot(data=combined_df, x='level', y='density', ax=ax,
+                  palette=['#FF6B6B', '#4ECDC4', '#45B7D1'], inner='quartile')
+    ax.set_title('Building Density Distribution Comparison by Geographic Level', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Geographic Level', fontsize=12)
+    ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
+    ax.grid(True, alpha=0.3, axis='y')
+    plt.tight_layout()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
+
+def create_comparative_analysis(arr_df, quartiers_df, iris_df, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Create comparative analysis plots between geographic levels
     """
     Path(save_dir).mkdir(exist_ok=True)
 
-    print(f"Creating correlation analysis for {level_name}...")
+    print("Creating comparative analysis plots...")
 
+    # Prepare comparison data
+    combined_df = _level_comparison_data(arr_df, quartiers_df, iris_df)
+
+    if combined_df is not None:
+        level_counts = {'arrondissements': len(arr_df), 'quartiers': len(quartiers_df), 'iris': len(iris_df)}
+
+        # 1. Box plot comparison
+        plot_density_comparison_boxplot(combined_df, level_counts, save_dir, dpi, fmt, force)
+
+        # 2. Violin plot comparison
+        plot_density_comparison_violin(combined_df, save_dir, dpi, fmt, force)
+
+def _correlation_columns(df):
+    """
+    Select the numeric key metric columns used in correlation analysis
+    """
     # Select numeric columns for correlation
     numeric_cols = df.select_dtypes(include=[np.number]).columns
 
@@ -201,56 +394,97 @@ def create_correlation_analysis(df, level_name, save_dir="plots"):
     for col in numeric_cols:
         if any(keyword in col.lower() for keyword in ['density', 'percentage', 'area', 'volume']):
             key_cols.append(col)
+    return key_cols
 
-    if len(key_cols) < 2:
-        print(f"Not enough numeric columns for correlation analysis in {level_name}")
-        return
+def plot_correlation_heatmap(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Correlation heatmap of the key metrics of a geographic level
+    """
+    key_cols = _correlation_columns(df)
+    name = f"correlation_heatmap_{level_name}"
+    fingerprint = plot_fingerprint(df[key_cols], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
 
     # Create correlation matrix
     corr_matrix = df[key_cols].corr()
 
-    # 1. Correlation heatmap
+    plt = _pyplot()
+    sns = _seaborn()
     fig, ax = plt.subplots(1, 1, figsize=(12, 10))
     mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
     sns.heatmap(corr_matrix, mask=mask, annot=True, cmap='coolwarm', center=0,
                 square=True, linewidths=0.5, ax=ax, fmt='.2f', cbar_kws={'shrink': 0.8})
     ax.set_title(f'Correlation Matrix - {level_name.title()}', fontsize=16, fontweight='bold')
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/correlation_heatmap_{level_name}.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-    # 2. Key scatter plots
+def _density_vs_buildable_columns(df):
+    """
+    Return (density_col, buildable_col) for the density vs buildable scatter plot, or None
+    """
+    key_cols = _correlation_columns(df)
     density_col = [col for col in key_cols if 'ultra_corrected' in col and 'density' in col]
-    if density_col:
-        density_col = density_col[0]
-
-        # Density vs Buildable Percentage
-        buildable_col = [col for col in key_cols if 'buildable_percentage_ultra' in col]
-        if buildable_col:
-            fig, ax = plt.subplots(1, 1, figsize=(10, 8))
-            sns.scatterplot(data=df, x=buildable_col[0], y=density_col, ax=ax, s=100, alpha=0.7)
-            ax.set_title(f'Density vs Buildable Area - {level_name.title()}', fontsize=14, fontweight='bold')
-            ax.set_xlabel('Buildable Area Percentage (%)', fontsize=12)
-            ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
-            ax.grid(True, alpha=0.3)
-
-            # Add correlation coefficient
-            corr = df[buildable_col[0]].corr(df[density_col])
-            ax.text(0.05, 0.95, f'Correlation: {corr:.3f}',
-                   transform=ax.transAxes, fontsize=12, verticalalignment='top',
-                   bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
-
-            plt.tight_layout()
-            plt.savefig(f"{save_dir}/density_vs_buildable_{level_name}.png", dpi=300, bbox_inches='tight')
-            plt.close()
-
-def generate_summary_statistics(arr_df, quartiers_df, iris_df, save_dir="plots"):
+    buildable_col = [col for col in key_cols if 'buildable_percentage_ultra' in col]
+    if density_col and buildable_col:
+        return density_col[0], buildable_col[0]
+    return None
+
+def plot_density_vs_buildable(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
     """
-    Generate comprehensive summary statistics
+    Scatter plot of density against buildable percentage for a geographic level
+    """
+    density_col, buildable_col = _density_vs_buildable_columns(df)
+
+    name = f"density_vs_buildable_{level_name}"
+    fingerprint = plot_fingerprint(df[[buildable_col, density_col]], name, dpi=dpi, fmt=fmt, level=level_name)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
+    sns = _seaborn()
+    fig, ax = plt.subplots(1, 1, figsize=(10, 8))
+    sns.scatterplot(data=df, x=buildable_col, y=density_col, ax=ax, s=100, alpha=0.7)
+    ax.set_title(f'Density vs Buildable Area - {level_name.title()}', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Buildable Area Percentage (%)', fontsize=12)
+    ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
+    ax.grid(True, alpha=0.3)
+
+    # Add correlation coefficient
+    corr = df[buildable_col].corr(df[density_col])
+    ax.text(0.05, 0.95, f'Correlation: {corr:.3f}',
+           transform=ax.transAxes, fontsize=12, verticalalignment='top',
+           bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+
+    plt.tight_layout()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
+
+def create_correlation_analysis(df, level_name, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Create correlation analysis plots for a geographic level
     """
     Path(save_dir).mkdir(exist_ok=True)
 
-    print("Generating summary statistics...")
+    print(f"Creating correlation analysis for {level_name}...")
+
+    if len(_correlation_columns(df)) < 2:
+        print(f"Not enough numeric columns for correlation analysis in {level_name}")
+        return
+
+    # 1. Correlation heatmap
+    plot_correlation_heatmap(df, level_name, save_dir, dpi, fmt, force)
+
+    # 2. Key scatter plots: Density vs Buildable Percentage
+    if _density_vs_buildable_columns(df) is not None:
+        plot_density_vs_buildable(df, level_name, save_dir, dpi, fmt, force)
+
+def compute_summary_statistics(arr_df, quartiers_df, iris_df, save_dir="plots"):
+    """
+    Compute, save and print summary statistics for all levels
+    """
+    Path(save_dir).mkdir(exist_ok=True)
 
     # Create summary for all levels
     summary_data = []
@@ -298,8 +532,19 @@ def generate_summary_statistics(arr_df, quartiers_df, iris_df, save_dir="plots")
             print(f"  Mean Buildable Area: {row['Mean_Buildable_Pct']:.1f}%")
 
     print("\n" + "="*80)
+    return summary_df
 
-    # Create summary visualization
+def plot_analysis_summary(summary_df, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Overview dashboard of the summary statistics
+    """
+    name = "analysis_summary"
+    fingerprint = plot_fingerprint(summary_df, name, dpi=dpi, fmt=fmt)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
+
+    plt = _pyplot()
     fig, axes = plt.subplots(1, 3, figsize=(18, 6))
 
     # Density comparison
@@ -328,17 +573,25 @@ def generate_summary_statistics(arr_df, quartiers_df, iris_df, save_dir="plots")
 
     plt.suptitle('Building Density Analysis Summary', fontsize=16, fontweight='bold', y=1.02)
     plt.tight_layout()
-    plt.savefig(f"{save_dir}/analysis_summary.png", dpi=300, bbox_inches='tight')
-    plt.close()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
 
-def create_top_zones_analysis(arr_df, quartiers_df, iris_df, save_dir="plots"):
+def generate_summary_statistics(arr_df, quartiers_df, iris_df, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
     """
-    Analyze and visualize top density zones
+    Generate comprehensive summary statistics
     """
     Path(save_dir).mkdir(exist_ok=True)
 
-    print("Creating top zones analysis...")
+    print("Generating summary statistics...")
+
+    summary_df = compute_summary_statistics(arr_df, quartiers_df, iris_df, save_dir)
+
+    # Create summary visualization
+    plot_analysis_summary(summary_df, save_dir, dpi, fmt, force)
 
+def compute_top_zones(arr_df, quartiers_df, iris_df):
+    """
+    Find the top 5 density zones from each level
+    """
     # Get density column
     density_col = 'density_m2_m2_ultra_corrected'
 
@@ -361,46 +614,168 @@ def create_top_zones_analysis(arr_df, quartiers_df, iris_df, save_dir="plots"):
             })
             top_zones.append(top_5)
 
-    if top_zones:
-        combined_top = pd.concat(top_zones, ignore_index=True)
+    if not top_zones:
+        return None
+    return pd.concat(top_zones, ignore_index=True)
 
-        # Create visualization
-        fig, ax = plt.subplots(1, 1, figsize=(14, 8))
+def plot_top_density_zones(combined_top, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Scatter plot of the top density zones of each level
+    """
+    name = "top_density_zones"
+    fingerprint = plot_fingerprint(combined_top, name, dpi=dpi, fmt=fmt)
+    cached = cached_figure(save_dir, name, fmt, fingerprint, force)
+    if cached is not None:
+        return cached
 
-        # Create color mapping
-        colors = {'Arrondissements': '#FF6B6B', 'Quartiers': '#4ECDC4', 'IRIS': '#45B7D1'}
+    plt = _pyplot()
+    fig, ax = plt.subplots(1, 1, figsize=(14, 8))
 
-        for level in ['Arrondissements', 'Quartiers', 'IRIS']:
-            level_data = combined_top[combined_top['level'] == level]
-            ax.scatter(level_data['buildable_pct'], level_data['density'],
-                      s=150, alpha=0.8, color=colors[level], label=level, edgecolors='black', linewidth=0.5)
+    # Create color mapping
+    colors = {'Arrondissements': '#FF6B6B', 'Quartiers': '#4ECDC4', 'IRIS': '#45B7D1'}
+
+    for level in ['Arrondissements', 'Quartiers', 'IRIS']:
+        level_data = combined_top[combined_top['level'] == level]
+        ax.scatter(level_data['buildable_pct'], level_data['density'],
+                  s=150, alpha=0.8, color=colors[level], label=level, edgecolors='black', linewidth=0.5)
+
+        # Add zone labels
+        for _, row in level_data.iterrows():
+            ax.annotate(f"{row['zone_name']}", (row['buildable_pct'], row['density']),
+                       xytext=(5, 5), textcoords='offset points', fontsize=8, alpha=0.8)
+
+    ax.set_title('Top 5 Highest Density Zones by Geographic Level', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Buildable Area Percentage (%)', fontsize=12)
+    ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
+    ax.legend(title='Geographic Level')
+    ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return save_figure(fig, save_dir, name, dpi, fmt, fingerprint)
+
+def print_top_zones(combined_top):
+    """
+    Print the top density zones of each level
+    """
+    print("\nTOP 5 DENSITY ZONES BY LEVEL:")
+    for level in ['Arrondissements', 'Quartiers', 'IRIS']:
+        level_data = combined_top[combined_top['level'] == level]
+        print(f"\n{level.upper()}:")
+        for _, row in level_data.iterrows():
+            print(".3f")
+
+def create_top_zones_analysis(arr_df, quartiers_df, iris_df, save_dir="plots", dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    Analyze and visualize top density zones
+    """
+    Path(save_dir).mkdir(exist_ok=True)
 
-            # Add zone labels
-            for _, row in level_data.iterrows():
-                ax.annotate(f"{row['zone_name']}", (row['buildable_pct'], row['density']),
-                           xytext=(5, 5), textcoords='offset points', fontsize=8, alpha=0.8)
+    print("Creating top zones analysis...")
 
-        ax.set_title('Top 5 Highest Density Zones by Geographic Level', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Buildable Area Percentage (%)', fontsize=12)
-        ax.set_ylabel('Ultra-Corrected Density (m²/m²)', fontsize=12)
-        ax.legend(title='Geographic Level')
-        ax.grid(True, alpha=0.3)
+    combined_top = compute_top_zones(arr_df, quartiers_df, iris_df)
 
-        plt.tight_layout()
-        plt.savefig(f"{save_dir}/top_density_zones.png", dpi=300, bbox_inches='tight')
-        plt.close()
+    if combined_top is not None:
+        # Create visualization
+        plot_top_density_zones(combined_top, save_dir, dpi, fmt, force)
 
         # Print top zones
-        print("\nTOP 5 DENSITY ZONES BY LEVEL:")
-        for level in ['Arrondissements', 'Quartiers', 'IRIS']:
-            level_data = combined_top[combined_top['level'] == level]
-            print(f"\n{level.upper()}:")
-            for _, row in level_data.iterrows():
-                print(".3f")
+        print_top_zones(combined_top)
 
-def main():
+def build_plot_tasks(arr_df, quartiers_df, iris_df, summary_df, combined_top, save_dir="plots",
+                     dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, force=False):
+    """
+    List every figure of the report as an independent (function, args) task.
+
+    Applies the same column checks as the create_* functions, so the task list
+    produces exactly the figures of a serial run.
+    """
+    tasks = []
+    for level_name, df in [('arrondissements', arr_df), ('quartiers', quartiers_df), ('iris', iris_df)]:
+        if _ultra_density_column(df) is not None:
+            tasks += [(plot_density_histogram, (df, level_name)),
+                      (plot_density_boxplot, (df, level_name)),
+                      (plot_density_violin, (df, level_name))]
+        if 'buildable_percentage_ultra' in df.columns and 'excluded_percentage_ultra' in df.columns:
+            tasks += [(plot_area_composition_pie, (df, level_name)),
+                      (plot_buildable_percentage_distribution, (df, level_name))]
+        if len(_correlation_columns(df)) >= 2:
+            tasks.append((plot_correlation_heatmap, (df, level_name)))
+            if _density_vs_buildable_columns(df) is not None:
+                tasks.append((plot_density_vs_buildable, (df, level_name)))
+
+    combined_df = _level_comparison_data(arr_df, quartiers_df, iris_df)
+    if combined_df is not None:
+        level_counts = {'arrondissements': len(arr_df), 'quartiers': len(quartiers_df), 'iris': len(iris_df)}
+        tasks += [(plot_density_comparison_boxplot, (combined_df, level_counts)),
+                  (plot_density_comparison_violin, (combined_df,))]
+
+    tasks.append((plot_analysis_summary, (summary_df,)))
+    if combined_top is not None:
+        tasks.append((plot_top_density_zones, (combined_top,)))
+
+    return [(func, args + (save_dir, dpi, fmt, force)) for func, args in tasks]
+
+def _init_plot_worker():
+    """
+    Force the non-interactive Agg backend in pool workers
+    """
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    warnings.filterwarnings('ignore')
+
+def _run_plot_task(func, args):
+    """
+    Render one figure in a worker process
+    """
+    return func(*args)
+
+def render_plots_parallel(tasks, workers=None):
+    """
+    Render independent figure tasks with a process pool.
+
+    Parameters:
+    -----------
+    tasks : list of (function, args)
+        Tasks from build_plot_tasks
+    workers : int, optional
+        Number of worker processes (default: number of CPUs)
+
+    Returns:
+    --------
+    list of str
+        Paths of the saved figures
+    """
+    workers = workers or os.cpu_count() or 1
+    print(f"Rendering {len(tasks)} figures with {workers} worker processes...")
+
+    saved = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_plot_worker) as executor:
+        futures = {executor.submit(_run_plot_task, func, args): func.__name__ for func, args in tasks}
+        for future in as_completed(futures):
+            try:
+                saved.append(future.result())
+            except Exception as e:
+                print(f"Warning: {futures[future]} failed: {e}")
+    return saved
+
+def main(parallel=False, workers=None, dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, save_dir="plots", force=False):
     """
     Main function to create all data visualizations
+
+    Parameters:
+    -----------
+    parallel : bool, default False
+        Render the figures as independent tasks in a process pool (Agg backend)
+    workers : int, optional
+        Number of worker processes in parallel mode (default: number of CPUs)
+    dpi : int, default 300
+        Output resolution (e.g. 100 for draft previews)
+    fmt : str, default 'png'
+        Output format understood by matplotlib ('png', 'svg', 'pdf', ...)
+    save_dir : str, default 'plots'
+        Output directory
+    force : bool, default False
+        Re-render every figure even when its input fingerprint is unchanged
     """
     print("="*80)
     print("PARIS BUILDING DENSITY DATA VISUALIZATION")
@@ -413,36 +788,60 @@ def main():
     print("CREATING VISUALIZATIONS")
     print("="*60)
 
-    # Create visualizations for each level
-    for level_name, df in [('arrondissements', arr_df), ('quartiers', quartiers_df), ('iris', iris_df)]:
-        print(f"\nProcessing {level_name}...")
-        create_density_distributions(df, level_name)
-        create_area_composition_charts(df, level_name)
-        create_correlation_analysis(df, level_name)
+    if parallel:
+        Path(save_dir).mkdir(exist_ok=True)
+
+        # Statistics are cheap and print to the console: compute them here, render in workers
+        summary_df = compute_summary_statistics(arr_df, quartiers_df, iris_df, save_dir)
+        combined_top = compute_top_zones(arr_df, quartiers_df, iris_df)
+
+        tasks = build_plot_tasks(arr_df, quartiers_df, iris_df, summary_df, combined_top, save_dir, dpi, fmt, force)
+        render_plots_parallel(tasks, workers)
+
+        if combined_top is not None:
+            print_top_zones(combined_top)
+    else:
+        # Create visualizations for each level
+        for level_name, df in [('arrondissements', arr_df), ('quartiers', quartiers_df), ('iris', iris_df)]:
+            print(f"\nProcessing {level_name}...")
+            create_density_distributions(df, level_name, save_dir, dpi, fmt, force)
+            create_area_composition_charts(df, level_name, save_dir, dpi, fmt, force)
+            create_correlation_analysis(df, level_name, save_dir, dpi, fmt, force)
 
-    # Create comparative analysis
-    print("\nProcessing comparative analysis...")
-    create_comparative_analysis(arr_df, quartiers_df, iris_df)
+        # Create comparative analysis
+        print("\nProcessing comparative analysis...")
+        create_comparative_analysis(arr_df, quartiers_df, iris_df, save_dir, dpi, fmt, force)
 
-    # Generate summary statistics
-    print("\nGenerating summary statistics...")
-    generate_summary_statistics(arr_df, quartiers_df, iris_df)
+        # Generate summary statistics
+        print("\nGenerating summary statistics...")
+        generate_summary_statistics(arr_df, quartiers_df, iris_df, save_dir, dpi, fmt, force)
 
-    # Create top zones analysis
-    print("\nCreating top zones analysis...")
-    create_top_zones_analysis(arr_df, quartiers_df, iris_df)
+        # Create top zones analysis
+        print("\nCreating top zones analysis...")
+        create_top_zones_analysis(arr_df, quartiers_df, iris_df, save_dir, dpi, fmt, force)
 
     print("\n" + "="*80)
     print("VISUALIZATION COMPLETE!")
     print("="*80)
-    print("Generated files in 'plots/' directory:")
+    print(f"Generated files in '{save_dir}/' directory:")
     print("- Density distribution plots (histograms, box plots, violin plots)")
     print("- Area composition charts (pie charts, distributions)")
     print("- Correlation analysis (heatmaps, scatter plots)")
     print("- Comparative analysis (level comparisons)")
     print("- Summary statistics and top zones analysis")
-    print("- analysis_summary.png (overview dashboard)")
+    print(f"- analysis_summary.{fmt} (overview dashboard)")
     print("\n" + "="*80)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create the Paris building density report plots")
+    parser.add_argument('--parallel', action='store_true', help="render figures in a process pool")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help="output resolution")
+    parser.add_argument('--format', dest='fmt', default=DEFAULT_FORMAT, help="output format (png, svg, pdf...)")
+    parser.add_argument('--draft', action='store_true', help=f"quick preview at {DRAFT_DPI} dpi")
+    parser.add_argument('--save-dir', default="plots", help="output directory")
+    parser.add_argument('--force', action='store_true', help="re-render figures whose inputs are unchanged")
+    args = parser.parse_args()
+
+    main(parallel=args.parallel, workers=args.workers,
+         dpi=DRAFT_DPI if args.draft else args.dpi, fmt=args.fmt, save_dir=args.save_dir, force=args.force)
@@ -1,49 +1,87 @@
-from geoclass import GeoDataParis
+from geoclass import GeoDataParis, LayerIndex, cached_layer_index
+from building_store import BuildingStore, compile_building_store
+from portal import paris_dataset
+from geomprep import repair_layer
+from zonetable import ZoneTable, safe_ratio
 from annexfunctions import (visualiser_maillages, aggregate_by_geographic_division,
-                           calculate_density, calculate_corrected_density, visualize_aggregated_data,
+                           calculate_density, visualize_aggregated_data,
                            load_non_buildable_areas, load_all_nonbuildable_areas, create_buildable_geometries,
-                           create_buildable_geodataframe, parse_geometry)
+                           create_buildable_geodataframe)
+import numpy as np
 import pandas as pd
-import geopandas as gpd
-import requests
-from io import BytesIO
+from shapely.geometry import mapping
 
 # Constants
 CRS_PARIS = 'EPSG:2154'  # Lambert 93
 CRS_FOLIUM = 4326  # WGS84
 
-def load_building_data():
+def load_building_data(store_dir=None):
     """
     Load building data from OpenData Paris.
 
+    Parameters:
+    -----------
+    store_dir : str, optional
+        Compiled building store (see building_store); memory-mapped when it exists,
+        written after the download otherwise. The store keeps only M2_PL_TOT.
+
     Returns:
     --------
     GeoDataFrame
         Buildings with geometry and surface area
     """
-    print("Loading building data...")
-    url = "https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/volumesbatisparis/exports/csv?lang=fr&timezone=Europe%2FBerlin&use_labels=true&delimiter=%3B"
-
-    df_bati = pd.read_csv(url, sep=";")
-    print(f"Loaded {len(df_bati)} building records")
+    if store_dir is not None and BuildingStore.exists(store_dir):
+        print(f"Loading building data from {store_dir}...")
+        return BuildingStore(store_dir).to_geodataframe()
 
-    # Parse geometry from 'geom' column (GeoJSON polygons) - as identified from analysis
-    df_bati['geometry'] = df_bati['geom'].apply(parse_geometry)
+    print("Loading building data...")
+    # Only the floor area and geometry fields are used downstream
+    # Geometry is the 'geom' field (GeoJSON polygons in the CSV export) - as identified from analysis
+    gdf_bati = paris_dataset('volumesbatisparis').select('m2_pl_tot', 'geom').read_geodataframe('geom')
+    print(f"Loaded {len(gdf_bati)} building records ({gdf_bati.attrs['export_format']} export)")
 
-    # Create GeoDataFrame
-    gdf_bati = gpd.GeoDataFrame(
-        df_bati.dropna(subset=['geometry']),
-        geometry='geometry',
-        crs=CRS_FOLIUM
-    ).to_crs(CRS_PARIS)
+    # Binary exports use field identifiers, the CSV export uses labels
+    gdf_bati = gdf_bati.rename(columns={col: 'M2_PL_TOT' for col in gdf_bati.columns if col.lower() == 'm2_pl_tot'})
+    gdf_bati = gdf_bati.to_crs(CRS_PARIS)
 
-    # Keep only valid geometries
-    gdf_bati = gdf_bati[gdf_bati.geometry.is_valid].copy()
+    # Repair invalid geometries (only unrecoverable ones are dropped)
+    gdf_bati = repair_layer(gdf_bati, 'buildings')
 
     print(f"Converted to {len(gdf_bati)} valid building polygons")
+    if store_dir is not None:
+        compile_building_store(gdf_bati, store_dir)
     return gdf_bati
 
-def create_building_density_map(buildings, geo_divisions, geo_level='arrondissements'):
+def get_building_index(buildings, bounds_path=None, fingerprint=None):
+    """
+    Get the spatial index of the building polygons, built once per building set.
+
+    Parameters:
+    -----------
+    buildings : GeoDataFrame
+        Building data from load_building_data
+    bounds_path : str, optional
+        .npz file where the packed building bounding boxes are persisted and reused
+    fingerprint : str, optional
+        Identifies the building set (e.g. file_fingerprint of its source); defaults
+        to a hash of the geometries, so stale bounds are never reused
+
+    Returns:
+    --------
+    LayerIndex
+        STRtree-backed index in the building CRS
+    """
+    if bounds_path is None:
+        return cached_layer_index(buildings)
+
+    index = LayerIndex.from_saved_bounds(buildings.geometry.values, bounds_path, crs=buildings.crs,
+                                         fingerprint=fingerprint)
+    if index is None:
+        index = LayerIndex(buildings.geometry.values, crs=buildings.crs)
+        index.save_bounds(bounds_path, fingerprint=fingerprint)
+    return index
+
+def create_building_density_map(buildings, geo_divisions, geo_level='arrondissements', renderer=None):
     """
     Create building density map for specified geographic level using pre-loaded data.
 
@@ -55,6 +93,8 @@ def create_building_density_map(buildings, geo_divisions, geo_level='arrondissem
         Geographic divisions (arrondissements, quartiers, or iris)
     geo_level : str
         'arrondissements', 'quartiers', or 'iris'
+    renderer : MapRenderer, optional
+        Renderer prepared for geo_divisions (built on the fly if not provided)
     """
     print(f"Processing {geo_level}...")
 
@@ -79,17 +119,20 @@ def create_building_density_map(buildings, geo_divisions, geo_level='arrondissem
     title = f'Densité du bâti - {geo_level.title()}'
     print("Step 3: Creating interactive map...")
 
-    map_obj = visualize_building_density(
+    if renderer is None:
+        renderer = MapRenderer(geo_divisions, geo_level)
+    map_obj = renderer.render(
         aggregated_with_density,
         density_col,
-        geo_level,
+        variant='raw',
         title=title,
         save_path=f'Data/building_density_{geo_level}.html'
     )
 
     return aggregated_with_density, map_obj
 
-def create_corrected_building_density_map(buildings, geo_divisions, non_buildable_gdf, geo_level='arrondissements'):
+def create_corrected_building_density_map(buildings, geo_divisions, non_buildable_gdf, geo_level='arrondissements',
+                                          renderer=None):
     """
     Create corrected building density map excluding water and railways.
     Uses original geographic boundaries for building aggregation but buildable area for density calculation.
@@ -104,6 +147,8 @@ def create_corrected_building_density_map(buildings, geo_divisions, non_buildabl
         Non-buildable areas (water + railways)
     geo_level : str
         'arrondissements', 'quartiers', or 'iris'
+    renderer : MapRenderer, optional
+        Renderer prepared for geo_divisions (built on the fly if not provided)
     """
     print(f"Processing corrected {geo_level}...")
 
@@ -121,53 +166,42 @@ def create_corrected_building_density_map(buildings, geo_divisions, non_buildabl
         agg_method='sum'
     )
 
-    # Merge with buildable area information
-    aggregated_with_areas = aggregated.merge(
-        buildable_areas[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True,
-        right_index=True,
-        how='left'
-    )
-
     print("Step 3: Calculating corrected density...")
-    # Calculate corrected density using buildable area (not total area)
-    aggregated_with_corrected_density = calculate_corrected_density(
-        aggregated_with_areas,
-        'M2_PL_TOT_sum',
-        'buildable_area_m2'
-    )
+    # Calculate corrected density using buildable area (not total area), aligned on the zones
+    density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
+    table = ZoneTable(geo_divisions, geo_level)
+    table['buildable_area_m2'] = buildable_areas['buildable_area_m2']
+    table['buildable_percentage'] = buildable_areas['buildable_percentage']
+    table[density_col] = safe_ratio(aggregated['M2_PL_TOT_sum'].to_numpy(), table['buildable_area_m2'])
 
     # Create visualization using original geometries (simpler for web display)
     print("Step 4: Creating corrected density visualization...")
 
     # Use original geometries for display, but show corrected density values
-    final_data = geo_divisions.merge(
-        aggregated_with_corrected_density[['M2_PL_TOT_sum_corrected_density_m2_m2', 'buildable_percentage']],
-        left_index=True,
-        right_index=True,
-        how='left'
-    )
+    final_data = table.to_geodataframe(table.source_columns + [density_col, 'buildable_percentage'])
 
     # Create visualization
-    density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
     avg_density = final_data[density_col].mean()
     print(f"Average corrected density: {avg_density:.4f} m²/m²")
 
     title = f'Densité du bâti corrigée - {geo_level.title()}'
     print("Step 5: Creating interactive map...")
 
-    map_obj = visualize_corrected_building_density(
+    if renderer is None:
+        renderer = MapRenderer(geo_divisions, geo_level)
+    map_obj = renderer.render(
         final_data,
         density_col,
-        geo_level,
-        non_buildable_gdf=non_buildable_gdf,  # Pass non-buildable areas for overlay
+        variant='corrected',
+        overlays={'non_buildable': non_buildable_gdf},  # Pass non-buildable areas for overlay
         title=title,
         save_path=f'Data/building_density_corrected_{geo_level}.html'
     )
 
     return final_data, map_obj
 
-def create_ultra_corrected_building_density_map(buildings, geo_divisions, geo_level='arrondissements'):
+def create_ultra_corrected_building_density_map(buildings, geo_divisions, geo_level='arrondissements',
+                                                renderer=None, all_non_buildable=None, green_spaces=None):
     """
     Create ultra-corrected building density map excluding water, railways, and green spaces.
     Uses original geographic boundaries for building aggregation but ultra-buildable area for density calculation.
@@ -180,12 +214,19 @@ def create_ultra_corrected_building_density_map(buildings, geo_divisions, geo_le
         Geographic divisions (arrondissements, quartiers, or iris)
     geo_level : str
         'arrondissements', 'quartiers', or 'iris'
+    renderer : MapRenderer, optional
+        Renderer prepared for geo_divisions (built on the fly if not provided)
+    all_non_buildable : GeoDataFrame, optional
+        Pre-loaded non-buildable areas (water + railways + green spaces)
+    green_spaces : GeoDataFrame, optional
+        Pre-loaded green spaces (loaded together with all_non_buildable if not provided)
     """
     print(f"Processing ultra-corrected {geo_level}...")
 
     print("Step 1: Loading all non-buildable areas (water + railways + green spaces)...")
-    # Load all non-buildable areas (water, railways, green spaces)
-    all_non_buildable, green_spaces = load_all_nonbuildable_areas()
+    # Load all non-buildable areas (water, railways, green spaces) unless already provided
+    if all_non_buildable is None or green_spaces is None:
+        all_non_buildable, green_spaces = load_all_nonbuildable_areas()
 
     print("Step 2: Calculating ultra-buildable areas...")
     # Calculate ultra-buildable areas for each geographic division (excluding water + railways + green)
@@ -201,53 +242,373 @@ def create_ultra_corrected_building_density_map(buildings, geo_divisions, geo_le
         agg_method='sum'
     )
 
-    # Merge with ultra-buildable area information
-    aggregated_with_areas = aggregated.merge(
-        ultra_buildable_areas[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True,
-        right_index=True,
-        how='left'
-    )
-
     print("Step 4: Calculating ultra-corrected density...")
-    # Calculate ultra-corrected density using ultra-buildable area (not total area)
-    aggregated_with_ultra_corrected_density = calculate_corrected_density(
-        aggregated_with_areas,
-        'M2_PL_TOT_sum',
-        'buildable_area_m2'
-    )
+    # Calculate ultra-corrected density using ultra-buildable area (not total area), aligned on the zones
+    density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
+    table = ZoneTable(geo_divisions, geo_level)
+    table['buildable_area_m2'] = ultra_buildable_areas['buildable_area_m2']
+    table['buildable_percentage'] = ultra_buildable_areas['buildable_percentage']
+    table[density_col] = safe_ratio(aggregated['M2_PL_TOT_sum'].to_numpy(), table['buildable_area_m2'])
 
     # Create visualization using original geometries (simpler for web display)
     print("Step 5: Creating ultra-corrected density visualization...")
 
     # Use original geometries for display, but show ultra-corrected density values
-    final_data = geo_divisions.merge(
-        aggregated_with_ultra_corrected_density[['M2_PL_TOT_sum_corrected_density_m2_m2', 'buildable_percentage']],
-        left_index=True,
-        right_index=True,
-        how='left'
-    )
+    final_data = table.to_geodataframe(table.source_columns + [density_col, 'buildable_percentage'])
 
     # Create visualization
-    density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
     avg_density = final_data[density_col].mean()
     print(f"Average ultra-corrected density: {avg_density:.4f} m²/m²")
 
     title = f'Densité du bâti ultra-corrigée - {geo_level.title()}'
     print("Step 6: Creating interactive map with all non-buildable overlays...")
 
-    map_obj = visualize_ultra_corrected_building_density(
+    if renderer is None:
+        renderer = MapRenderer(geo_divisions, geo_level)
+    map_obj = renderer.render(
         final_data,
         density_col,
-        geo_level,
-        all_non_buildable_gdf=all_non_buildable,  # Pass all non-buildable areas for overlay
-        green_spaces_gdf=green_spaces,  # Pass green spaces for separate overlay
+        variant='ultra_corrected',
+        overlays={
+            'green_spaces': green_spaces,  # Pass green spaces for separate overlay
+            'all_non_buildable': all_non_buildable,  # Pass all non-buildable areas for overlay
+        },
         title=title,
         save_path=f'Data/building_density_ultra_corrected_{geo_level}.html'
     )
 
     return final_data, map_obj
 
+def render_density_maps(level_df, geo_divisions, geo_level, variants=('raw', 'corrected', 'ultra_corrected'),
+                        non_buildable=None, all_non_buildable=None, green_spaces=None, renderer=None):
+    """
+    Render the density maps of one level from an extracted level dataframe.
+
+    Parameters:
+    -----------
+    level_df : DataFrame
+        Output of extract_density_dataframes.create_level_dataframe (row-aligned with geo_divisions)
+    geo_divisions : GeoDataFrame
+        Geographic divisions of the level
+    geo_level : str
+        'arrondissements', 'quartiers', or 'iris'
+    variants : sequence of str
+        Density variants to render
+    non_buildable, all_non_buildable, green_spaces : GeoDataFrame, optional
+        Overlays of the corrected and ultra-corrected maps
+    renderer : MapRenderer, optional
+        Renderer prepared for geo_divisions (built on the fly if not provided)
+
+    Returns:
+    --------
+    dict
+        {variant: map object}
+    """
+    if renderer is None:
+        renderer = MapRenderer(geo_divisions, geo_level)
+
+    settings = {
+        'raw': (None, {}, f'Densité du bâti - {geo_level.title()}',
+                f'Data/building_density_{geo_level}.html'),
+        'corrected': ('buildable_percentage_corrected', {'non_buildable': non_buildable},
+                      f'Densité du bâti corrigée - {geo_level.title()}',
+                      f'Data/building_density_corrected_{geo_level}.html'),
+        'ultra_corrected': ('buildable_percentage_ultra',
+                            {'green_spaces': green_spaces, 'all_non_buildable': all_non_buildable},
+                            f'Densité du bâti ultra-corrigée - {geo_level.title()}',
+                            f'Data/building_density_ultra_corrected_{geo_level}.html'),
+    }
+
+    maps = {}
+    for variant in variants:
+        buildable_col, overlays, title, save_path = settings[variant]
+        density_col = f'density_m2_m2_{variant}'
+        data = pd.DataFrame({density_col: level_df[density_col].to_numpy()})
+        if buildable_col is not None:
+            data['buildable_percentage'] = level_df[buildable_col].to_numpy()
+        maps[variant] = renderer.render(data, density_col, variant=variant, overlays=overlays,
+                                        title=title, save_path=save_path)
+    return maps
+
+# Reference column candidates and tooltip label for each geographic level
+REFERENCE_COLUMNS = {
+    'arrondissements': (['c_ar'], 'Arrondissement'),
+    'quartiers': (['c_qu', 'c_qa', 'n_sq_qu'], 'Quartier'),
+    'iris': (['CODE_IRIS', 'iris_code', 'depcom'], 'IRIS'),
+}
+
+# Choropleth styling for each density variant
+VARIANT_STYLES = {
+    'raw': {
+        'layer_name': None,  # use the map title
+        'legend_name': 'Densité (m² bâti / m² surface)',
+        'density_alias': 'Densité (m²/m²)',
+        'buildable_alias': None,
+        'quantile_bins': False,
+        'collapsed_layers': True,
+    },
+    'corrected': {
+        'layer_name': 'Densité corrigée',
+        'legend_name': 'Densité corrigée (m²/m²)',
+        'density_alias': 'Densité corrigée (m²/m²)',
+        'buildable_alias': 'Surface bâtissable (%)',
+        'quantile_bins': True,
+        'collapsed_layers': False,
+    },
+    'ultra_corrected': {
+        'layer_name': 'Densité ultra-corrigée',
+        'legend_name': 'Densité ultra-corrigée (m²/m²)',
+        'density_alias': 'Densité ultra-corrigée (m²/m²)',
+        'buildable_alias': 'Surface ultra-bâtissable (%)',
+        'quantile_bins': True,
+        'collapsed_layers': False,
+    },
+}
+
+# Overlay styling for the non-buildable layers
+OVERLAY_STYLES = {
+    'non_buildable': {
+        'name': 'Zones non-bâtissables (eau + rails)',
+        'style': {'fillColor': '#2F2F2F', 'color': '#1F1F1F', 'weight': 1, 'fillOpacity': 0.7},
+        'tooltip': 'Zone non-bâtissable (exclue du calcul de densité)',
+    },
+    'green_spaces': {
+        'name': 'Espaces verts',
+        'style': {'fillColor': '#228B22', 'color': '#006400', 'weight': 1, 'fillOpacity': 0.6},
+        'tooltip': 'Espace vert (exclu du calcul de densité)',
+    },
+    'all_non_buildable': {
+        'name': 'Eau + Voies ferrées',
+        'style': {'fillColor': '#2F2F2F', 'color': '#1F1F1F', 'weight': 1, 'fillOpacity': 0.7},
+        'tooltip': 'Eau/Voies ferrées (exclus du calcul de densité)',
+    },
+}
+
+class MapRenderer:
+    """
+    Renders density choropleths for one geographic level.
+
+    The expensive state (reprojection to WGS84, reference column detection and
+    GeoJSON geometry serialization) is prepared once at construction, so any
+    density column or variant can then be rendered cheaply with any overlays.
+    """
+
+    def __init__(self, geo_divisions, geo_level, simplify_tolerance=None, overlay_cache=None):
+        """
+        Parameters:
+        -----------
+        geo_divisions : GeoDataFrame
+            Geographic divisions (arrondissements, quartiers, or iris)
+        geo_level : str
+            'arrondissements', 'quartiers', or 'iris'
+        simplify_tolerance : float, optional
+            Simplification tolerance in degrees applied to the display geometries
+        overlay_cache : dict, optional
+            Cache of prepared overlays, shared between renderers of different levels
+        """
+        self.geo_level = geo_level
+        self.geo_divisions = geo_divisions
+        self.overlay_cache = overlay_cache if overlay_cache is not None else {}
+
+        gdf_4326 = geo_divisions.to_crs(epsg=CRS_FOLIUM).reset_index()
+        gdf_4326['id'] = gdf_4326.index
+        self.gdf_4326 = gdf_4326
+
+        self.ref_col, self.ref_label = self._detect_reference_column(gdf_4326, geo_level)
+        self.ref_values = [_json_scalar(v) for v in gdf_4326[self.ref_col]]
+
+        geometries = gdf_4326.geometry
+        if simplify_tolerance:
+            geometries = geometries.simplify(simplify_tolerance, preserve_topology=True)
+        self.geometry_json = [mapping(geom) for geom in geometries]
+
+    @staticmethod
+    def _detect_reference_column(gdf, geo_level):
+        """Return the (column, label) used to identify zones in tooltips."""
+        if geo_level not in REFERENCE_COLUMNS:
+            return 'id', 'Zone'
+        candidates, label = REFERENCE_COLUMNS[geo_level]
+        if geo_level == 'arrondissements':
+            return candidates[0], label
+        ref_col = next((col for col in candidates if col in gdf.columns), list(gdf.columns)[0])
+        return ref_col, label
+
+    def _feature_collection(self, properties):
+        """Build a fresh FeatureCollection sharing the prepared geometries."""
+        return {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature', 'id': str(i), 'geometry': geom, 'properties': props}
+                for i, (geom, props) in enumerate(zip(self.geometry_json, properties))
+            ],
+        }
+
+    def prepare_overlay(self, gdf):
+        """
+        Reproject and serialize an overlay layer once, reusing it on later renders.
+
+        Parameters:
+        -----------
+        gdf : GeoDataFrame
+            Overlay geometries (e.g. non-buildable areas)
+
+        Returns:
+        --------
+        dict
+            GeoJSON interface of the overlay in WGS84
+        """
+        cached = self.overlay_cache.get(id(gdf))
+        if cached is not None and cached[0] is gdf:
+            return cached[1]
+        prepared = gdf.to_crs(epsg=CRS_FOLIUM).__geo_interface__
+        self.overlay_cache[id(gdf)] = (gdf, prepared)
+        return prepared
+
+    def render(self, data, density_column, variant='raw', overlays=None,
+               title="Building Density Map", cmap='RdYlBu_r', save_path=None):
+        """
+        Render a density choropleth with custom tooltips and optional overlays.
+
+        Parameters:
+        -----------
+        data : DataFrame
+            Density results, row-aligned with the renderer's geographic divisions
+        density_column : str
+            Column containing density values
+        variant : str
+            'raw', 'corrected', or 'ultra_corrected' (selects legend, bins and tooltips)
+        overlays : dict, optional
+            {overlay style key: GeoDataFrame}, drawn in order (see OVERLAY_STYLES)
+        title : str
+            Map title
+        cmap : str
+            Colormap for the matplotlib fallback
+        save_path : str, optional
+            Path to save the HTML file
+
+        Returns:
+        --------
+        folium.Map object
+        """
+        style = VARIANT_STYLES[variant]
+        overlays = overlays or {}
+        density_values = pd.Series(np.asarray(data[density_column], dtype=float))
+        buildable_values = None
+        if style['buildable_alias'] is not None:
+            buildable_values = np.asarray(data['buildable_percentage'], dtype=float)
+
+        try:
+            import folium
+
+            centre_paris = [48.8566, 2.3522]
+            m = folium.Map(location=centre_paris, zoom_start=12, tiles="cartodbdarkmatter")
+
+            bins = None
+            if style['quantile_bins']:
+                valid_values = density_values.dropna()
+                if len(valid_values) > 0:
+                    bins = list(valid_values.quantile([0, 0.2, 0.4, 0.6, 0.8, 1.0]))
+                    if len(set(bins)) < 3:
+                        bins = None
+
+            choropleth_data = pd.DataFrame({'id': self.gdf_4326['id'], density_column: density_values})
+            folium.Choropleth(
+                geo_data=self._feature_collection([{'id': i} for i in range(len(self.geometry_json))]),
+                name=style['layer_name'] or title,
+                data=choropleth_data,
+                columns=['id', density_column],
+                key_on='feature.properties.id',
+                fill_color='YlOrRd',  # Yellow-orange-red color scheme for all maps
+                fill_opacity=0.8,
+                line_opacity=0.3,
+                legend_name=style['legend_name'],
+                highlight=True,
+                bins=bins,
+            ).add_to(m)
+
+            for overlay_key, overlay_gdf in overlays.items():
+                if overlay_gdf is None:
+                    continue
+                overlay_style = OVERLAY_STYLES[overlay_key]
+                try:
+                    folium.GeoJson(
+                        self.prepare_overlay(overlay_gdf),
+                        name=overlay_style['name'],
+                        style_function=lambda x, s=overlay_style['style']: s,
+                        tooltip=overlay_style['tooltip']
+                    ).add_to(m)
+                except Exception as e:
+                    print(f"Warning: Could not add {overlay_style['name']} overlay: {e}")
+
+            # Tooltip layer: reference, density and (for corrected variants) buildable share
+            fields = [self.ref_col, density_column]
+            aliases = [self.ref_label, style['density_alias']]
+            if buildable_values is not None:
+                fields.append('buildable_percentage')
+                aliases.append(style['buildable_alias'])
+            properties = []
+            for i in range(len(self.geometry_json)):
+                props = {'id': i, self.ref_col: self.ref_values[i],
+                         density_column: _json_scalar(density_values.iloc[i])}
+                if buildable_values is not None:
+                    props['buildable_percentage'] = _json_scalar(buildable_values[i])
+                properties.append(props)
+
+            folium.GeoJson(
+                self._feature_collection(properties),
+                tooltip=folium.features.GeoJsonTooltip(
+                    fields=fields,
+                    aliases=aliases,
+                    labels=True,
+                    style="font-size: 12px; font-weight: bold;",
+                    localize=True
+                ),
+                style_function=lambda x: {'fillOpacity': 0, 'color': 'transparent'}
+            ).add_to(m)
+
+            folium.LayerControl(collapsed=style['collapsed_layers']).add_to(m)
+
+            if save_path:
+                m.save(save_path)
+                print(f"Interactive map saved to {save_path}")
+
+            return m
+
+        except ImportError:
+            # Fallback to matplotlib
+            import matplotlib.pyplot as plt
+            import matplotlib.colors as mcolors
+
+            plot_gdf = self.geo_divisions.copy()
+            plot_gdf[density_column] = density_values.to_numpy()
+
+            # Use robust color scaling for outliers on corrected variants
+            norm = None
+            valid_values = density_values.dropna()
+            if style['quantile_bins'] and len(valid_values) > 0:
+                norm = mcolors.Normalize(vmin=valid_values.quantile(0.05), vmax=valid_values.quantile(0.95))
+
+            fig, ax = plt.subplots(1, 1, figsize=(12, 10))
+            plot_gdf.plot(column=density_column, ax=ax, cmap=cmap, legend=True,
+                          edgecolor='black', linewidth=0.5, norm=norm)
+            ax.set_title(title, fontsize=16, fontweight='bold')
+            ax.axis('off')
+
+            if save_path:
+                plt.savefig(save_path, dpi=300, bbox_inches='tight')
+                print(f"Static map saved to {save_path}")
+
+            plt.show()
+            return fig
+
+def _json_scalar(value):
+    """Convert a numpy scalar to a plain Python value for GeoJSON properties (NaN becomes None)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
 def visualize_building_density(aggregated_gdf, density_column, geo_level, title="Building Density Map",
                               cmap='RdYlBu_r', save_path=None):
     """
@@ -272,96 +633,9 @@ def visualize_building_density(aggregated_gdf, density_column, geo_level, title=
     --------
     folium.Map object
     """
-    try:
-        import folium
-        # Create Folium map
-        gdf_4326 = aggregated_gdf.to_crs(epsg=4326)
-
-        # Add an index column for Folium
-        gdf_4326 = gdf_4326.reset_index()
-        gdf_4326['id'] = gdf_4326.index
-
-        centre_paris = [48.8566, 2.3522]
-        m = folium.Map(location=centre_paris, zoom_start=12, tiles="cartodbdarkmatter")
-
-        # Determine the reference column based on geo_level
-        if geo_level == 'arrondissements':
-            ref_col = 'c_ar'
-            ref_label = 'Arrondissement'
-        elif geo_level == 'quartiers':
-            # Try different possible column names for quartiers
-            if 'c_qu' in gdf_4326.columns:
-                ref_col = 'c_qu'
-            elif 'c_qa' in gdf_4326.columns:
-                ref_col = 'c_qa'
-            elif 'n_sq_qu' in gdf_4326.columns:
-                ref_col = 'n_sq_qu'
-            else:
-                ref_col = list(gdf_4326.columns)[0]  # fallback to first column
-            ref_label = 'Quartier'
-        elif geo_level == 'iris':
-            # Try different possible column names for IRIS
-            if 'CODE_IRIS' in gdf_4326.columns:
-                ref_col = 'CODE_IRIS'
-            elif 'iris_code' in gdf_4326.columns:
-                ref_col = 'iris_code'
-            elif 'depcom' in gdf_4326.columns:
-                ref_col = 'depcom'
-            else:
-                ref_col = list(gdf_4326.columns)[0]  # fallback to first column
-            ref_label = 'IRIS'
-        else:
-            ref_col = 'id'
-            ref_label = 'Zone'
-
-        folium.Choropleth(
-            geo_data=gdf_4326.__geo_interface__,
-            name=title,
-            data=gdf_4326,
-            columns=['id', density_column],
-            key_on='feature.properties.id',
-            fill_color='YlOrRd',  # Yellow-orange-red color scheme
-            fill_opacity=0.8,
-            line_opacity=0.3,
-            legend_name='Densité (m² bâti / m² surface)',
-            highlight=True,
-        ).add_to(m)
-
-        # Add tooltips to the choropleth layer
-        folium.GeoJson(
-            gdf_4326,
-            tooltip=folium.features.GeoJsonTooltip(
-                fields=[ref_col, density_column],
-                aliases=[ref_label, 'Densité (m²/m²)'],
-                labels=True,
-                style="font-size: 12px; font-weight: bold;",
-                localize=True
-            ),
-            style_function=lambda x: {'fillOpacity': 0, 'color': 'transparent'}
-        ).add_to(m)
-
-        folium.LayerControl().add_to(m)
-
-        if save_path:
-            m.save(save_path)
-            print(f"Interactive map saved to {save_path}")
-
-        return m
-
-    except ImportError:
-        # Fallback to matplotlib
-        fig, ax = plt.subplots(1, 1, figsize=(12, 10))
-        aggregated_gdf.plot(column=density_column, ax=ax, cmap=cmap, legend=True,
-                          edgecolor='black', linewidth=0.5)
-        ax.set_title(title, fontsize=16, fontweight='bold')
-        ax.axis('off')
-
-        if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
-            print(f"Static map saved to {save_path}")
-
-        plt.show()
-        return fig
+    renderer = MapRenderer(aggregated_gdf, geo_level)
+    return renderer.render(aggregated_gdf, density_column, variant='raw',
+                           title=title, cmap=cmap, save_path=save_path)
 
 def visualize_corrected_building_density(aggregated_gdf, density_column, geo_level, non_buildable_gdf=None,
                                        title="Corrected Building Density Map", save_path=None):
@@ -388,137 +662,10 @@ def visualize_corrected_building_density(aggregated_gdf, density_column, geo_lev
     --------
     folium.Map object
     """
-    try:
-        import folium
-        # Create Folium map
-        gdf_4326 = aggregated_gdf.to_crs(epsg=4326)
-
-        # Add an index column for Folium
-        gdf_4326 = gdf_4326.reset_index()
-        gdf_4326['id'] = gdf_4326.index
-
-        centre_paris = [48.8566, 2.3522]
-        m = folium.Map(location=centre_paris, zoom_start=12, tiles="cartodbdarkmatter")
-
-        # Determine the reference column based on geo_level
-        if geo_level == 'arrondissements':
-            ref_col = 'c_ar'
-            ref_label = 'Arrondissement'
-        elif geo_level == 'quartiers':
-            if 'c_qu' in gdf_4326.columns:
-                ref_col = 'c_qu'
-            elif 'c_qa' in gdf_4326.columns:
-                ref_col = 'c_qa'
-            elif 'n_sq_qu' in gdf_4326.columns:
-                ref_col = 'n_sq_qu'
-            else:
-                ref_col = list(gdf_4326.columns)[0]  # fallback to first column
-            ref_label = 'Quartier'
-        elif geo_level == 'iris':
-            if 'CODE_IRIS' in gdf_4326.columns:
-                ref_col = 'CODE_IRIS'
-            elif 'iris_code' in gdf_4326.columns:
-                ref_col = 'iris_code'
-            elif 'depcom' in gdf_4326.columns:
-                ref_col = 'depcom'
-            else:
-                ref_col = list(gdf_4326.columns)[0]  # fallback to first column
-            ref_label = 'IRIS'
-        else:
-            ref_col = 'id'
-            ref_label = 'Zone'
-
-        # Use consistent YlOrRd color scheme for all levels
-        density_values = gdf_4326[density_column].dropna()
-        if len(density_values) > 0:
-            bins = list(density_values.quantile([0, 0.2, 0.4, 0.6, 0.8, 1.0]))
-            if len(set(bins)) < 3:
-                bins = None
-        else:
-            bins = None
-
-        fill_color = 'YlOrRd'  # Yellow-orange-red color scheme for all maps
-        legend_name = 'Densité corrigée (m²/m²)'
-
-        choropleth = folium.Choropleth(
-            geo_data=gdf_4326.__geo_interface__,
-            name='Densité corrigée',
-            data=gdf_4326,
-            columns=['id', density_column],
-            key_on='feature.properties.id',
-            fill_color=fill_color,
-            fill_opacity=0.8,
-            line_opacity=0.3,
-            legend_name=legend_name,
-            highlight=True,
-            bins=bins,
-        ).add_to(m)
-
-        # Add non-buildable areas as dark overlay if provided
-        if non_buildable_gdf is not None:
-            try:
-                non_buildable_4326 = non_buildable_gdf.to_crs(epsg=4326)
-                folium.GeoJson(
-                    non_buildable_4326.__geo_interface__,
-                    name='Zones non-bâtissables (eau + rails)',
-                    style_function=lambda x: {
-                        'fillColor': '#2F2F2F',  # Dark gray
-                        'color': '#1F1F1F',      # Darker border
-                        'weight': 1,
-                        'fillOpacity': 0.7
-                    },
-                    tooltip='Zone non-bâtissable (exclue du calcul de densité)'
-                ).add_to(m)
-            except Exception as e:
-                print(f"Warning: Could not add non-buildable areas overlay: {e}")
-
-        # Enhanced tooltips showing corrected info
-        folium.GeoJson(
-            gdf_4326,
-            tooltip=folium.features.GeoJsonTooltip(
-                fields=[ref_col, density_column, 'buildable_percentage'],
-                aliases=[ref_label, 'Densité corrigée (m²/m²)', 'Surface bâtissable (%)'],
-                labels=True,
-                style="font-size: 12px; font-weight: bold;",
-                localize=True
-            ),
-            style_function=lambda x: {'fillOpacity': 0, 'color': 'transparent'}
-        ).add_to(m)
-
-        folium.LayerControl(collapsed=False).add_to(m)
-
-        if save_path:
-            m.save(save_path)
-            print(f"Interactive map saved to {save_path}")
-
-        return m
-
-    except ImportError:
-        # Fallback to matplotlib
-        fig, ax = plt.subplots(1, 1, figsize=(12, 10))
-
-        # Use robust color scaling for outliers
-        import matplotlib.colors as mcolors
-        density_values = aggregated_gdf[density_column].dropna()
-        if len(density_values) > 0:
-            # Use percentiles for color scaling
-            vmin = density_values.quantile(0.05)  # 5th percentile
-            vmax = density_values.quantile(0.95)  # 95th percentile
-            norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
-        else:
-            norm = None
-
-        aggregated_gdf.plot(column=density_column, ax=ax, cmap='RdYlBu_r',
-                          legend=True, edgecolor='black', linewidth=0.5, norm=norm)
-        ax.set_title(title, fontsize=16, fontweight='bold')
-        ax.axis('off')
-
-        if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
-            print(f"Static map saved to {save_path}")
-
-        plt.show()
-        return fig
+    renderer = MapRenderer(aggregated_gdf, geo_level)
+    return renderer.render(aggregated_gdf, density_column, variant='corrected',
+                           overlays={'non_buildable': non_buildable_gdf},
+                           title=title, save_path=save_path)
 
 def visualize_ultra_corrected_building_density(aggregated_gdf, density_column, geo_level,
                                              all_non_buildable_gdf=None, green_spaces_gdf=None,
@@ -548,181 +695,44 @@ def visualize_ultra_corrected_building_density(aggregated_gdf, density_column, g
     --------
     folium.Map object
     """
-    try:
-        import folium
-        # Create Folium map
-        gdf_4326 = aggregated_gdf.to_crs(epsg=4326)
-
-        # Add an index column for Folium
-        gdf_4326 = gdf_4326.reset_index()
-        gdf_4326['id'] = gdf_4326.index
-
-        centre_paris = [48.8566, 2.3522]
-        m = folium.Map(location=centre_paris, zoom_start=12, tiles="cartodbdarkmatter")
-
-        # Determine the reference column based on geo_level
-        if geo_level == 'arrondissements':
-            ref_col = 'c_ar'
-            ref_label = 'Arrondissement'
-        elif geo_level == 'quartiers':
-            if 'c_qu' in gdf_4326.columns:
-                ref_col = 'c_qu'
-            elif 'c_qa' in gdf_4326.columns:
-                ref_col = 'c_qa'
-            elif 'n_sq_qu' in gdf_4326.columns:
-                ref_col = 'n_sq_qu'
-            else:
-                ref_col = list(gdf_4326.columns)[0]  # fallback to first column
-            ref_label = 'Quartier'
-        elif geo_level == 'iris':
-            if 'CODE_IRIS' in gdf_4326.columns:
-                ref_col = 'CODE_IRIS'
-            elif 'iris_code' in gdf_4326.columns:
-                ref_col = 'iris_code'
-            elif 'depcom' in gdf_4326.columns:
-                ref_col = 'depcom'
-            else:
-                ref_col = list(gdf_4326.columns)[0]  # fallback to first column
-            ref_label = 'IRIS'
-        else:
-            ref_col = 'id'
-            ref_label = 'Zone'
-
-        # Use consistent YlOrRd color scheme for all levels
-        density_values = gdf_4326[density_column].dropna()
-        if len(density_values) > 0:
-            bins = list(density_values.quantile([0, 0.2, 0.4, 0.6, 0.8, 1.0]))
-            if len(set(bins)) < 3:
-                bins = None
-        else:
-            bins = None
-
-        fill_color = 'YlOrRd'  # Yellow-orange-red color scheme for all maps
-        legend_name = 'Densité ultra-corrigée (m²/m²)'
-
-        choropleth = folium.Choropleth(
-            geo_data=gdf_4326.__geo_interface__,
-            name='Densité ultra-corrigée',
-            data=gdf_4326,
-            columns=['id', density_column],
-            key_on='feature.properties.id',
-            fill_color=fill_color,
-            fill_opacity=0.8,
-            line_opacity=0.3,
-            legend_name=legend_name,
-            highlight=True,
-            bins=bins,
-        ).add_to(m)
-
-        # Add green spaces as green overlay if provided
-        if green_spaces_gdf is not None:
-            try:
-                green_spaces_4326 = green_spaces_gdf.to_crs(epsg=4326)
-                folium.GeoJson(
-                    green_spaces_4326.__geo_interface__,
-                    name='Espaces verts',
-                    style_function=lambda x: {
-                        'fillColor': '#228B22',  # Forest green
-                        'color': '#006400',      # Dark green border
-                        'weight': 1,
-                        'fillOpacity': 0.6       # Semi-transparent
-                    },
-                    tooltip='Espace vert (exclu du calcul de densité)'
-                ).add_to(m)
-            except Exception as e:
-                print(f"Warning: Could not add green spaces overlay: {e}")
-
-        # Add other non-buildable areas (water + railways) as dark overlay
-        if all_non_buildable_gdf is not None:
-            try:
-                non_green_4326 = all_non_buildable_gdf.to_crs(epsg=4326)
-                folium.GeoJson(
-                    non_green_4326.__geo_interface__,
-                    name='Eau + Voies ferrées',
-                    style_function=lambda x: {
-                        'fillColor': '#2F2F2F',  # Dark gray
-                        'color': '#1F1F1F',      # Darker border
-                        'weight': 1,
-                        'fillOpacity': 0.7
-                    },
-                    tooltip='Eau/Voies ferrées (exclus du calcul de densité)'
-                ).add_to(m)
-            except Exception as e:
-                print(f"Warning: Could not add non-buildable areas overlay: {e}")
-
-        # Enhanced tooltips showing ultra-corrected info
-        folium.GeoJson(
-            gdf_4326,
-            tooltip=folium.features.GeoJsonTooltip(
-                fields=[ref_col, density_column, 'buildable_percentage'],
-                aliases=[ref_label, 'Densité ultra-corrigée (m²/m²)', 'Surface ultra-bâtissable (%)'],
-                labels=True,
-                style="font-size: 12px; font-weight: bold;",
-                localize=True
-            ),
-            style_function=lambda x: {'fillOpacity': 0, 'color': 'transparent'}
-        ).add_to(m)
-
-        folium.LayerControl(collapsed=False).add_to(m)
-
-        if save_path:
-            m.save(save_path)
-            print(f"Interactive map saved to {save_path}")
-
-        return m
-
-    except ImportError:
-        # Fallback to matplotlib
-        fig, ax = plt.subplots(1, 1, figsize=(12, 10))
-
-        # Use robust color scaling for outliers
-        import matplotlib.colors as mcolors
-        density_values = aggregated_gdf[density_column].dropna()
-        if len(density_values) > 0:
-            # Use percentiles for color scaling
-            vmin = density_values.quantile(0.05)  # 5th percentile
-            vmax = density_values.quantile(0.95)  # 95th percentile
-            norm = mcolors.Normalize(vmin=vmin, vmax=vmax)
-        else:
-            norm = None
+    renderer = MapRenderer(aggregated_gdf, geo_level)
+    return renderer.render(aggregated_gdf, density_column, variant='ultra_corrected',
+                           overlays={'green_spaces': green_spaces_gdf,
+                                     'all_non_buildable': all_non_buildable_gdf},
+                           title=title, save_path=save_path)
 
-        aggregated_gdf.plot(column=density_column, ax=ax, cmap='RdYlBu_r',
-                          legend=True, edgecolor='black', linewidth=0.5, norm=norm)
-        ax.set_title(title, fontsize=16, fontweight='bold')
-        ax.axis('off')
-
-        if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
-            print(f"Static map saved to {save_path}")
-
-        plt.show()
-        return fig
-
-def main():
+def main(levels=None, variants=None):
     """
     Main function to generate all Paris building density maps and return processed data.
 
+    Parameters:
+    -----------
+    levels : list of str, optional
+        Geographic levels to map (default: all three)
+    variants : list of str, optional
+        Density variants to map (default: all three); unneeded masks are not downloaded
+
     Returns:
     --------
     dict
         Dictionary containing all processed DataFrames organized by geographic level
     """
+    levels = list(levels) if levels is not None else ['arrondissements', 'quartiers', 'iris']
+    variants = list(variants) if variants is not None else ['raw', 'corrected', 'ultra_corrected']
+
     print("=" * 60)
     print("PARIS BUILDING DENSITY ANALYSIS")
     print("=" * 60)
 
     # Initialize results dictionary
-    results = {
-        'arrondissements': {},
-        'quartiers': {},
-        'iris': {}
-    }
+    results = {geo_level: {} for geo_level in levels}
 
-    # Load geographic layers
+    # Load geographic layers (only the requested levels)
     print("\n1. Loading geographic layers...")
     geo = GeoDataParis()
-    geo_data = geo.load_all()
-    visualiser_maillages(geo_data)
+    geo_data = geo.load_all(levels)
+    if len(levels) == 3:
+        visualiser_maillages(geo_data)
 
     # Load building data
     print("\n2. Loading building data...")
@@ -730,46 +740,60 @@ def main():
 
     # Load non-buildable areas
     print("\n3. Loading non-buildable areas...")
-    non_buildable = load_non_buildable_areas()
+    non_buildable = load_non_buildable_areas() if 'corrected' in variants else None
+    all_non_buildable, green_spaces = (load_all_nonbuildable_areas(non_buildable=non_buildable)
+                                       if 'ultra_corrected' in variants else (None, None))
 
     # Generate all density maps
     print("\n4. Generating building density maps...")
 
-    for geo_level in ['arrondissements', 'quartiers', 'iris']:
+    # Overlays are reprojected once and shared by the renderers of all levels
+    overlay_cache = {}
+
+    for geo_level in levels:
         print(f"\n--- {geo_level.title()} ---")
 
         # Get appropriate geographic divisions
         geo_divisions = geo_data[geo_level]
 
+        # Prepare the map renderer once for the three variants of this level
+        renderer = MapRenderer(geo_divisions, geo_level, overlay_cache=overlay_cache)
+
         # Create raw density map
-        print("Creating raw density map...")
-        raw_data, _ = create_building_density_map(buildings, geo_divisions, geo_level)
-        results[geo_level]['raw'] = raw_data
+        if 'raw' in variants:
+            print("Creating raw density map...")
+            raw_data, _ = create_building_density_map(buildings, geo_divisions, geo_level, renderer=renderer)
+            results[geo_level]['raw'] = raw_data
 
         # Create corrected density map (excluding water + railways)
-        print("Creating corrected density map...")
-        corrected_data, _ = create_corrected_building_density_map(buildings, geo_divisions, non_buildable, geo_level)
-        results[geo_level]['corrected'] = corrected_data
+        if 'corrected' in variants:
+            print("Creating corrected density map...")
+            corrected_data, _ = create_corrected_building_density_map(buildings, geo_divisions, non_buildable,
+                                                                      geo_level, renderer=renderer)
+            results[geo_level]['corrected'] = corrected_data
 
         # Create ultra-corrected density map (excluding water + railways + green spaces)
-        print("Creating ultra-corrected density map...")
-        ultra_corrected_data, _ = create_ultra_corrected_building_density_map(buildings, geo_divisions, geo_level)
-        results[geo_level]['ultra_corrected'] = ultra_corrected_data
+        if 'ultra_corrected' in variants:
+            print("Creating ultra-corrected density map...")
+            ultra_corrected_data, _ = create_ultra_corrected_building_density_map(
+                buildings, geo_divisions, geo_level, renderer=renderer,
+                all_non_buildable=all_non_buildable, green_spaces=green_spaces
+            )
+            results[geo_level]['ultra_corrected'] = ultra_corrected_data
 
     print("\n" + "=" * 60)
     print("COMPLETED: All building density maps created")
-    print("Raw density maps:")
-    print("- building_density_arrondissements.html")
-    print("- building_density_quartiers.html")
-    print("- building_density_iris.html")
-    print("\nCorrected density maps (excluding water & railways):")
-    print("- building_density_corrected_arrondissements.html")
-    print("- building_density_corrected_quartiers.html")
-    print("- building_density_corrected_iris.html")
-    print("\nUltra-corrected density maps (excluding water + railways + green spaces):")
-    print("- building_density_ultra_corrected_arrondissements.html")
-    print("- building_density_ultra_corrected_quartiers.html")
-    print("- building_density_ultra_corrected_iris.html")
+    headings = {
+        'raw': ("Raw density maps:", 'building_density_{}.html'),
+        'corrected': ("Corrected density maps (excluding water & railways):", 'building_density_corrected_{}.html'),
+        'ultra_corrected': ("Ultra-corrected density maps (excluding water + railways + green spaces):",
+                            'building_density_ultra_corrected_{}.html'),
+    }
+    for i, variant in enumerate(variants):
+        heading, pattern = headings[variant]
+        print(("\n" if i else "") + heading)
+        for geo_level in levels:
+            print(f"- {pattern.format(geo_level)}")
     print("=" * 60)
 
     return results
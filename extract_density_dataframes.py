@@ -3,148 +3,258 @@ Extract Building Density DataFrames
 Creates tidy dataframes for arrondissements, quartiers, and iris with surface areas and density metrics
 """
 
+import argparse
 import pandas as pd
 from pathlib import Path
-from decoupagegeo import GeoDataParis, load_building_data, load_non_buildable_areas, load_all_nonbuildable_areas
-from annexfunctions import aggregate_by_geographic_division, calculate_density, calculate_corrected_density, create_buildable_geometries
+from decoupagegeo import (GeoDataParis, load_building_data, load_non_buildable_areas, load_all_nonbuildable_areas,
+                          render_density_maps)
+from unionengine import union_layers
+from overlaps import OverlapMatrix, VARIANT_COMPONENTS
+from annexfunctions import create_buildable_geometries, load_mask_components
+from incidence import cached_incidence
+from zonetable import ZoneTable, safe_ratio, CRS_PARIS
+from building_store import BuildingStore, DEFAULT_STORE_DIR
+from partitioning import aggregate_partitioned, DEFAULT_MEMORY_BUDGET_MB
+
+LEVELS = ['arrondissements', 'quartiers', 'iris']
+VARIANTS = ['raw', 'corrected', 'ultra_corrected']
+OUTPUT_FORMATS = {'csv': 'csv', 'geojson': 'geojson', 'gpkg': 'gpkg'}
+
+# Identifier and name columns of each level: (output column, layer candidates, fallback)
+LEVEL_IDENTIFIERS = {
+    'arrondissements': [('arr_id', ['c_ar'], None), ('arr_name', ['l_ar'], 'Unknown')],
+    'quartiers': [('quartier_id', ['c_qu', 'c_qa'], None), ('quartier_name', ['l_qu', 'l_qa'], 'Unknown')],
+    'iris': [('iris_code', ['CODE_IRIS', 'iris_code'], None), ('iris_name', ['LIB_IRIS'], 'Unknown')],
+}
+LEVEL_LABELS = {'arrondissements': 'arrondissements', 'quartiers': 'quartiers', 'iris': 'IRIS'}
+LEVEL_TITLES = {'arrondissements': 'Arrondissements', 'quartiers': 'Quartiers', 'iris': 'IRIS'}
+
+# Non-buildable mask and column suffix used by each corrected variant
+VARIANT_MASKS = {
+    'corrected': ('non_buildable', 'corrected'),
+    'ultra_corrected': ('all_non_buildable', 'ultra'),
+}
+
+def plan_inputs(levels=None, variants=None, maps=False):
+    """
+    Work out which inputs a selection of levels and variants needs.
+
+    Parameters:
+    -----------
+    levels : list of str, optional
+        Geographic levels (default: all three)
+    variants : list of str, optional
+        Density variants (default: all three)
+    maps : bool
+        Whether maps will be rendered (green spaces are only needed as an overlay)
+
+    Returns:
+    --------
+    dict
+        levels, variants and the inputs to load
+    """
+    levels = list(levels) if levels is not None else list(LEVELS)
+    variants = list(variants) if variants is not None else list(VARIANTS)
+    for level in levels:
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level '{level}' (expected one of {LEVELS})")
+    for variant in variants:
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown variant '{variant}' (expected one of {VARIANTS})")
+
+    return {
+        'levels': levels,
+        'variants': variants,
+        'maps': maps,
+        'non_buildable': 'corrected' in variants,
+        'all_non_buildable': 'ultra_corrected' in variants,
+    }
+
+def load_inputs(plan, geo=None, memory_budget_mb=None, store_dir=DEFAULT_STORE_DIR, component_overlaps=False):
+    """
+    Load only the inputs required by a plan from plan_inputs.
+
+    Parameters:
+    -----------
+    plan : dict
+        Plan from plan_inputs
+    geo : GeoDataParis, optional
+        Layer manager
+    memory_budget_mb : float, optional
+        When set, buildings are opened as a memory-mapped store (compiled on first use)
+        and aggregated partition by partition within this budget
+    store_dir : str
+        Building store directory used with memory_budget_mb
+    component_overlaps : bool
+        Load water, railways and green spaces as separate components (see overlaps);
+        the unioned masks are then only built when maps are rendered
+
+    Returns:
+    --------
+    dict
+        geo, buildings, non_buildable, all_non_buildable, green_spaces, components
+        (None when not needed)
+    """
+    inputs = {'geo': geo if geo is not None else GeoDataParis(),
+              'non_buildable': None, 'all_non_buildable': None, 'green_spaces': None, 'components': None}
+    for level in plan['levels']:
+        inputs['geo'].get_layer(level)
+    if memory_budget_mb is None:
+        inputs['buildings'] = load_building_data()
+    else:
+        if not BuildingStore.exists(store_dir):
+            load_building_data(store_dir)
+        inputs['buildings'] = BuildingStore(store_dir)
+    if component_overlaps and (plan['non_buildable'] or plan['all_non_buildable']):
+        components = load_mask_components()
+        inputs['components'] = components
+        if plan['maps']:
+            # Map overlays still need the unioned masks
+            inputs['non_buildable'] = union_layers([components['water'], components['rail']])
+            inputs['all_non_buildable'] = union_layers([inputs['non_buildable'], components['green']])
+            inputs['green_spaces'] = components['green']
+        return inputs
+    if plan['non_buildable']:
+        inputs['non_buildable'] = load_non_buildable_areas()
+    if plan['all_non_buildable']:
+        inputs['all_non_buildable'], inputs['green_spaces'] = load_all_nonbuildable_areas(
+            non_buildable=inputs['non_buildable'])
+    return inputs
+
+def building_volume(buildings, zones, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Total building floor area (M2_PL_TOT) intersecting each zone, in zone order.
+
+    Parameters:
+    -----------
+    buildings : GeoDataFrame or BuildingStore
+        Building data, or a compiled store aggregated out-of-core
+    zones : GeoDataFrame
+        Geographic divisions
+    memory_budget_mb : float
+        Partition budget when buildings is a BuildingStore
+
+    Returns:
+    --------
+    ndarray
+    """
+    if isinstance(buildings, BuildingStore):
+        aggregated = aggregate_partitioned(
+            buildings, zones, value_column='M2_PL_TOT', agg_method='sum', memory_budget_mb=memory_budget_mb
+        )
+        return aggregated['M2_PL_TOT_sum'].to_numpy()
+    # Sparse product with the cached zone-by-building incidence matrix
+    return cached_incidence(buildings, zones).dot(buildings['M2_PL_TOT'].to_numpy())
 
-def create_arrondissements_dataframe():
+def create_level_dataframe(level, geo=None, buildings=None, non_buildable=None, all_non_buildable=None,
+                           variants=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, components=None):
     """
-    Create comprehensive dataframe for Paris arrondissements with all density metrics.
+    Create comprehensive dataframe for one geographic level with the requested density metrics.
+
+    Inputs that are not provided are loaded (only those the variants need).
+
+    Parameters:
+    -----------
+    level : str
+        'arrondissements', 'quartiers', or 'iris'
+    geo : GeoDataParis, optional
+        Layer manager
+    buildings : GeoDataFrame or BuildingStore, optional
+        Building data from load_building_data, or a compiled store aggregated
+        out-of-core (see partitioning)
+    non_buildable : GeoDataFrame, optional
+        Water + railways (needed by the corrected variant)
+    all_non_buildable : GeoDataFrame, optional
+        Water + railways + green spaces (needed by the ultra-corrected variant)
+    variants : list of str, optional
+        Density variants to compute (default: all three)
+    memory_budget_mb : float
+        Partition budget when buildings is a BuildingStore
+    components : dict, optional
+        Separate mask components from load_mask_components; buildable areas are then
+        derived from one overlap matrix instead of one overlay per variant
+
+    Returns:
+    --------
+    GeoDataFrame
     """
-    print("Creating Arrondissements DataFrame...")
+    variants = list(variants) if variants is not None else list(VARIANTS)
+    label = LEVEL_LABELS[level]
+    print(f"Creating {LEVEL_TITLES[level]} DataFrame...")
 
-    # Load geographic data
-    geo = GeoDataParis()
-    geo_data = geo.load_all()
-    buildings = load_building_data()
+    # Load geographic data (only this level's layer is fetched)
+    geo = geo if geo is not None else GeoDataParis()
+    zones = geo.get_layer(level)
+    if buildings is None:
+        buildings = load_building_data()
 
     # Load non-buildable areas
-    non_buildable = load_non_buildable_areas()
-    all_non_buildable, green_spaces = load_all_nonbuildable_areas()
-
-    arrondissements = geo_data['arrondissements']
-
-    # Calculate areas for original arrondissements
-    arrondissements_with_areas = arrondissements.copy()
-    arrondissements_with_areas['total_area_m2'] = arrondissements.geometry.area
-    arrondissements_with_areas['total_area_km2'] = arrondissements_with_areas['total_area_m2'] / 1_000_000
-
-    # Calculate buildable areas (excluding water + railways)
-    buildable_areas_corrected = create_buildable_geometries(arrondissements, non_buildable)
-
-    # Calculate ultra-buildable areas (excluding water + railways + green spaces)
-    buildable_areas_ultra = create_buildable_geometries(arrondissements, all_non_buildable)
-
-    # Merge area information
-    arrondissements_complete = arrondissements_with_areas.merge(
-        buildable_areas_corrected[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True, right_index=True, how='left', suffixes=('', '_corrected')
-    ).merge(
-        buildable_areas_ultra[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True, right_index=True, how='left', suffixes=('', '_ultra')
-    )
-
-    # Rename columns for clarity
-    arrondissements_complete = arrondissements_complete.rename(columns={
-        'buildable_area_m2': 'buildable_area_m2_corrected',
-        'buildable_percentage': 'buildable_percentage_corrected',
-        'buildable_area_m2_ultra': 'buildable_area_m2_ultra',
-        'buildable_percentage_ultra': 'buildable_percentage_ultra'
-    })
-
-    # Calculate excluded areas
-    arrondissements_complete['excluded_area_m2_corrected'] = (
-        arrondissements_complete['total_area_m2'] - arrondissements_complete['buildable_area_m2_corrected']
-    )
-    arrondissements_complete['excluded_percentage_corrected'] = (
-        100 - arrondissements_complete['buildable_percentage_corrected']
-    )
-
-    arrondissements_complete['excluded_area_m2_ultra'] = (
-        arrondissements_complete['total_area_m2'] - arrondissements_complete['buildable_area_m2_ultra']
-    )
-    arrondissements_complete['excluded_percentage_ultra'] = (
-        100 - arrondissements_complete['buildable_percentage_ultra']
-    )
-
-    # Convert areas to km²
-    arrondissements_complete['buildable_area_km2_corrected'] = arrondissements_complete['buildable_area_m2_corrected'] / 1_000_000
-    arrondissements_complete['excluded_area_km2_corrected'] = arrondissements_complete['excluded_area_m2_corrected'] / 1_000_000
-    arrondissements_complete['buildable_area_km2_ultra'] = arrondissements_complete['buildable_area_m2_ultra'] / 1_000_000
-    arrondissements_complete['excluded_area_km2_ultra'] = arrondissements_complete['excluded_area_m2_ultra'] / 1_000_000
+    masks = {'non_buildable': non_buildable, 'all_non_buildable': all_non_buildable}
+    overlaps = None
+    if components is not None:
+        needed = {name for variant in variants for name in VARIANT_COMPONENTS.get(variant, ())}
+        if needed:
+            overlaps = OverlapMatrix(zones, {name: components[name] for name in components if name in needed})
+    else:
+        if 'corrected' in variants and masks['non_buildable'] is None:
+            masks['non_buildable'] = load_non_buildable_areas()
+        if 'ultra_corrected' in variants and masks['all_non_buildable'] is None:
+            masks['all_non_buildable'], _ = load_all_nonbuildable_areas(non_buildable=masks['non_buildable'])
+
+    # Zone metrics are aligned arrays: no merge, and the geometry is stored once
+    table = ZoneTable(zones, level)
+
+    # Calculate areas for original zones
+    table['total_area_m2'] = zones.geometry.area
+    table['total_area_km2'] = table['total_area_m2'] / 1_000_000
+
+    # Calculate buildable and excluded areas for each corrected variant
+    buildable_areas = {}
+    for variant in variants:
+        if variant not in VARIANT_MASKS:
+            continue
+        mask_key, suffix = VARIANT_MASKS[variant]
+        if overlaps is not None:
+            buildable = overlaps.buildable_area(VARIANT_COMPONENTS[variant])
+        else:
+            buildable = create_buildable_geometries(zones, masks[mask_key])
+
+        table[f'buildable_area_m2_{suffix}'] = buildable['buildable_area_m2']
+        table[f'buildable_percentage_{suffix}'] = buildable['buildable_percentage']
+        buildable_areas[variant] = table[f'buildable_area_m2_{suffix}']
+        table[f'excluded_area_m2_{suffix}'] = table['total_area_m2'] - table[f'buildable_area_m2_{suffix}']
+        table[f'excluded_percentage_{suffix}'] = 100 - table[f'buildable_percentage_{suffix}']
+
+        # Convert areas to km²
+        table[f'buildable_area_km2_{suffix}'] = table[f'buildable_area_m2_{suffix}'] / 1_000_000
+        table[f'excluded_area_km2_{suffix}'] = table[f'excluded_area_m2_{suffix}'] / 1_000_000
+
+    # Building surface is aggregated once and shared by every variant
+    volume = building_volume(buildings, zones, memory_budget_mb)
 
     # Process density calculations for each type
-    for density_type in ['raw', 'corrected', 'ultra_corrected']:
+    for density_type in variants:
         print(f"  Processing {density_type} density calculations...")
 
         if density_type == 'raw':
-            # Raw density: building area / total area
-            aggregated = aggregate_by_geographic_division(
-                buildings, arrondissements, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            density_data = calculate_density(aggregated, 'M2_PL_TOT_sum')
-            density_col = 'M2_PL_TOT_sum_density_m2_m2'
-
-        elif density_type == 'corrected':
-            # Corrected density: building area / buildable area (excluding water + railways)
-            aggregated = aggregate_by_geographic_division(
-                buildings, arrondissements, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            # Merge with buildable areas
-            aggregated_with_areas = aggregated.merge(
-                buildable_areas_corrected[['buildable_area_m2']],
-                left_index=True, right_index=True, how='left'
-            )
-            density_data = calculate_corrected_density(
-                aggregated_with_areas, 'M2_PL_TOT_sum', 'buildable_area_m2'
-            )
-            density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
-
-        elif density_type == 'ultra_corrected':
-            # Ultra-corrected density: building area / ultra-buildable area (excluding water + railways + green)
-            aggregated = aggregate_by_geographic_division(
-                buildings, arrondissements, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            # Merge with ultra-buildable areas
-            aggregated_with_areas = aggregated.merge(
-                buildable_areas_ultra[['buildable_area_m2']],
-                left_index=True, right_index=True, how='left'
-            )
-            density_data = calculate_corrected_density(
-                aggregated_with_areas, 'M2_PL_TOT_sum', 'buildable_area_m2'
-            )
-            density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
-
-        # Extract relevant columns and merge
-        # Note: calculate_density doesn't return area_km2, only the density column
-        density_cols_to_keep = [density_col, 'M2_PL_TOT_sum']
-        density_extract = density_data[density_cols_to_keep].copy()
-
-        # Rename columns to include density type
-        rename_dict = {}
-        for col in density_extract.columns:
-            if col == 'M2_PL_TOT_sum':
-                rename_dict[col] = f'building_volume_m2_{density_type}'
-            elif col == 'area_km2':
-                rename_dict[col] = f'area_km2_{density_type}'
-            elif density_col in col:
-                rename_dict[col] = f'density_m2_m2_{density_type}'
-
-        density_extract = density_extract.rename(columns=rename_dict)
-
-        # Merge with main dataframe
-        arrondissements_complete = arrondissements_complete.merge(
-            density_extract, left_index=True, right_index=True, how='left'
-        )
-
-    # Add arrondissement identifiers
-    arrondissements_complete['arr_id'] = arrondissements_complete.get('c_ar', arrondissements_complete.index)
-    arrondissements_complete['arr_name'] = arrondissements_complete.get('l_ar', 'Unknown')
+            # Raw density: building area / total (projected) area
+            table[f'density_m2_m2_{density_type}'] = safe_ratio(volume, table.area(CRS_PARIS))
+        else:
+            # Corrected densities: building area / buildable area
+            table[f'density_m2_m2_{density_type}'] = safe_ratio(volume, buildable_areas[density_type])
+        table[f'building_volume_m2_{density_type}'] = volume
+
+    # Add zone identifiers
+    for column, candidates, fallback in LEVEL_IDENTIFIERS[level]:
+        source = next((col for col in candidates if col in table), None)
+        if source is not None:
+            table[column] = table[source]
+        else:
+            table[column] = table.labels.to_numpy() if fallback is None else fallback
 
     # Reorder columns for clarity
-    priority_cols = [
-        'arr_id', 'arr_name', 'total_area_km2',
+    priority_cols = [col for col, _, _ in LEVEL_IDENTIFIERS[level]] + [
+        'total_area_km2',
         'buildable_percentage_corrected', 'excluded_percentage_corrected',
         'buildable_area_km2_corrected', 'excluded_area_km2_corrected',
         'buildable_percentage_ultra', 'excluded_percentage_ultra',
@@ -154,322 +264,109 @@ def create_arrondissements_dataframe():
     ]
 
     # Keep only existing columns
-    final_cols = [col for col in priority_cols if col in arrondissements_complete.columns]
-    other_cols = [col for col in arrondissements_complete.columns if col not in final_cols]
-    arrondissements_complete = arrondissements_complete[final_cols + other_cols]
+    all_cols = table.source_columns + [col for col in table.columns if col not in table.source_columns]
+    final_cols = [col for col in priority_cols if col in all_cols]
+    other_cols = [col for col in all_cols if col not in final_cols]
+    complete = table.to_geodataframe(final_cols + other_cols)
 
-    print(f"Created arrondissements dataframe: {arrondissements_complete.shape[0]} rows × {arrondissements_complete.shape[1]} columns")
-    return arrondissements_complete
+    print(f"Created {label} dataframe: {complete.shape[0]} rows × {complete.shape[1]} columns")
+    return complete
+
+def create_arrondissements_dataframe():
+    """
+    Create comprehensive dataframe for Paris arrondissements with all density metrics.
+    """
+    return create_level_dataframe('arrondissements')
 
 def create_quartiers_dataframe():
     """
     Create comprehensive dataframe for Paris quartiers with all density metrics.
     """
-    print("Creating Quartiers DataFrame...")
-
-    # Load geographic data
-    geo = GeoDataParis()
-    geo_data = geo.load_all()
-    buildings = load_building_data()
-
-    # Load non-buildable areas
-    non_buildable = load_non_buildable_areas()
-    all_non_buildable, green_spaces = load_all_nonbuildable_areas()
-
-    quartiers = geo_data['quartiers']
-
-    # Calculate areas for original quartiers
-    quartiers_with_areas = quartiers.copy()
-    quartiers_with_areas['total_area_m2'] = quartiers.geometry.area
-    quartiers_with_areas['total_area_km2'] = quartiers_with_areas['total_area_m2'] / 1_000_000
-
-    # Calculate buildable areas
-    buildable_areas_corrected = create_buildable_geometries(quartiers, non_buildable)
-    buildable_areas_ultra = create_buildable_geometries(quartiers, all_non_buildable)
-
-    # Merge area information
-    quartiers_complete = quartiers_with_areas.merge(
-        buildable_areas_corrected[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True, right_index=True, how='left', suffixes=('', '_corrected')
-    ).merge(
-        buildable_areas_ultra[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True, right_index=True, how='left', suffixes=('', '_ultra')
-    )
-
-    # Rename columns for clarity
-    quartiers_complete = quartiers_complete.rename(columns={
-        'buildable_area_m2': 'buildable_area_m2_corrected',
-        'buildable_percentage': 'buildable_percentage_corrected',
-        'buildable_area_m2_ultra': 'buildable_area_m2_ultra',
-        'buildable_percentage_ultra': 'buildable_percentage_ultra'
-    })
-
-    # Calculate excluded areas
-    quartiers_complete['excluded_area_m2_corrected'] = (
-        quartiers_complete['total_area_m2'] - quartiers_complete['buildable_area_m2_corrected']
-    )
-    quartiers_complete['excluded_percentage_corrected'] = (
-        100 - quartiers_complete['buildable_percentage_corrected']
-    )
-
-    quartiers_complete['excluded_area_m2_ultra'] = (
-        quartiers_complete['total_area_m2'] - quartiers_complete['buildable_area_m2_ultra']
-    )
-    quartiers_complete['excluded_percentage_ultra'] = (
-        100 - quartiers_complete['buildable_percentage_ultra']
-    )
-
-    # Convert areas to km²
-    quartiers_complete['buildable_area_km2_corrected'] = quartiers_complete['buildable_area_m2_corrected'] / 1_000_000
-    quartiers_complete['excluded_area_km2_corrected'] = quartiers_complete['excluded_area_m2_corrected'] / 1_000_000
-    quartiers_complete['buildable_area_km2_ultra'] = quartiers_complete['buildable_area_m2_ultra'] / 1_000_000
-    quartiers_complete['excluded_area_km2_ultra'] = quartiers_complete['excluded_area_m2_ultra'] / 1_000_000
-
-    # Process density calculations for each type
-    for density_type in ['raw', 'corrected', 'ultra_corrected']:
-        print(f"  Processing {density_type} density calculations...")
-
-        if density_type == 'raw':
-            aggregated = aggregate_by_geographic_division(
-                buildings, quartiers, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            density_data = calculate_density(aggregated, 'M2_PL_TOT_sum')
-            density_col = 'M2_PL_TOT_sum_density_m2_m2'
-
-        elif density_type == 'corrected':
-            aggregated = aggregate_by_geographic_division(
-                buildings, quartiers, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            aggregated_with_areas = aggregated.merge(
-                buildable_areas_corrected[['buildable_area_m2']],
-                left_index=True, right_index=True, how='left'
-            )
-            density_data = calculate_corrected_density(
-                aggregated_with_areas, 'M2_PL_TOT_sum', 'buildable_area_m2'
-            )
-            density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
-
-        elif density_type == 'ultra_corrected':
-            aggregated = aggregate_by_geographic_division(
-                buildings, quartiers, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            aggregated_with_areas = aggregated.merge(
-                buildable_areas_ultra[['buildable_area_m2']],
-                left_index=True, right_index=True, how='left'
-            )
-            density_data = calculate_corrected_density(
-                aggregated_with_areas, 'M2_PL_TOT_sum', 'buildable_area_m2'
-            )
-            density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
-
-        # Extract relevant columns and merge
-        density_cols_to_keep = [density_col, 'M2_PL_TOT_sum']
-        density_extract = density_data[density_cols_to_keep].copy()
-
-        # Rename columns to include density type
-        rename_dict = {}
-        for col in density_extract.columns:
-            if col == 'M2_PL_TOT_sum':
-                rename_dict[col] = f'building_volume_m2_{density_type}'
-            elif col == 'area_km2':
-                rename_dict[col] = f'area_km2_{density_type}'
-            elif density_col in col:
-                rename_dict[col] = f'density_m2_m2_{density_type}'
-
-        density_extract = density_extract.rename(columns=rename_dict)
-
-        # Merge with main dataframe
-        quartiers_complete = quartiers_complete.merge(
-            density_extract, left_index=True, right_index=True, how='left'
-        )
-
-    # Add quartier identifiers
-    quartiers_complete['quartier_id'] = quartiers_complete.get('c_qu', quartiers_complete.get('c_qa', quartiers_complete.index))
-    quartiers_complete['quartier_name'] = quartiers_complete.get('l_qu', quartiers_complete.get('l_qa', 'Unknown'))
-
-    # Reorder columns for clarity
-    priority_cols = [
-        'quartier_id', 'quartier_name', 'total_area_km2',
-        'buildable_percentage_corrected', 'excluded_percentage_corrected',
-        'buildable_area_km2_corrected', 'excluded_area_km2_corrected',
-        'buildable_percentage_ultra', 'excluded_percentage_ultra',
-        'buildable_area_km2_ultra', 'excluded_area_km2_ultra',
-        'density_m2_m2_raw', 'density_m2_m2_corrected', 'density_m2_m2_ultra_corrected',
-        'building_volume_m2_raw', 'building_volume_m2_corrected', 'building_volume_m2_ultra_corrected'
-    ]
-
-    # Keep only existing columns
-    final_cols = [col for col in priority_cols if col in quartiers_complete.columns]
-    other_cols = [col for col in quartiers_complete.columns if col not in final_cols]
-    quartiers_complete = quartiers_complete[final_cols + other_cols]
-
-    print(f"Created quartiers dataframe: {quartiers_complete.shape[0]} rows × {quartiers_complete.shape[1]} columns")
-    return quartiers_complete
+    return create_level_dataframe('quartiers')
 
 def create_iris_dataframe():
     """
     Create comprehensive dataframe for Paris IRIS with all density metrics.
     """
-    print("Creating IRIS DataFrame...")
-
-    # Load geographic data
-    geo = GeoDataParis()
-    geo_data = geo.load_all()
-    buildings = load_building_data()
-
-    # Load non-buildable areas
-    non_buildable = load_non_buildable_areas()
-    all_non_buildable, green_spaces = load_all_nonbuildable_areas()
-
-    iris = geo_data['iris']
-
-    # Calculate areas for original iris
-    iris_with_areas = iris.copy()
-    iris_with_areas['total_area_m2'] = iris.geometry.area
-    iris_with_areas['total_area_km2'] = iris_with_areas['total_area_m2'] / 1_000_000
-
-    # Calculate buildable areas
-    buildable_areas_corrected = create_buildable_geometries(iris, non_buildable)
-    buildable_areas_ultra = create_buildable_geometries(iris, all_non_buildable)
-
-    # Merge area information
-    iris_complete = iris_with_areas.merge(
-        buildable_areas_corrected[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True, right_index=True, how='left', suffixes=('', '_corrected')
-    ).merge(
-        buildable_areas_ultra[['buildable_area_m2', 'buildable_percentage']],
-        left_index=True, right_index=True, how='left', suffixes=('', '_ultra')
-    )
-
-    # Rename columns for clarity
-    iris_complete = iris_complete.rename(columns={
-        'buildable_area_m2': 'buildable_area_m2_corrected',
-        'buildable_percentage': 'buildable_percentage_corrected',
-        'buildable_area_m2_ultra': 'buildable_area_m2_ultra',
-        'buildable_percentage_ultra': 'buildable_percentage_ultra'
-    })
-
-    # Calculate excluded areas
-    iris_complete['excluded_area_m2_corrected'] = (
-        iris_complete['total_area_m2'] - iris_complete['buildable_area_m2_corrected']
-    )
-    iris_complete['excluded_percentage_corrected'] = (
-        100 - iris_complete['buildable_percentage_corrected']
-    )
-
-    iris_complete['excluded_area_m2_ultra'] = (
-        iris_complete['total_area_m2'] - iris_complete['buildable_area_m2_ultra']
-    )
-    iris_complete['excluded_percentage_ultra'] = (
-        100 - iris_complete['buildable_percentage_ultra']
-    )
-
-    # Convert areas to km²
-    iris_complete['buildable_area_km2_corrected'] = iris_complete['buildable_area_m2_corrected'] / 1_000_000
-    iris_complete['excluded_area_km2_corrected'] = iris_complete['excluded_area_m2_corrected'] / 1_000_000
-    iris_complete['buildable_area_km2_ultra'] = iris_complete['buildable_area_m2_ultra'] / 1_000_000
-    iris_complete['excluded_area_km2_ultra'] = iris_complete['excluded_area_m2_ultra'] / 1_000_000
-
-    # Process density calculations for each type
-    for density_type in ['raw', 'corrected', 'ultra_corrected']:
-        print(f"  Processing {density_type} density calculations...")
+    return create_level_dataframe('iris')
 
-        if density_type == 'raw':
-            aggregated = aggregate_by_geographic_division(
-                buildings, iris, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            density_data = calculate_density(aggregated, 'M2_PL_TOT_sum')
-            density_col = 'M2_PL_TOT_sum_density_m2_m2'
-
-        elif density_type == 'corrected':
-            aggregated = aggregate_by_geographic_division(
-                buildings, iris, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            aggregated_with_areas = aggregated.merge(
-                buildable_areas_corrected[['buildable_area_m2']],
-                left_index=True, right_index=True, how='left'
-            )
-            density_data = calculate_corrected_density(
-                aggregated_with_areas, 'M2_PL_TOT_sum', 'buildable_area_m2'
-            )
-            density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
-
-        elif density_type == 'ultra_corrected':
-            aggregated = aggregate_by_geographic_division(
-                buildings, iris, value_column='M2_PL_TOT', agg_method='sum'
-            )
-            aggregated_with_areas = aggregated.merge(
-                buildable_areas_ultra[['buildable_area_m2']],
-                left_index=True, right_index=True, how='left'
-            )
-            density_data = calculate_corrected_density(
-                aggregated_with_areas, 'M2_PL_TOT_sum', 'buildable_area_m2'
-            )
-            density_col = 'M2_PL_TOT_sum_corrected_density_m2_m2'
-
-        # Extract relevant columns and merge
-        density_cols_to_keep = [density_col, 'M2_PL_TOT_sum']
-        density_extract = density_data[density_cols_to_keep].copy()
-
-        # Rename columns to include density type
-        rename_dict = {}
-        for col in density_extract.columns:
-            if col == 'M2_PL_TOT_sum':
-                rename_dict[col] = f'building_volume_m2_{density_type}'
-            elif col == 'area_km2':
-                rename_dict[col] = f'area_km2_{density_type}'
-            elif density_col in col:
-                rename_dict[col] = f'density_m2_m2_{density_type}'
-
-        density_extract = density_extract.rename(columns=rename_dict)
-
-        # Merge with main dataframe
-        iris_complete = iris_complete.merge(
-            density_extract, left_index=True, right_index=True, how='left'
-        )
-
-    # Add IRIS identifiers
-    iris_complete['iris_code'] = iris_complete.get('CODE_IRIS', iris_complete.get('iris_code', iris_complete.index))
-    iris_complete['iris_name'] = iris_complete.get('LIB_IRIS', 'Unknown')
-
-    # Reorder columns for clarity
-    priority_cols = [
-        'iris_code', 'iris_name', 'total_area_km2',
-        'buildable_percentage_corrected', 'excluded_percentage_corrected',
-        'buildable_area_km2_corrected', 'excluded_area_km2_corrected',
-        'buildable_percentage_ultra', 'excluded_percentage_ultra',
-        'buildable_area_km2_ultra', 'excluded_area_km2_ultra',
-        'density_m2_m2_raw', 'density_m2_m2_corrected', 'density_m2_m2_ultra_corrected',
-        'building_volume_m2_raw', 'building_volume_m2_corrected', 'building_volume_m2_ultra_corrected'
-    ]
-
-    # Keep only existing columns
-    final_cols = [col for col in priority_cols if col in iris_complete.columns]
-    other_cols = [col for col in iris_complete.columns if col not in final_cols]
-    iris_complete = iris_complete[final_cols + other_cols]
-
-    print(f"Created IRIS dataframe: {iris_complete.shape[0]} rows × {iris_complete.shape[1]} columns")
-    return iris_complete
+def save_level_dataframe(df, level, output_dir="data", output_format='csv'):
+    """
+    Save one level dataframe as paris_{level}_complete.{csv,geojson,gpkg}.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}' (expected one of {list(OUTPUT_FORMATS)})")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    path = f"{output_dir}/paris_{level}_complete.{OUTPUT_FORMATS[output_format]}"
+
+    if output_format == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_file(path, driver='GeoJSON' if output_format == 'geojson' else 'GPKG')
+    print(f"Saved {LEVEL_LABELS[level]}: {df.shape[0]} rows × {df.shape[1]} columns")
+    return path
 
 def save_dataframes(arr_df, quartiers_df, iris_df, output_dir="data"):
     """
     Save all three dataframes to CSV format (Parquet requires pyarrow).
     """
-    Path(output_dir).mkdir(exist_ok=True)
-
     print("Saving dataframes to CSV...")
+    for level, df in zip(LEVELS, [arr_df, quartiers_df, iris_df]):
+        save_level_dataframe(df, level, output_dir)
 
-    # Save arrondissements
-    arr_df.to_csv(f"{output_dir}/paris_arrondissements_complete.csv", index=False)
-    print(f"Saved arrondissements: {arr_df.shape[0]} rows × {arr_df.shape[1]} columns")
-
-    # Save quartiers
-    quartiers_df.to_csv(f"{output_dir}/paris_quartiers_complete.csv", index=False)
-    print(f"Saved quartiers: {quartiers_df.shape[0]} rows × {quartiers_df.shape[1]} columns")
-
-    # Save IRIS
-    iris_df.to_csv(f"{output_dir}/paris_iris_complete.csv", index=False)
-    print(f"Saved IRIS: {iris_df.shape[0]} rows × {iris_df.shape[1]} columns")
+def run(levels=None, variants=None, maps=False, output_format='csv', output_dir="data", memory_budget_mb=None,
+        store_dir=DEFAULT_STORE_DIR, component_overlaps=False):
+    """
+    Compute, save and optionally map only the requested levels and density variants.
+
+    Parameters:
+    -----------
+    levels : list of str, optional
+        Geographic levels (default: all three)
+    variants : list of str, optional
+        Density variants (default: all three)
+    maps : bool
+        Render the density maps of the selected levels and variants
+    output_format : str
+        'csv', 'geojson' or 'gpkg'
+    output_dir : str
+        Output directory
+    memory_budget_mb : float, optional
+        Aggregate buildings out-of-core from the building store within this budget
+    store_dir : str
+        Building store directory used with memory_budget_mb
+    component_overlaps : bool
+        Derive the buildable areas of every variant from per-component overlap
+        matrices (see overlaps) instead of one overlay per variant
+
+    Returns:
+    --------
+    dict
+        {level: dataframe}
+    """
+    plan = plan_inputs(levels, variants, maps)
+    print(f"Levels: {', '.join(plan['levels'])} | Variants: {', '.join(plan['variants'])} | "
+          f"Maps: {'yes' if maps else 'no'}")
+
+    inputs = load_inputs(plan, memory_budget_mb=memory_budget_mb, store_dir=store_dir,
+                         component_overlaps=component_overlaps)
+    results = {}
+    for level in plan['levels']:
+        print()
+        df = create_level_dataframe(level, geo=inputs['geo'], buildings=inputs['buildings'],
+                                    non_buildable=inputs['non_buildable'],
+                                    all_non_buildable=inputs['all_non_buildable'],
+                                    variants=plan['variants'],
+                                    memory_budget_mb=memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB,
+                                    components=inputs['components'])
+        save_level_dataframe(df, level, output_dir, output_format)
+        if maps:
+            render_density_maps(df, inputs['geo'].get_layer(level), level, plan['variants'],
+                                non_buildable=inputs['non_buildable'],
+                                all_non_buildable=inputs['all_non_buildable'],
+                                green_spaces=inputs['green_spaces'])
+        results[level] = df
+    return results
 
 def main():
     """
@@ -479,12 +376,9 @@ def main():
     print("PARIS BUILDING DENSITY DATA EXTRACTION")
     print("="*80)
 
-    # Create all three dataframes
-    arr_df = create_arrondissements_dataframe()
-    print()
-    quartiers_df = create_quartiers_dataframe()
-    print()
-    iris_df = create_iris_dataframe()
+    # Create all three dataframes (inputs are loaded once and shared)
+    results = run()
+    arr_df, quartiers_df, iris_df = (results[level] for level in LEVELS)
 
     print("\n" + "="*80)
     print("DATA EXTRACTION COMPLETE")
@@ -496,24 +390,37 @@ def main():
     print(f"  Quartiers: {quartiers_df.shape[0]} zones × {quartiers_df.shape[1]} features")
     print(f"  IRIS: {iris_df.shape[0]} zones × {iris_df.shape[1]} features")
 
-    # Save dataframes
-    save_dataframes(arr_df, quartiers_df, iris_df)
-
     print("\nFiles saved to 'data/' directory:")
     print("\n" + "="*80)
 
     return arr_df, quartiers_df, iris_df
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract Paris building density dataframes")
+    parser.add_argument('--levels', nargs='+', choices=LEVELS, default=LEVELS,
+                        help="Geographic levels to compute")
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS,
+                        help="Density variants to compute (raw-only runs skip the non-buildable downloads)")
+    parser.add_argument('--no-maps', action='store_true', help="Skip rendering the density maps")
+    parser.add_argument('--output-format', choices=list(OUTPUT_FORMATS), default='csv',
+                        help="Format of the saved dataframes")
+    parser.add_argument('--output-dir', default="data", help="Directory for the saved dataframes")
+    parser.add_argument('--memory-budget', type=float, default=None, metavar='MB',
+                        help="Aggregate buildings out-of-core from the building store within this budget")
+    parser.add_argument('--store-dir', default=DEFAULT_STORE_DIR, help="Building store directory")
+    parser.add_argument('--component-overlaps', action='store_true',
+                        help="Compute buildable areas from per-component overlap matrices")
+    args = parser.parse_args()
+
     # Run the data extraction
-    arr_df, quartiers_df, iris_df = main()
+    results = run(levels=args.levels, variants=args.variants, maps=not args.no_maps,
+                  output_format=args.output_format, output_dir=args.output_dir,
+                  memory_budget_mb=args.memory_budget, store_dir=args.store_dir,
+                  component_overlaps=args.component_overlaps)
 
     # Optional: Display first few rows of each dataframe
-    print("\nArrondissements preview:")
-    print(arr_df[['arr_id', 'arr_name', 'total_area_km2', 'buildable_percentage_ultra', 'density_m2_m2_ultra_corrected']].head())
-
-    print("\nQuartiers preview:")
-    print(quartiers_df[['quartier_id', 'quartier_name', 'total_area_km2', 'buildable_percentage_ultra', 'density_m2_m2_ultra_corrected']].head())
-
-    print("\nIRIS preview:")
-    print(iris_df[['iris_code', 'iris_name', 'total_area_km2', 'buildable_percentage_ultra', 'density_m2_m2_ultra_corrected']].head())
+    for level, df in results.items():
+        preview_cols = [col for col, _, _ in LEVEL_IDENTIFIERS[level]] + ['total_area_km2'] + [
+            f'density_m2_m2_{variant}' for variant in args.variants]
+        print(f"\n{LEVEL_TITLES[level]} preview:")
+        print(df[[col for col in preview_cols if col in df.columns]].head())
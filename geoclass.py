@@ -1,60 +1,391 @@
 import geopandas as gpd
-import requests
-from io import BytesIO
-from zipfile import ZipFile
-import py7zr
+import numpy as np
+import shapely
+from pathlib import Path
+import hashlib
 import os
+import weakref
+
+from portal import DatasetRequest, OPENDATA_IDF, OPENDATASOFT_PUBLIC, paris_dataset
+
+# IGN IRIS archive (last-resort IRIS source), cached between runs
+IGN_IRIS_URL = "https://data.geopf.fr/telechargement/download/IRIS-GE/IRIS-GE_3-0__SHP_LAMB93_D075_2024-01-01/IRIS-GE_3-0__SHP_LAMB93_D075_2024-01-01.7z"
+IGN_CACHE_DIR = 'Data/cache/ign'
+SHAPEFILE_EXTENSIONS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+# Loader method of each geographic level, for on-demand loading
+LAYER_LOADERS = {
+    'arrondissements': 'load_arrondissements',
+    'quartiers': 'load_quartiers',
+    'iris': 'load_iris',
+}
+
+class LayerIndex:
+    """
+    STRtree over the geometries of a layer, reusable across joins, overlays and lookups.
+
+    The tree is built over packed bounding boxes, which can be persisted next to a
+    cached layer and reloaded without recomputing envelopes; candidate pairs are then
+    refined against the exact geometries with a vectorized shapely predicate.
+    """
+
+    def __init__(self, geometries, crs=None, bounds=None):
+        """
+        Parameters:
+        -----------
+        geometries : array-like of shapely geometries
+            Indexed geometries (e.g. GeoDataFrame.geometry.values)
+        crs : CRS or str, optional
+            CRS of the indexed geometries
+        bounds : ndarray of shape (n, 4), optional
+            Packed bounding boxes (xmin, ymin, xmax, ymax), computed when not provided
+        """
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.crs = crs
+        if bounds is None:
+            bounds = shapely.bounds(self.geometries)
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.tree = shapely.STRtree(shapely.box(*self.bounds.T))
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def query(self, geometries, predicate='intersects'):
+        """
+        Find all (input, indexed) pairs satisfying a predicate.
+
+        Parameters:
+        -----------
+        geometries : array-like of shapely geometries
+            Query geometries, in the CRS of the index
+        predicate : str or None, default 'intersects'
+            Any binary shapely predicate ('intersects', 'contains', 'within'...);
+            None returns bounding-box candidates only
+
+        Returns:
+        --------
+        tuple of ndarray
+            (input positions, indexed positions)
+        """
+        geometries = np.asarray(geometries, dtype=object)
+        input_idx, tree_idx = self.tree.query(geometries)
+        if predicate is None or len(input_idx) == 0:
+            return input_idx, tree_idx
+        keep = getattr(shapely, predicate)(geometries[input_idx], self.geometries[tree_idx])
+        return input_idx[keep], tree_idx[keep]
+
+    def save_bounds(self, path, fingerprint=None):
+        """
+        Persist the packed bounding boxes as a .npz file, with the fingerprint of the indexed content.
+
+        Parameters:
+        -----------
+        path : str or Path
+            Output file (written as given, no extension is appended)
+        fingerprint : str, optional
+            Identifies the indexed geometries, e.g. from the source file modification
+            time (default: geometry_fingerprint of the indexed geometries)
+        """
+        if fingerprint is None:
+            fingerprint = geometry_fingerprint(self.geometries)
+        with open(path, 'wb') as f:
+            np.savez(f, bounds=self.bounds, fingerprint=np.array(fingerprint))
+
+    @classmethod
+    def from_saved_bounds(cls, geometries, path, crs=None, fingerprint=None):
+        """
+        Rebuild an index from persisted bounding boxes, or return None if they do not match.
+
+        The saved fingerprint must equal the current one (same default as save_bounds),
+        so a layer edited without changing its row count is re-indexed.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            saved = np.load(path)
+        except (OSError, ValueError):  # unreadable file
+            return None
+        if not hasattr(saved, 'files'):  # bare .npy array saved without a fingerprint
+            return None
+        with saved:
+            if 'bounds' not in saved.files or 'fingerprint' not in saved.files:
+                return None
+            bounds, saved_fingerprint = saved['bounds'], str(saved['fingerprint'])
+        if fingerprint is None:
+            fingerprint = geometry_fingerprint(geometries)
+        if len(bounds) != len(geometries) or saved_fingerprint != fingerprint:
+            return None
+        return cls(geometries, crs=crs, bounds=bounds)
+
+def geometry_fingerprint(geometries):
+    """SHA-1 of the WKB of a geometry array (missing geometries included), to validate persisted indexes."""
+    digest = hashlib.sha1()
+    for wkb in shapely.to_wkb(np.asarray(geometries, dtype=object)):
+        digest.update(b'\0' if wkb is None else wkb)
+    return digest.hexdigest()
+
+def file_fingerprint(path, *extra):
+    """Fingerprint of a source file from its modification time and size (plus any extra values)."""
+    stat = os.stat(path)
+    return '-'.join(str(value) for value in (stat.st_mtime_ns, stat.st_size) + extra)
+
+_layer_index_cache = {}
+
+def cached_by_identity(cache, owners, key, build):
+    """
+    Look up or build a value cached for the lifetime of some objects.
+
+    Entries keep only weak references to their owners and are evicted as soon as
+    any owner is garbage collected, so temporary objects (e.g. to_crs results) do
+    not accumulate in the cache.
+
+    Parameters:
+    -----------
+    cache : dict
+        Module-level cache
+    owners : tuple
+        Objects the value is derived from (must support weak references)
+    key : hashable
+        Cache key, including the id() of every owner
+    build : callable
+        Builds the value on a cache miss
+
+    Returns:
+    --------
+    Cached or newly built value
+    """
+    cached = cache.get(key)
+    if cached is not None and all(ref() is owner for ref, owner in zip(cached[0], owners)):
+        return cached[1]
+    value = build()
+    cache[key] = (tuple(weakref.ref(owner) for owner in owners), value)
+    for owner in owners:
+        weakref.finalize(owner, cache.pop, key, None)
+    return value
+
+def cached_layer_index(gdf, crs=None):
+    """
+    Return a LayerIndex over a GeoDataFrame, built once and reused while the object lives.
+
+    Parameters:
+    -----------
+    gdf : GeoDataFrame
+        Indexed layer (the cache is keyed on the object itself, so it must not be
+        modified in place after indexing)
+    crs : CRS or str, optional
+        CRS to index in (defaults to the layer's CRS)
+
+    Returns:
+    --------
+    LayerIndex
+    """
+    def build():
+        projected = gdf if crs is None or gdf.crs == crs else gdf.to_crs(crs)
+        return LayerIndex(projected.geometry.values, crs=projected.crs)
+
+    return cached_by_identity(_layer_index_cache, (gdf,), (id(gdf), str(crs)), build)
+
+class MaskIndex:
+    """
+    Index over the parts of a non-buildable mask, for fast covered-area queries.
+
+    The (unioned) mask is exploded into its polygon parts, which are disjoint, so the
+    area of a zone covered by the mask is the sum of its intersections with the
+    candidate parts returned by an STRtree.
+    """
+
+    def __init__(self, mask_gdf, crs='EPSG:2154'):
+        """
+        Parameters:
+        -----------
+        mask_gdf : GeoDataFrame
+            Non-buildable union (e.g. from load_non_buildable_areas)
+        crs : str
+            Projected CRS used for area computations
+        """
+        self.crs = crs
+        if mask_gdf is None or mask_gdf.empty:
+            parts = np.array([], dtype=object)
+        else:
+            mask = mask_gdf.to_crs(crs) if mask_gdf.crs != crs else mask_gdf
+            parts = shapely.get_parts(mask.geometry.values)
+            parts = parts[~shapely.is_empty(parts)]
+        self.parts = parts
+        self.tree = shapely.STRtree(parts)
+
+    def covered_area(self, geometries):
+        """
+        Area of each geometry covered by the mask.
+
+        Parameters:
+        -----------
+        geometries : array-like of shapely geometries
+            Zones in the index CRS
+
+        Returns:
+        --------
+        ndarray
+            Covered area in m² per geometry
+        """
+        geometries = np.asarray(geometries, dtype=object)
+        if len(self.parts) == 0 or len(geometries) == 0:
+            return np.zeros(len(geometries))
+        geom_idx, part_idx = self.tree.query(geometries, predicate='intersects')
+        if len(geom_idx) == 0:
+            return np.zeros(len(geometries))
+        areas = shapely.area(shapely.intersection(geometries[geom_idx], self.parts[part_idx]))
+        return np.bincount(geom_idx, weights=areas, minlength=len(geometries))
+
+_mask_index_cache = {}
+
+def cached_mask_index(mask_gdf, crs='EPSG:2154'):
+    """
+    Return a MaskIndex over a mask GeoDataFrame, built once and reused while the object lives.
+    """
+    if mask_gdf is None:
+        return MaskIndex(None, crs=crs)
+    return cached_by_identity(_mask_index_cache, (mask_gdf,), (id(mask_gdf), str(crs)),
+                              lambda: MaskIndex(mask_gdf, crs=crs))
+
+def clear_caches():
+    """Drop every cached layer and mask index (e.g. before reloading the layers)."""
+    _layer_index_cache.clear()
+    _mask_index_cache.clear()
 
 class GeoDataParis:
     """Manages loading and caching of Paris geographical data layers."""
 
-    def __init__(self):
+    def __init__(self, cache_dir=None):
         self.data = {}
+        self.projected = {}
+        self.indexes = {}
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+
+    def _cached_layer_path(self, key):
+        return self.cache_dir / f"{key}.gpkg"
+
+    def _read_cached_layer(self, key):
+        """Read a layer from the on-disk cache, if enabled and present."""
+        if self.cache_dir is None or not self._cached_layer_path(key).exists():
+            return None
+        return gpd.read_file(self._cached_layer_path(key))
+
+    def _write_cached_layer(self, key):
+        """Write a loaded layer to the on-disk cache, if enabled."""
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data[key].to_file(self._cached_layer_path(key), driver='GPKG')
 
     def load_arrondissements(self):
         """Load Paris arrondissements."""
         if 'arrondissements' not in self.data:
-            url = "https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/arrondissements/exports/geojson"
-            self.data['arrondissements'] = gpd.read_file(url)
+            cached = self._read_cached_layer('arrondissements')
+            if cached is not None:
+                self.data['arrondissements'] = cached
+                return cached
+            self.data['arrondissements'] = paris_dataset('arrondissements').read_geojson()
+            self._write_cached_layer('arrondissements')
         return self.data['arrondissements']
 
     def load_quartiers(self):
         """Load Paris administrative quarters."""
         if 'quartiers' not in self.data:
-            url = "https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/quartier_paris/exports/geojson"
-            self.data['quartiers'] = gpd.read_file(url)
+            cached = self._read_cached_layer('quartiers')
+            if cached is not None:
+                self.data['quartiers'] = cached
+                return cached
+            self.data['quartiers'] = paris_dataset('quartier_paris').read_geojson()
+            self._write_cached_layer('quartiers')
         return self.data['quartiers']
 
     def load_iris(self):
         """Load Paris IRIS with fallback methods."""
         if 'iris' not in self.data:
+            cached = self._read_cached_layer('iris')
+            if cached is not None:
+                self.data['iris'] = cached
+                return cached
             try:
-                url = "https://data.iledefrance.fr/api/explore/v2.1/catalog/datasets/iris/exports/geojson"
-                gdf = gpd.read_file(url)
+                # Paris IRIS are selected server-side; the client-side filter is kept as a safeguard
+                gdf = DatasetRequest(OPENDATA_IDF, 'iris').where('startswith(depcom, "751")').read_geojson()
                 self.data['iris'] = gdf[gdf['depcom'].str.startswith('751')].copy()
             except Exception:
                 try:
-                    url = "https://public.opendatasoft.com/api/explore/v2.1/catalog/datasets/georef-france-iris/exports/geojson?where=dep_code='75'&lang=fr&timezone=Europe%2FParis"
-                    self.data['iris'] = gpd.read_file(url)
+                    self.data['iris'] = DatasetRequest(OPENDATASOFT_PUBLIC, 'georef-france-iris').where(
+                        "dep_code='75'").read_geojson(fallback=False)
                 except Exception:
-                    url = "https://data.geopf.fr/telechargement/download/IRIS-GE/IRIS-GE_3-0__SHP_LAMB93_D075_2024-01-01/IRIS-GE_3-0__SHP_LAMB93_D075_2024-01-01.7z"
-                    response = requests.get(url)
-                    with py7zr.SevenZipFile(BytesIO(response.content), mode='r') as z:
-                        z.extractall(path='temp_iris_ign')
-                    shp_files = [f for f in os.listdir('temp_iris_ign/IRIS-GE_3-0__SHP_LAMB93_D075_2024-01-01') if f.endswith('.shp')]
-                    if shp_files:
-                        self.data['iris'] = gpd.read_file(f'temp_iris_ign/IRIS-GE_3-0__SHP_LAMB93_D075_2024-01-01/{shp_files[0]}')
-                    else:
-                        raise ValueError("Shapefile not found")
+                    self.data['iris'] = self._load_ign_iris()
+            self._write_cached_layer('iris')
         return self.data['iris']
 
-    def load_all(self):
-        """Load all available geographical layers."""
-        self.load_arrondissements()
-        self.load_quartiers()
-        self.load_iris()
+    def _ign_cache_dir(self):
+        return self.cache_dir / 'ign' if self.cache_dir is not None else Path(IGN_CACHE_DIR)
+
+    def _load_ign_iris(self):
+        """
+        Load IRIS from the IGN 7z archive, downloading and extracting it only once.
+
+        The archive is streamed to disk (never held in memory), only the shapefile
+        members are extracted, and the layer is kept as GeoParquet (or GPKG without
+        pyarrow) so later runs skip both the download and the decompression.
+        """
+        cache_dir = self._ign_cache_dir()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        parquet_path = cache_dir / 'iris_ign.parquet'
+        gpkg_path = cache_dir / 'iris_ign.gpkg'
+        if parquet_path.exists():
+            return gpd.read_parquet(parquet_path)
+        if gpkg_path.exists():
+            return gpd.read_file(gpkg_path)
+
+        # Only needed for this last-resort source
+        import requests
+        import py7zr
+
+        archive_path = cache_dir / IGN_IRIS_URL.rsplit('/', 1)[-1]
+        if not archive_path.exists():
+            print("Downloading IGN IRIS archive...")
+            partial_path = archive_path.with_suffix('.part')
+            with requests.get(IGN_IRIS_URL, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                with open(partial_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+            partial_path.replace(archive_path)
+
+        extract_dir = cache_dir / 'extracted'
+        with py7zr.SevenZipFile(archive_path, mode='r') as z:
+            members = [name for name in z.getnames() if name.lower().endswith(SHAPEFILE_EXTENSIONS)]
+            missing = [name for name in members if not (extract_dir / name).exists()]
+            if missing:
+                z.extract(path=extract_dir, targets=missing)
+
+        shp_files = sorted(name for name in members if name.lower().endswith('.shp'))
+        if not shp_files:
+            raise ValueError("Shapefile not found")
+        gdf = gpd.read_file(extract_dir / shp_files[0])
+
+        try:
+            gdf.to_parquet(parquet_path)
+        except ImportError:
+            gdf.to_file(gpkg_path, driver='GPKG')
+        return gdf
+
+    def load_all(self, levels=None):
+        """Load all available geographical layers (or only the given levels)."""
+        for level in (levels if levels is not None else LAYER_LOADERS):
+            self.get_layer(level)
         return self.data
 
+    def get_layer(self, key):
+        """Get a layer by key, loading it on first access."""
+        if key not in self.data:
+            if key not in LAYER_LOADERS:
+                raise KeyError(f"Unknown layer '{key}' (expected one of {list(LAYER_LOADERS)})")
+            getattr(self, LAYER_LOADERS[key])()
+        return self.data[key]
+
     def get_data(self, key):
         """Get specific dataframe by key."""
         return self.data.get(key)
@@ -62,3 +393,37 @@ class GeoDataParis:
     def list_available_data(self):
         """List loaded data keys."""
         return list(self.data.keys())
+
+    def get_projected(self, key, crs='EPSG:2154'):
+        """Get a loaded layer reprojected to crs (reprojected once, then cached)."""
+        if (key, crs) not in self.projected:
+            gdf = self.get_layer(key)
+            self.projected[(key, crs)] = gdf if gdf.crs == crs else gdf.to_crs(crs)
+        return self.projected[(key, crs)]
+
+    def get_index(self, key, crs='EPSG:2154'):
+        """
+        Get the spatial index of a loaded layer in crs, built once and cached.
+
+        With a cache_dir, the packed bounding boxes are persisted next to the cached
+        layer and reused by later sessions while the cached layer file is unchanged.
+        """
+        if (key, crs) not in self.indexes:
+            gdf = self.get_projected(key, crs)
+            index = None
+            bounds_path = None
+            fingerprint = None
+            if self.cache_dir is not None:
+                bounds_path = self.cache_dir / f"{key}_{str(crs).replace(':', '')}.bounds.npz"
+                layer_path = self._cached_layer_path(key)
+                if layer_path.exists():
+                    fingerprint = file_fingerprint(layer_path, len(gdf))
+                index = LayerIndex.from_saved_bounds(gdf.geometry.values, bounds_path, crs=gdf.crs,
+                                                     fingerprint=fingerprint)
+            if index is None:
+                index = LayerIndex(gdf.geometry.values, crs=gdf.crs)
+                if bounds_path is not None:
+                    self.cache_dir.mkdir(parents=True, exist_ok=True)
+                    index.save_bounds(bounds_path, fingerprint=fingerprint)
+            self.indexes[(key, crs)] = index
+        return self.indexes[(key, crs)]
@@ -0,0 +1,164 @@
+"""
+Zone Incidence
+Zone-by-building incidence matrix materialized once per (building set, level): the spatial
+join is run a single time, and every per-zone statistic (floor area, counts, any new
+building attribute) becomes a sparse matrix product instead of a new sjoin
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geoclass import cached_by_identity, cached_layer_index
+
+WEIGHTINGS = [None, 'area_weighted']
+
+class ZoneIncidence:
+    """
+    Sparse (n_zones × n_buildings) matrix of building-to-zone membership.
+
+    Entries are 1 for every intersecting (zone, building) pair, as in
+    aggregate_by_geographic_division, or the share of the building footprint inside
+    the zone with area weighting. A SciPy CSR matrix is used when SciPy is
+    available; otherwise products fall back to bincount over the stored pairs.
+    """
+
+    def __init__(self, buildings, geo_divisions_gdf, weighting=None):
+        """
+        Parameters:
+        -----------
+        buildings : GeoDataFrame
+            Building data from load_building_data
+        geo_divisions_gdf : GeoDataFrame
+            Geographic divisions (any CRS, joined in the building CRS)
+        weighting : str or None
+            None (full membership) or 'area_weighted' (footprint share)
+        """
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting '{weighting}' (expected one of {WEIGHTINGS})")
+        self.weighting = weighting
+        self.zone_labels = geo_divisions_gdf.index
+        self.shape = (len(geo_divisions_gdf), len(buildings))
+
+        index = cached_layer_index(geo_divisions_gdf, crs=buildings.crs)
+        geometries = np.asarray(buildings.geometry.values, dtype=object)
+        building_idx, zone_idx = index.query(geometries, predicate='intersects')
+        order = np.lexsort((building_idx, zone_idx))
+        self.rows, self.cols = zone_idx[order], building_idx[order]
+
+        if weighting == 'area_weighted' and len(self.rows):
+            footprints = shapely.area(geometries[self.cols])
+            inside = shapely.area(shapely.intersection(geometries[self.cols], index.geometries[self.rows]))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share = np.where(footprints > 0, inside / footprints, 0.0)
+            self.data = np.clip(share, 0.0, 1.0)
+        else:
+            self.data = np.ones(len(self.rows))
+
+        try:
+            from scipy import sparse
+            self.matrix = sparse.csr_matrix((self.data, (self.rows, self.cols)), shape=self.shape)
+        except ImportError:
+            self.matrix = None
+        print(f"  Incidence matrix: {self.shape[0]} zones × {self.shape[1]} buildings, {len(self.rows)} pairs")
+
+    @property
+    def nnz(self):
+        return len(self.rows)
+
+    def dot(self, values):
+        """
+        Per-zone weighted sums of building values.
+
+        Parameters:
+        -----------
+        values : ndarray of shape (n_buildings,) or (n_buildings, k)
+            Building values (NaN counts as 0, like a pandas sum)
+
+        Returns:
+        --------
+        ndarray of shape (n_zones,) or (n_zones, k)
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        if len(values) != self.shape[1]:
+            raise ValueError(f"Expected {self.shape[1]} building values, got {len(values)}")
+        if self.matrix is not None:
+            return np.asarray(self.matrix @ values)
+
+        if values.ndim == 1:
+            return np.bincount(self.rows, weights=self.data * values[self.cols], minlength=self.shape[0])
+        return np.column_stack([
+            np.bincount(self.rows, weights=self.data * values[self.cols, k], minlength=self.shape[0])
+            for k in range(values.shape[1])
+        ])
+
+    def counts(self):
+        """Number of buildings intersecting each zone."""
+        return np.bincount(self.rows, minlength=self.shape[0])
+
+    def aggregate(self, buildings, columns, agg_method='sum'):
+        """
+        Aggregate several building columns at once with one sparse × dense product.
+
+        Parameters:
+        -----------
+        buildings : DataFrame
+            Building attributes, row-aligned with the building set of the matrix
+            (geometry is not used)
+        columns : list of str
+            Columns to aggregate
+        agg_method : str, default 'sum'
+            'sum', 'mean' or 'count'
+
+        Returns:
+        --------
+        DataFrame
+            One column per input column ('{column}_{agg_method}'), indexed like the zones
+        """
+        columns = list(columns)
+        if agg_method == 'count':
+            counts = self.counts().astype(np.float64)
+            return pd.DataFrame({f'{column}_count': counts for column in columns}, index=self.zone_labels)
+        if agg_method not in ('sum', 'mean'):
+            raise ValueError(f"Aggregation '{agg_method}' is not linear (use aggregate_by_geographic_division)")
+
+        values = buildings[columns].to_numpy(dtype=np.float64)
+        totals = self.dot(values)
+        if agg_method == 'mean':
+            # Mean over non-missing values, as pandas does
+            present = self.dot((~np.isnan(values)).astype(np.float64))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                totals = np.where(present > 0, totals / present, np.nan)
+        return pd.DataFrame(totals, columns=[f'{column}_{agg_method}' for column in columns],
+                            index=self.zone_labels)
+
+_incidence_cache = {}
+
+def cached_incidence(buildings, geo_divisions_gdf, weighting=None):
+    """
+    Return the ZoneIncidence of a building set and a level, built once and reused while both objects live.
+
+    The entry is dropped as soon as either layer is garbage collected, so aggregations
+    over temporary frames do not accumulate matrices.
+
+    Parameters:
+    -----------
+    buildings : GeoDataFrame
+        Building data (the cache is keyed on the object itself, so it must not be
+        modified in place after the matrix is built)
+    geo_divisions_gdf : GeoDataFrame
+        Geographic divisions of one level
+    weighting : str or None
+        See ZoneIncidence
+
+    Returns:
+    --------
+    ZoneIncidence
+    """
+    return cached_by_identity(_incidence_cache, (buildings, geo_divisions_gdf),
+                              (id(buildings), id(geo_divisions_gdf), weighting),
+                              lambda: ZoneIncidence(buildings, geo_divisions_gdf, weighting=weighting))
+
+def clear_caches():
+    """Drop every cached incidence matrix."""
+    _incidence_cache.clear()
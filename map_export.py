@@ -0,0 +1,508 @@
+"""
+Map Export
+Exports aggregated density GeoDataFrames to TopoJSON and to static directories of
+pre-cut vector tiles, so thin clients can load shared-arc topologies or only the
+tiles currently visible instead of a standalone folium HTML embedding the whole city
+"""
+
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import MultiPolygon, Polygon, mapping
+
+# Constants
+CRS_WGS84 = 'EPSG:4326'
+CRS_WEB_MERCATOR = 'EPSG:3857'
+WEB_MERCATOR_HALF_WORLD = 20037508.342789244
+TILE_EXTENT = 4096
+
+
+def _json_value(value):
+    """
+    Convert a pandas/numpy scalar to a JSON-serializable value.
+
+    Parameters:
+    -----------
+    value : any
+        Attribute value from a GeoDataFrame row
+
+    Returns:
+    --------
+    JSON-serializable value (NaN becomes None)
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+def _feature_properties(gdf, columns=None):
+    """
+    Extract JSON-ready property dicts for every row of a GeoDataFrame.
+
+    Parameters:
+    -----------
+    gdf : GeoDataFrame
+        Source data
+    columns : list of str, optional
+        Columns to export (default: every non-geometry column)
+
+    Returns:
+    --------
+    list of dict
+    """
+    if columns is None:
+        columns = [col for col in gdf.columns
+                   if col != gdf.geometry.name and gdf[col].dtype.name != 'geometry']
+    records = gdf[columns].to_dict(orient='records')
+    return [{key: _json_value(val) for key, val in record.items()} for record in records]
+
+
+def _polygon_parts(geom):
+    """Return the list of Polygons making up a (Multi)Polygon, or an empty list."""
+    if geom is None or geom.is_empty:
+        return []
+    if isinstance(geom, Polygon):
+        return [geom]
+    if isinstance(geom, MultiPolygon):
+        return list(geom.geoms)
+    if hasattr(geom, 'geoms'):
+        return [part for sub in geom.geoms for part in _polygon_parts(sub)]
+    return []
+
+
+def _quantized_ring(ring, origin, scale):
+    """
+    Quantize a ring to integer grid coordinates and drop repeated points.
+
+    Returns:
+    --------
+    list of (int, int) tuples, closed (first == last), or None if degenerate
+    """
+    coords = np.asarray(ring.coords)[:, :2]
+    quantized = np.round((coords - origin) / scale).astype(np.int64)
+    points = [tuple(quantized[0])]
+    for point in map(tuple, quantized[1:]):
+        if point != points[-1]:
+            points.append(point)
+    if points[0] != points[-1]:
+        points.append(points[0])
+    if len(points) < 4:
+        return None
+    return points
+
+
+def _find_junctions(rings):
+    """
+    Find the points where rings stop sharing a boundary.
+
+    A point is a junction when it is seen with two different pairs of neighbours,
+    i.e. where two adjacent zones start or stop sharing an edge.
+
+    Parameters:
+    -----------
+    rings : list of list of tuples
+        Closed quantized rings
+
+    Returns:
+    --------
+    set of tuples
+    """
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        open_ring = ring[:-1]
+        n = len(open_ring)
+        for i, point in enumerate(open_ring):
+            pair = frozenset((open_ring[i - 1], open_ring[(i + 1) % n]))
+            seen = neighbours.get(point)
+            if seen is None:
+                neighbours[point] = pair
+            elif seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+def _canonical_ring(open_ring):
+    """Rotate an open ring so that it starts at its smallest point."""
+    start = open_ring.index(min(open_ring))
+    rotated = open_ring[start:] + open_ring[:start]
+    return rotated + [rotated[0]]
+
+
+def _cut_ring(ring, junctions):
+    """
+    Split a closed ring into arcs at junction points.
+
+    Returns:
+    --------
+    list of list of tuples
+    """
+    open_ring = ring[:-1]
+    cut_positions = [i for i, point in enumerate(open_ring) if point in junctions]
+    if not cut_positions:
+        return [_canonical_ring(open_ring)]
+
+    start = cut_positions[0]
+    rotated = open_ring[start:] + open_ring[:start] + [open_ring[start]]
+    arcs = []
+    current = [rotated[0]]
+    for point in rotated[1:]:
+        current.append(point)
+        if point in junctions:
+            arcs.append(current)
+            current = [point]
+    return arcs
+
+
+class _ArcRegistry:
+    """Deduplicates arcs so that shared boundaries are stored once."""
+
+    def __init__(self):
+        self.arcs = []
+        self.index = {}
+
+    def add(self, arc):
+        """Register an arc and return its TopoJSON reference (negative if reversed)."""
+        key = tuple(arc)
+        if key in self.index:
+            return self.index[key]
+        reverse_key = tuple(reversed(arc))
+        if reverse_key in self.index:
+            return ~self.index[reverse_key]
+        if arc[0] == arc[-1]:
+            # Closed arc: the same ring may have been stored reversed with another start
+            reverse_canonical = tuple(_canonical_ring(list(reversed(arc[:-1]))))
+            if reverse_canonical in self.index:
+                return ~self.index[reverse_canonical]
+        self.index[key] = len(self.arcs)
+        self.arcs.append(arc)
+        return self.index[key]
+
+
+def build_topology(gdf, object_name='zones', columns=None, quantization=1e5, id_column=None):
+    """
+    Build a TopoJSON topology with arcs shared between adjacent zones.
+
+    Parameters:
+    -----------
+    gdf : GeoDataFrame
+        Aggregated zones (any CRS, exported in WGS84)
+    object_name : str
+        Name of the geometry collection in the topology
+    columns : list of str, optional
+        Property columns to export (default: every non-geometry column)
+    quantization : float, default 1e5
+        Number of grid steps along each axis of the bounding box
+    id_column : str, optional
+        Column used as feature id
+
+    Returns:
+    --------
+    dict
+        TopoJSON topology
+    """
+    gdf_4326 = gdf.to_crs(CRS_WGS84) if gdf.crs is not None and gdf.crs != CRS_WGS84 else gdf
+    x0, y0, x1, y1 = gdf_4326.total_bounds
+    scale = np.array([
+        (x1 - x0) / (quantization - 1) if x1 > x0 else 1.0,
+        (y1 - y0) / (quantization - 1) if y1 > y0 else 1.0,
+    ])
+    origin = np.array([x0, y0])
+
+    # Quantize every ring once, remembering which feature/polygon it belongs to
+    feature_rings = []
+    all_rings = []
+    for geom in gdf_4326.geometry:
+        polygons = []
+        for polygon in _polygon_parts(geom):
+            rings = [_quantized_ring(polygon.exterior, origin, scale)]
+            rings += [_quantized_ring(interior, origin, scale) for interior in polygon.interiors]
+            rings = [ring for ring in rings if ring is not None]
+            if rings:
+                polygons.append(rings)
+                all_rings.extend(rings)
+        feature_rings.append(polygons)
+
+    junctions = _find_junctions(all_rings)
+    registry = _ArcRegistry()
+
+    properties = _feature_properties(gdf_4326, columns)
+    geometries = []
+    for i, polygons in enumerate(feature_rings):
+        arc_polygons = [[[registry.add(arc) for arc in _cut_ring(ring, junctions)] for ring in rings]
+                        for rings in polygons]
+        if not arc_polygons:
+            geometry = {'type': None}
+        elif len(arc_polygons) == 1:
+            geometry = {'type': 'Polygon', 'arcs': arc_polygons[0]}
+        else:
+            geometry = {'type': 'MultiPolygon', 'arcs': arc_polygons}
+        geometry['properties'] = properties[i]
+        if id_column is not None:
+            geometry['id'] = properties[i].get(id_column)
+        geometries.append(geometry)
+
+    # Delta-encode arcs as required by quantized TopoJSON
+    encoded_arcs = []
+    for arc in registry.arcs:
+        points = np.asarray(arc, dtype=np.int64)
+        deltas = np.vstack([points[:1], np.diff(points, axis=0)])
+        encoded_arcs.append(deltas.tolist())
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': scale.tolist(), 'translate': origin.tolist()},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': encoded_arcs,
+        'bbox': [float(x0), float(y0), float(x1), float(y1)],
+    }
+
+
+def export_topojson(gdf, save_path, object_name='zones', columns=None, quantization=1e5, id_column=None):
+    """
+    Export an aggregated GeoDataFrame to a TopoJSON file.
+
+    Parameters:
+    -----------
+    gdf : GeoDataFrame
+        Aggregated zones, e.g. the output of create_building_density_map
+    save_path : str or Path
+        Output .topojson path
+    object_name : str
+        Name of the geometry collection in the topology
+    columns : list of str, optional
+        Property columns to export
+    quantization : float, default 1e5
+        Quantization grid size
+    id_column : str, optional
+        Column used as feature id
+
+    Returns:
+    --------
+    dict
+        The exported topology
+    """
+    topology = build_topology(gdf, object_name=object_name, columns=columns,
+                              quantization=quantization, id_column=id_column)
+    save_path = Path(save_path)
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(save_path, 'w', encoding='utf-8') as f:
+        json.dump(topology, f, separators=(',', ':'))
+
+    n_coords = sum(len(arc) for arc in topology['arcs'])
+    print(f"TopoJSON saved to {save_path} ({len(topology['arcs'])} arcs, {n_coords} points)")
+    return topology
+
+
+def tile_bounds(z, x, y):
+    """
+    Web Mercator bounds of a slippy-map tile.
+
+    Returns:
+    --------
+    tuple
+        (xmin, ymin, xmax, ymax) in EPSG:3857 metres
+    """
+    size = 2 * WEB_MERCATOR_HALF_WORLD / (2 ** z)
+    xmin = -WEB_MERCATOR_HALF_WORLD + x * size
+    ymax = WEB_MERCATOR_HALF_WORLD - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def tiles_covering(bounds, z):
+    """
+    Enumerate the (x, y) tiles of zoom z covering Web Mercator bounds.
+
+    Parameters:
+    -----------
+    bounds : tuple
+        (xmin, ymin, xmax, ymax) in EPSG:3857 metres
+    z : int
+        Zoom level
+
+    Returns:
+    --------
+    list of (int, int)
+    """
+    n = 2 ** z
+    size = 2 * WEB_MERCATOR_HALF_WORLD / n
+    xmin, ymin, xmax, ymax = bounds
+    x_start = max(0, int((xmin + WEB_MERCATOR_HALF_WORLD) // size))
+    x_end = min(n - 1, int((xmax + WEB_MERCATOR_HALF_WORLD) // size))
+    y_start = max(0, int((WEB_MERCATOR_HALF_WORLD - ymax) // size))
+    y_end = min(n - 1, int((WEB_MERCATOR_HALF_WORLD - ymin) // size))
+    return [(x, y) for x in range(x_start, x_end + 1) for y in range(y_start, y_end + 1)]
+
+
+def _encode_tile(features, layer_name, bounds, tile_format):
+    """
+    Encode clipped features of one tile.
+
+    Uses Mapbox Vector Tile protobuf encoding when mapbox_vector_tile is installed,
+    and falls back to a GeoJSON FeatureCollection in WGS84 otherwise.
+
+    Returns:
+    --------
+    bytes
+    """
+    if tile_format == 'pbf':
+        import mapbox_vector_tile
+        layer = {
+            'name': layer_name,
+            'features': [{'geometry': geom.wkt, 'properties': props} for geom, props in features],
+        }
+        try:
+            return mapbox_vector_tile.encode([layer], default_options={'quantize_bounds': bounds,
+                                                                       'extents': TILE_EXTENT})
+        except TypeError:
+            # mapbox_vector_tile < 2.0 takes the options as keyword arguments
+            return mapbox_vector_tile.encode([layer], quantize_bounds=bounds, extents=TILE_EXTENT)
+
+    from pyproj import Transformer
+    transformer = Transformer.from_crs(CRS_WEB_MERCATOR, CRS_WGS84, always_xy=True)
+    collection = {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': mapping(shapely.transform(geom, lambda c: np.column_stack(transformer.transform(c[:, 0], c[:, 1])))),
+                'properties': props,
+            }
+            for geom, props in features
+        ],
+    }
+    return json.dumps(collection, separators=(',', ':')).encode('utf-8')
+
+
+def export_vector_tiles(gdf, output_dir, layer_name='zones', min_zoom=10, max_zoom=15,
+                        columns=None, buffer_pixels=16, tile_format=None):
+    """
+    Export an aggregated GeoDataFrame to a static z/x/y directory of pre-cut vector tiles.
+
+    Geometries are simplified to the tile resolution of each zoom level, clipped to a
+    slightly buffered tile box and encoded per tile, so a client only fetches tiles
+    intersecting its viewport.
+
+    Parameters:
+    -----------
+    gdf : GeoDataFrame
+        Aggregated zones, e.g. the output of create_building_density_map
+    output_dir : str or Path
+        Root directory of the tile pyramid
+    layer_name : str
+        Layer name inside each tile
+    min_zoom, max_zoom : int
+        Zoom range to generate
+    columns : list of str, optional
+        Property columns to export (default: every non-geometry column)
+    buffer_pixels : int, default 16
+        Clipping buffer around each tile, in pixels of a 256 px tile
+    tile_format : str, optional
+        'pbf' (requires mapbox_vector_tile) or 'geojson'; detected automatically when None
+
+    Returns:
+    --------
+    dict
+        TileJSON-like metadata written alongside the tiles
+    """
+    if tile_format is None:
+        try:
+            import mapbox_vector_tile  # noqa: F401
+            tile_format = 'pbf'
+        except ImportError:
+            tile_format = 'geojson'
+
+    output_dir = Path(output_dir)
+    gdf_3857 = gdf.to_crs(CRS_WEB_MERCATOR)
+    properties = _feature_properties(gdf_3857, columns)
+    geometries = gdf_3857.geometry.values
+    tree = shapely.STRtree(geometries)
+    extension = 'pbf' if tile_format == 'pbf' else 'geojson'
+
+    n_tiles = 0
+    for z in range(min_zoom, max_zoom + 1):
+        # One pixel of a 256 px tile, in metres: simplify to a quarter of it
+        pixel_size = 2 * WEB_MERCATOR_HALF_WORLD / (256 * 2 ** z)
+        simplified = shapely.simplify(geometries, pixel_size / 4, preserve_topology=True)
+
+        for x, y in tiles_covering(gdf_3857.total_bounds, z):
+            bounds = tile_bounds(z, x, y)
+            margin = buffer_pixels * pixel_size
+            clip_box = (bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin)
+            candidates = tree.query(shapely.box(*clip_box), predicate='intersects')
+            if len(candidates) == 0:
+                continue
+
+            clipped = shapely.clip_by_rect(simplified[candidates], *clip_box)
+            features = [(geom, properties[i]) for i, geom in zip(candidates, clipped) if not geom.is_empty]
+            if not features:
+                continue
+
+            tile_path = output_dir / str(z) / str(x) / f"{y}.{extension}"
+            tile_path.parent.mkdir(parents=True, exist_ok=True)
+            tile_path.write_bytes(_encode_tile(features, layer_name, bounds, tile_format))
+            n_tiles += 1
+
+    bounds_4326 = gdf.to_crs(CRS_WGS84).total_bounds
+    metadata = {
+        'tilejson': '3.0.0',
+        'name': layer_name,
+        'format': tile_format,
+        'tiles': [f"{{z}}/{{x}}/{{y}}.{extension}"],
+        'minzoom': min_zoom,
+        'maxzoom': max_zoom,
+        'bounds': [float(v) for v in bounds_4326],
+        'center': [float((bounds_4326[0] + bounds_4326[2]) / 2), float((bounds_4326[1] + bounds_4326[3]) / 2), min_zoom],
+        'vector_layers': [{'id': layer_name, 'fields': {key: 'value' for key in (properties[0] if properties else {})}}],
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / 'metadata.json', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"Vector tiles saved to {output_dir} ({n_tiles} {tile_format} tiles, zoom {min_zoom}-{max_zoom})")
+    return metadata
+
+
+def export_density_results(results, output_dir='Data/export', min_zoom=10, max_zoom=15, tiles=True):
+    """
+    Export every level/variant returned by decoupagegeo.main() to TopoJSON and vector tiles.
+
+    Parameters:
+    -----------
+    results : dict
+        {geo_level: {variant: GeoDataFrame}} as returned by decoupagegeo.main()
+    output_dir : str
+        Root export directory
+    min_zoom, max_zoom : int
+        Zoom range of the vector tiles
+    tiles : bool, default True
+        Also cut vector tiles (TopoJSON only when False)
+
+    Returns:
+    --------
+    dict
+        {geo_level: {variant: path of the TopoJSON file}}
+    """
+    output_dir = Path(output_dir)
+    exported = {}
+    for geo_level, variants in results.items():
+        exported[geo_level] = {}
+        for variant, gdf in variants.items():
+            name = f"building_density_{variant}_{geo_level}"
+            topojson_path = output_dir / f"{name}.topojson"
+            export_topojson(gdf, topojson_path, object_name=geo_level)
+            if tiles:
+                export_vector_tiles(gdf, output_dir / 'tiles' / name, layer_name=geo_level,
+                                    min_zoom=min_zoom, max_zoom=max_zoom)
+            exported[geo_level][variant] = str(topojson_path)
+    return exported
@@ -0,0 +1,142 @@
+"""
+Mask Component Overlaps
+Per-zone overlap areas with each non-buildable component (water, railways, green spaces)
+and with every intersection of components, computed once per level, so the buildable area
+of any combination of components follows by inclusion-exclusion without a new overlay
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from itertools import combinations
+
+from geoclass import MaskIndex
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+
+# Components excluded by each density variant
+VARIANT_COMPONENTS = {
+    'corrected': ('water', 'rail'),
+    'ultra_corrected': ('water', 'rail', 'green'),
+}
+
+def _intersect_parts(parts_a, parts_b):
+    """
+    Polygon parts of the intersection of two sets of disjoint polygon parts.
+
+    Returns:
+    --------
+    ndarray of shapely Polygons
+        Disjoint parts (each input pair yields disjoint pieces)
+    """
+    if len(parts_a) == 0 or len(parts_b) == 0:
+        return np.array([], dtype=object)
+    a_idx, b_idx = shapely.STRtree(parts_b).query(parts_a, predicate='intersects')
+    if len(a_idx) == 0:
+        return np.array([], dtype=object)
+    pieces = shapely.intersection(parts_a[a_idx], parts_b[b_idx])
+    # Explode collections, then the multipolygons they may contain
+    pieces = shapely.get_parts(shapely.get_parts(pieces))
+    keep = (shapely.get_type_id(pieces) == shapely.GeometryType.POLYGON) & (shapely.area(pieces) > 0)
+    return pieces[keep]
+
+class OverlapMatrix:
+    """
+    Overlap areas between the zones of a level and every intersection of mask components.
+
+    Column {water, rail} holds the area of each zone inside water ∩ rail, and so on
+    for every non-empty subset of components, so the area covered by the union of
+    any subset S is the inclusion-exclusion sum over the subsets of S.
+    """
+
+    def __init__(self, geo_divisions_gdf, components, crs=CRS_PARIS):
+        """
+        Parameters:
+        -----------
+        geo_divisions_gdf : GeoDataFrame
+            Geographic divisions
+        components : dict
+            {name: mask GeoDataFrame} (e.g. from load_mask_components)
+        crs : str
+            Projected CRS used for area computations
+        """
+        zones = geo_divisions_gdf.to_crs(crs) if geo_divisions_gdf.crs != crs else geo_divisions_gdf
+        zone_geoms = np.asarray(zones.geometry.values, dtype=object)
+        self.index = geo_divisions_gdf.index
+        self.names = tuple(components)
+        self.total_area = shapely.area(zone_geoms)
+
+        print(f"  Computing overlaps of {len(zone_geoms)} zones with {', '.join(self.names)}...")
+        component_parts = {name: MaskIndex(mask, crs=crs).parts for name, mask in components.items()}
+
+        # Intersections of k components are built from those of k - 1 components
+        parts = {}
+        self.overlaps = {}
+        for size in range(1, len(self.names) + 1):
+            for subset in combinations(self.names, size):
+                if size == 1:
+                    parts[subset] = component_parts[subset[0]]
+                else:
+                    parts[subset] = _intersect_parts(parts[subset[:-1]], component_parts[subset[-1]])
+                mask = gpd.GeoDataFrame(geometry=parts[subset], crs=crs)
+                self.overlaps[frozenset(subset)] = MaskIndex(mask, crs=crs).covered_area(zone_geoms)
+
+    def covered_area(self, components):
+        """
+        Area of each zone covered by the union of some components.
+
+        Parameters:
+        -----------
+        components : iterable of str
+            Component names (any subset of the matrix components)
+
+        Returns:
+        --------
+        ndarray
+            Covered area in m² per zone
+        """
+        components = tuple(dict.fromkeys(components))
+        unknown = [name for name in components if name not in self.names]
+        if unknown:
+            raise KeyError(f"Unknown mask components {unknown} (available: {list(self.names)})")
+
+        covered = np.zeros(len(self.total_area))
+        for size in range(1, len(components) + 1):
+            sign = 1.0 if size % 2 else -1.0
+            for subset in combinations(components, size):
+                covered += sign * self.overlaps[frozenset(subset)]
+        return np.clip(covered, 0.0, self.total_area)
+
+    def buildable_area(self, components):
+        """
+        Buildable area of each zone once the union of some components is excluded.
+
+        Returns:
+        --------
+        DataFrame
+            buildable_area_m2 and buildable_percentage, indexed like the zones (the
+            area columns of create_buildable_geometries)
+        """
+        buildable = self.total_area - self.covered_area(components)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage = np.nan_to_num(buildable / self.total_area * 100, nan=0.0)
+        return pd.DataFrame({
+            'buildable_area_m2': buildable,
+            'buildable_percentage': np.round(percentage, 1),
+        }, index=self.index)
+
+    def to_frame(self):
+        """
+        Overlap areas as a DataFrame, one column per subset of components ('water&rail'...).
+
+        Returns:
+        --------
+        DataFrame
+        """
+        columns = {'total_area_m2': self.total_area}
+        for size in range(1, len(self.names) + 1):
+            for subset in combinations(self.names, size):
+                columns['&'.join(subset)] = self.overlaps[frozenset(subset)]
+        return pd.DataFrame(columns, index=self.index)
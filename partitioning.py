@@ -0,0 +1,241 @@
+"""
+Partitioned Processing
+Out-of-core aggregation of building data by geographic division: buildings are split into
+spatially compact partitions sized from a memory budget, each partition is joined only
+against the zones its extent intersects, and the per-zone partial results are combined
+"""
+
+import numpy as np
+import shapely
+
+from geoclass import LayerIndex
+from building_store import BuildingStore
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+DEFAULT_MEMORY_BUDGET_MB = 512
+ORDER_CELL_SIZE = 100.0  # metres, resolution of the Z-order key
+
+# Rough working-set cost of one materialized building during a join: the coordinate
+# copy and GEOS sequence per vertex, plus the shapely object, envelope, STRtree entry
+# and candidate pairs per geometry. Deliberately conservative.
+BYTES_PER_VERTEX = 64
+BYTES_PER_GEOMETRY = 2048
+
+AGG_METHODS = ('sum', 'mean', 'count', 'max', 'min')
+
+def _spread_bits(values):
+    """Insert a zero bit between each of the 16 low bits of unsigned integers."""
+    values = values.astype(np.uint64) & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    values = (values | (values << 1)) & 0x55555555
+    return values
+
+def spatial_order(bounds, cell_size=ORDER_CELL_SIZE):
+    """
+    Order of features along a Z-order (Morton) curve of their bounding-box centres.
+
+    Parameters:
+    -----------
+    bounds : ndarray of shape (n, 4)
+        Bounding boxes (xmin, ymin, xmax, ymax) in a projected CRS
+    cell_size : float
+        Grid cell of the curve in CRS units
+
+    Returns:
+    --------
+    ndarray of int
+        Permutation putting nearby features next to each other
+    """
+    bounds = np.asarray(bounds, dtype=np.float64)
+    if len(bounds) == 0:
+        return np.zeros(0, dtype=np.int64)
+    cx = (bounds[:, 0] + bounds[:, 2]) / 2
+    cy = (bounds[:, 1] + bounds[:, 3]) / 2
+    # Missing geometries have NaN bounds: send them to the end
+    valid = ~(np.isnan(cx) | np.isnan(cy))
+    cx = np.where(valid, cx, np.nanmin(cx) if valid.any() else 0)
+    cy = np.where(valid, cy, np.nanmin(cy) if valid.any() else 0)
+
+    ix = np.clip((cx - cx.min()) // cell_size, 0, 0xFFFF)
+    iy = np.clip((cy - cy.min()) // cell_size, 0, 0xFFFF)
+    keys = _spread_bits(ix) | (_spread_bits(iy) << 1)
+    keys[~valid] = np.iinfo(np.uint64).max
+    return np.argsort(keys, kind='stable')
+
+def plan_partitions(vertex_counts, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Cut a sequence of buildings into contiguous ranges fitting a memory budget.
+
+    Parameters:
+    -----------
+    vertex_counts : ndarray of int
+        Number of coordinates of each building, in processing order
+    memory_budget_mb : float
+        Estimated working set allowed for one partition
+
+    Returns:
+    --------
+    list of (int, int)
+        (start, stop) ranges; a building larger than the budget gets its own range
+    """
+    n = len(vertex_counts)
+    if n == 0:
+        return []
+    budget = memory_budget_mb * 1024 ** 2
+    if budget < BYTES_PER_GEOMETRY:
+        raise ValueError(f"Memory budget of {memory_budget_mb} MB is too small for a single building")
+    costs = BYTES_PER_GEOMETRY + BYTES_PER_VERTEX * np.asarray(vertex_counts, dtype=np.float64)
+
+    edges = [0]
+    start = 0
+    cumulative = np.cumsum(costs)
+    while start < n:
+        offset = cumulative[start - 1] if start else 0.0
+        # Last building still within budget, at least one building per partition
+        stop = int(np.searchsorted(cumulative, offset + budget, side='right'))
+        stop = max(stop, start + 1)
+        edges.append(stop)
+        start = stop
+    return list(zip(edges[:-1], edges[1:]))
+
+class _ZoneAccumulator:
+    """Per-zone partial aggregates combined across partitions."""
+
+    def __init__(self, n_zones):
+        self.sum = np.zeros(n_zones)
+        self.count = np.zeros(n_zones, dtype=np.int64)
+        self.valid = np.zeros(n_zones, dtype=np.int64)
+        self.max = np.full(n_zones, -np.inf)
+        self.min = np.full(n_zones, np.inf)
+
+    def add(self, zone_idx, values):
+        n_zones = len(self.sum)
+        valid = ~np.isnan(values)
+        self.count += np.bincount(zone_idx, minlength=n_zones)
+        self.valid += np.bincount(zone_idx[valid], minlength=n_zones)
+        self.sum += np.bincount(zone_idx[valid], weights=values[valid], minlength=n_zones)
+        np.maximum.at(self.max, zone_idx[valid], values[valid])
+        np.minimum.at(self.min, zone_idx[valid], values[valid])
+
+    def result(self, agg_method):
+        if agg_method == 'count':
+            return self.count.astype(np.float64)
+        if agg_method == 'sum':
+            return self.sum
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if agg_method == 'mean':
+                values = self.sum / self.valid
+            else:
+                values = getattr(self, agg_method).copy()
+        # Zones without buildings get 0, as after merge_aggregated_data
+        values[self.valid == 0] = 0.0
+        return values
+
+def _partition_sources(buildings, memory_budget_mb):
+    """
+    Yield (geometries, values_by_column, bounds) per partition of a store or GeoDataFrame.
+    """
+    if isinstance(buildings, (str, bytes)) or hasattr(buildings, '__fspath__'):
+        buildings = BuildingStore(buildings)
+
+    if isinstance(buildings, BuildingStore):
+        store = buildings
+        if not store.meta.get('spatial_order'):
+            print("  Warning: building store is not spatially ordered, partitions will overlap more zones")
+        partitions = plan_partitions(store.vertex_counts(), memory_budget_mb)
+        print(f"  {len(store)} buildings in {len(partitions)} partitions (budget {memory_budget_mb} MB)")
+        for start, stop in partitions:
+            yield (store.geometries(start, stop),
+                   {column: np.asarray(values[start:stop]) for column, values in store.columns.items()},
+                   np.asarray(store.bounds[start:stop]))
+        return
+
+    # In-memory layer: order it spatially, then bound the join working set
+    geometries = np.asarray(buildings.geometry.values, dtype=object)
+    bounds = shapely.bounds(geometries)
+    order = spatial_order(bounds)
+    vertex_counts = shapely.get_num_coordinates(geometries[order])
+    partitions = plan_partitions(vertex_counts, memory_budget_mb)
+    print(f"  {len(buildings)} buildings in {len(partitions)} partitions (budget {memory_budget_mb} MB)")
+    columns = [col for col in buildings.columns if col != buildings.geometry.name]
+    for start, stop in partitions:
+        rows = order[start:stop]
+        yield (geometries[rows],
+               {column: buildings[column].to_numpy()[rows] for column in columns},
+               bounds[rows])
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def aggregate_partitioned(buildings, geo_divisions_gdf, value_column='M2_PL_TOT', agg_method='sum',
+                          memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, crs=CRS_PARIS):
+    """
+    Aggregate building data by geographic division, one spatial partition at a time.
+
+    Equivalent to aggregate_by_geographic_division (a building counts in every zone it
+    intersects), but only one partition of buildings is materialized at a time and it
+    is only tested against the zones intersecting its extent.
+
+    Parameters:
+    -----------
+    buildings : BuildingStore, str or GeoDataFrame
+        Compiled building store (or its directory), or an in-memory building layer
+    geo_divisions_gdf : GeoDataFrame
+        Geographic divisions
+    value_column : str
+        Column name to aggregate
+    agg_method : str, default 'sum'
+        Aggregation method: 'sum', 'mean', 'count', 'max', 'min'
+    memory_budget_mb : float, default 512
+        Estimated working set allowed for one partition (on top of the zone layer)
+    crs : str
+        CRS of an in-memory building layer without one
+
+    Returns:
+    --------
+    GeoDataFrame
+        Geographic divisions with the aggregated column, as aggregate_by_geographic_division
+    """
+    if agg_method not in AGG_METHODS:
+        raise ValueError(f"Unknown aggregation method '{agg_method}' (expected one of {AGG_METHODS})")
+
+    building_crs = getattr(buildings, 'crs', None) or crs
+    zones = geo_divisions_gdf.to_crs(building_crs) if geo_divisions_gdf.crs != building_crs else geo_divisions_gdf
+    zone_geoms = np.asarray(zones.geometry.values, dtype=object)
+    zone_index = LayerIndex(zone_geoms, crs=building_crs)
+    accumulator = _ZoneAccumulator(len(zones))
+
+    for geometries, columns, bounds in _partition_sources(buildings, memory_budget_mb):
+        if value_column not in columns:
+            raise KeyError(f"Column '{value_column}' is not available in the building data")
+        if np.isnan(bounds).all():
+            continue
+        extent = shapely.box(np.nanmin(bounds[:, 0]), np.nanmin(bounds[:, 1]),
+                             np.nanmax(bounds[:, 2]), np.nanmax(bounds[:, 3]))
+        _, candidates = zone_index.query([extent], predicate=None)
+        if len(candidates) == 0:
+            continue
+
+        # Join the partition against its intersecting zones only
+        local_index = LayerIndex(zone_geoms[candidates], bounds=zone_index.bounds[candidates])
+        building_idx, local_idx = local_index.query(geometries, predicate='intersects')
+        values = np.asarray(columns[value_column], dtype=np.float64)[building_idx]
+        accumulator.add(candidates[local_idx], values)
+        del geometries, columns, local_index
+
+    peak = _peak_rss_mb()
+    if peak is not None:
+        print(f"  Partitioned aggregation done, peak RSS {peak:.0f} MB")
+
+    value_agg_col = f'{value_column}_{agg_method}' if agg_method != 'count' else f'{value_column}_count'
+    result = geo_divisions_gdf.reset_index()
+    result[value_agg_col] = accumulator.result(agg_method)
+    return result.drop(columns=['index'], errors='ignore')
@@ -0,0 +1,353 @@
+"""
+Open Data Portal Requests
+Builder for Explore API v2.1 (opendatasoft) export URLs that pushes row filters (where=),
+column selection (select=) and geometry filters (Paris bounding box) to the server, so only
+the rows and fields the pipeline uses are transferred and parsed
+"""
+
+import importlib.util
+import io
+import os
+import re
+from urllib.parse import urlencode
+
+# Explore API v2.1 roots of the portals used by the project (overridable, e.g. to
+# point the loaders at a local stand-in server)
+OPENDATA_PARIS = os.environ.get('OPENDATA_PARIS_URL', "https://opendata.paris.fr/api/explore/v2.1")
+OPENDATA_IDF = os.environ.get('OPENDATA_IDF_URL', "https://data.iledefrance.fr/api/explore/v2.1")
+OPENDATASOFT_PUBLIC = os.environ.get('OPENDATASOFT_PUBLIC_URL', "https://public.opendatasoft.com/api/explore/v2.1")
+
+# Paris bounding box in WGS84 (lon_min, lat_min, lon_max, lat_max), with a small margin
+PARIS_BBOX = (2.22, 48.81, 2.47, 48.91)
+
+# Export parameters the loaders have always used
+CSV_OPTIONS = {'lang': 'fr', 'timezone': 'Europe/Berlin', 'use_labels': 'true', 'delimiter': ';'}
+
+REQUEST_TIMEOUT = 300  # seconds, whole exports can be large
+
+class QueryRejected(ValueError):
+    """The portal answered 400 to an export because of its where= or select= clause."""
+
+class DatasetRequest:
+    """
+    Export request for one portal dataset.
+
+    Filters are combined with AND; every method returns the request itself so
+    calls can be chained:
+
+        DatasetRequest(OPENDATA_IDF, 'iris').where('startswith(depcom, "751")').export_url('geojson')
+    """
+
+    def __init__(self, base_url, dataset_id):
+        """
+        Parameters:
+        -----------
+        base_url : str
+            Explore API v2.1 root (e.g. OPENDATA_PARIS, or a local stand-in server)
+        dataset_id : str
+            Dataset identifier on the portal
+        """
+        self.base_url = base_url.rstrip('/')
+        self.dataset_id = dataset_id
+        self.clauses = []
+        self.fields = []
+        self.max_rows = None
+
+    def where(self, clause):
+        """Add an ODSQL row filter (e.g. 'startswith(depcom, "751")')."""
+        self.clauses.append(clause)
+        return self
+
+    def select(self, *fields):
+        """Restrict the export to the given field identifiers."""
+        self.fields.extend(fields)
+        return self
+
+    def within_bbox(self, geometry_field='geo_shape', bbox=PARIS_BBOX):
+        """Keep only records whose geometry intersects a WGS84 bounding box."""
+        lon_min, lat_min, lon_max, lat_max = bbox
+        return self.where(f"in_bbox({geometry_field}, {lat_min}, {lon_min}, {lat_max}, {lon_max})")
+
+    def limit(self, max_rows):
+        """Cap the number of exported records."""
+        self.max_rows = max_rows
+        return self
+
+    def params(self, fmt='csv'):
+        """
+        Query parameters of the export.
+
+        Returns:
+        --------
+        dict
+        """
+        params = dict(CSV_OPTIONS) if fmt == 'csv' else {'lang': 'fr', 'timezone': CSV_OPTIONS['timezone']}
+        if self.fields:
+            params['select'] = ','.join(self.fields)
+        if self.clauses:
+            params['where'] = ' AND '.join(f"({clause})" for clause in self.clauses)
+        if self.max_rows is not None:
+            params['limit'] = self.max_rows
+        return params
+
+    def export_url(self, fmt='csv'):
+        """
+        Export URL of the dataset in a given format ('csv', 'geojson'...).
+
+        Returns:
+        --------
+        str
+        """
+        return (f"{self.base_url}/catalog/datasets/{self.dataset_id}/exports/{fmt}?"
+                f"{urlencode(self.params(fmt))}")
+
+    def unfiltered(self):
+        """Same dataset without any pushed-down filter or selection."""
+        return DatasetRequest(self.base_url, self.dataset_id)
+
+    def is_filtered(self):
+        """True if any filter, selection or limit is pushed to the portal."""
+        return bool(self.clauses or self.fields or self.max_rows is not None)
+
+    def download(self, fmt='csv'):
+        """
+        Download the export.
+
+        Returns:
+        --------
+        bytes
+
+        Raises:
+        -------
+        QueryRejected
+            If the portal rejects the where= or select= clause (HTTP 400 naming it)
+        requests.HTTPError
+            For any other error status
+        """
+        import requests
+
+        response = requests.get(self.export_url(fmt), timeout=REQUEST_TIMEOUT)
+        if response.status_code == 400 and re.search(r'\b(where|select)\b', response.text, re.IGNORECASE):
+            raise QueryRejected(f"Portal rejected the query on '{self.dataset_id}': {response.text[:200]}")
+        response.raise_for_status()
+        return response.content
+
+    def _read(self, parse, fmt, fallback):
+        try:
+            return parse(io.BytesIO(self.download(fmt)))
+        except QueryRejected as e:
+            if not fallback or not self.is_filtered():
+                raise
+            # A portal rejecting a filter should not break the pipeline: fall back to the full export
+            print(f"  Warning: {e}, downloading the full export")
+            return parse(io.BytesIO(self.unfiltered().download(fmt)))
+
+    def read_csv(self, fallback=True):
+        """
+        Download the CSV export.
+
+        Parameters:
+        -----------
+        fallback : bool, default True
+            Retry without filters if the portal rejects them (filter client-side afterwards);
+            any other error is raised
+
+        Returns:
+        --------
+        DataFrame
+        """
+        import pandas as pd
+        return self._read(lambda data: pd.read_csv(data, sep=";"), 'csv', fallback)
+
+    def read_geojson(self, fallback=True):
+        """
+        Download the GeoJSON export.
+
+        Parameters:
+        -----------
+        fallback : bool, default True
+            Retry without filters if the portal rejects them (filter client-side afterwards);
+            any other error is raised
+
+        Returns:
+        --------
+        GeoDataFrame
+        """
+        import geopandas as gpd
+        return self._read(gpd.read_file, 'geojson', fallback)
+
+    def read_geodataframe(self, geometry_field='geo_shape', formats=None, fallback=True):
+        """
+        Download the dataset in the first export format that works, as a WGS84 GeoDataFrame.
+
+        Binary exports (Parquet, FlatGeobuf) are tried first; the CSV export is the
+        last resort, with its GeoJSON strings decoded in one vectorized call. Formats
+        are negotiated with the filters in place; the full export is only downloaded
+        if no format could be read and the portal rejected the query, and then only
+        in the formats it served, stopping at the first that works.
+
+        Parameters:
+        -----------
+        geometry_field : str
+            Geometry field identifier of the dataset
+        formats : list of str, optional
+            Formats to try, in order (default: EXPORT_FORMATS); formats whose decoding
+            engine is not installed (e.g. Parquet without pyarrow) are skipped
+        fallback : bool, default True
+            Retry without filters if the portal rejects them
+
+        Returns:
+        --------
+        GeoDataFrame
+            With the negotiated format in gdf.attrs['export_format']
+        """
+        def parse(fmt):
+            return lambda data: _read_export(data, fmt, geometry_field)
+
+        errors = []
+        rejected = []
+        for fmt in formats or EXPORT_FORMATS:
+            if not can_read_format(fmt):
+                # Never download an export that could not be decoded
+                errors.append(f"{fmt}: requires one of {', '.join(FORMAT_MODULES[fmt])}")
+                continue
+            try:
+                gdf = self._read(parse(fmt), fmt, fallback=False)
+            except QueryRejected as e:
+                rejected.append(fmt)
+                errors.append(f"{fmt}: {e}")
+                continue
+            except Exception as e:  # unsupported format, missing engine (e.g. pyarrow)...
+                errors.append(f"{fmt}: {e}")
+                continue
+            gdf.attrs['export_format'] = fmt
+            return gdf
+
+        if fallback and rejected and self.is_filtered():
+            print(f"  Warning: portal rejected the query on '{self.dataset_id}', downloading the full export")
+            for fmt in rejected:
+                try:
+                    gdf = self.unfiltered()._read(parse(fmt), fmt, fallback=False)
+                except Exception as e:
+                    errors.append(f"{fmt} (unfiltered): {e}")
+                    continue
+                gdf.attrs['export_format'] = fmt
+                return gdf
+        raise ValueError(f"No export format of '{self.dataset_id}' could be read ({'; '.join(errors)})")
+
+# Preferred export formats, fastest to transfer and decode first
+EXPORT_FORMATS = ['parquet', 'fgb', 'geojson', 'csv']
+
+# Optional modules needed to decode a format (any one of them is enough)
+FORMAT_MODULES = {'parquet': ('pyarrow', 'fastparquet')}
+
+def can_read_format(fmt):
+    """True if an engine able to decode the export format is installed (checked before downloading)."""
+    modules = FORMAT_MODULES.get(fmt)
+    return modules is None or any(importlib.util.find_spec(module) is not None for module in modules)
+
+def decode_geometries(values):
+    """
+    Decode a column of exported geometries (WKB bytes or GeoJSON strings) to a Shapely array.
+
+    Missing or invalid geometries become None.
+    """
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    values = np.asarray(values, dtype=object)
+    missing = pd.isna(values)
+    geometries = np.full(len(values), None, dtype=object)
+    present = values[~missing]
+    if len(present) == 0:
+        return geometries
+    if isinstance(present[0], (bytes, bytearray, memoryview)):
+        geometries[~missing] = shapely.from_wkb(present, on_invalid='ignore')
+    else:
+        geometries[~missing] = shapely.from_geojson(present.astype(str), on_invalid='ignore')
+    return geometries
+
+def _frame_to_geodataframe(df, geometry_field):
+    """Turn an exported table with an encoded geometry column into a WGS84 GeoDataFrame."""
+    import geopandas as gpd
+
+    column = next((col for col in df.columns if col.lower() == geometry_field.lower()), None)
+    if column is None:
+        raise ValueError(f"Geometry field '{geometry_field}' not found in export")
+    geometries = decode_geometries(df[column].to_numpy())
+    gdf = gpd.GeoDataFrame(df.drop(columns=[column]), geometry=geometries, crs='EPSG:4326')
+    return gdf[gdf.geometry.notna()]
+
+def _read_export(source, fmt, geometry_field):
+    """Read one export format (path or file-like object) into a WGS84 GeoDataFrame."""
+    import geopandas as gpd
+    import pandas as pd
+
+    if fmt == 'csv':
+        return _frame_to_geodataframe(pd.read_csv(source, sep=";"), geometry_field)
+    if fmt == 'parquet':
+        return _frame_to_geodataframe(pd.read_parquet(source), geometry_field)
+    gdf = gpd.read_file(source)
+    return gdf.set_crs('EPSG:4326') if gdf.crs is None else gdf
+
+def paris_dataset(dataset_id, base_url=OPENDATA_PARIS):
+    """Request on a dataset of the Paris open data portal."""
+    return DatasetRequest(base_url, dataset_id)
+
+def benchmark_formats(request, geometry_field='geo_shape', formats=None):
+    """
+    Compare export formats of a dataset by bytes transferred and download/parse time.
+
+    Parameters:
+    -----------
+    request : DatasetRequest
+        Dataset request (filters apply to every format)
+    geometry_field : str
+        Geometry field identifier of the dataset
+    formats : list of str, optional
+        Formats to compare (default: EXPORT_FORMATS)
+
+    Returns:
+    --------
+    DataFrame
+        format, bytes, download_s, parse_s, rows (error when a format fails)
+    """
+    import tempfile
+    import time
+    import pandas as pd
+    import requests
+
+    rows = []
+    for fmt in formats or EXPORT_FORMATS:
+        row = {'format': fmt, 'bytes': None, 'download_s': None, 'parse_s': None, 'rows': None, 'error': None}
+        try:
+            if not can_read_format(fmt):
+                raise ImportError(f"requires one of {', '.join(FORMAT_MODULES[fmt])}")
+            start = time.perf_counter()
+            response = requests.get(request.export_url(fmt), timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            row['download_s'] = time.perf_counter() - start
+            row['bytes'] = len(response.content)
+
+            # Parse from a local file so only decoding is timed
+            with tempfile.NamedTemporaryFile(suffix=f'.{fmt}', delete=False) as f:
+                f.write(response.content)
+                path = f.name
+            try:
+                start = time.perf_counter()
+                gdf = _read_export(path, fmt, geometry_field)
+                row['parse_s'] = time.perf_counter() - start
+                row['rows'] = len(gdf)
+            finally:
+                os.remove(path)
+        except Exception as e:
+            row['error'] = str(e)
+        rows.append(row)
+        if row['error']:
+            print(f"  {fmt}: failed ({row['error']})")
+        else:
+            print(f"  {fmt}: {row['bytes'] / 1e6:.2f} MB, download {row['download_s']:.2f}s, "
+                  f"parse {row['parse_s']:.2f}s, {row['rows']} rows")
+
+    return pd.DataFrame(rows)
@@ -0,0 +1,207 @@
+"""
+Radius Queries
+"Floor area within r metres" for many points at once (transit stops, schools...), using an
+index on building representative points stored as NumPy arrays and buildable-land-adjusted
+densities from the cached non-buildable mask indexes
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geoclass import cached_mask_index
+from zonelocator import to_lambert93
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+CRS_WGS84 = 'EPSG:4326'
+
+class BuildingPointIndex:
+    """
+    Index over building representative points for batched radius queries.
+
+    Uses scipy's cKDTree when installed; otherwise points are bucketed on a regular
+    grid (sorted by cell key with per-cell offsets) and each query only scans the
+    cells overlapping its radius.
+    """
+
+    def __init__(self, buildings, non_buildable=None, all_non_buildable=None, value_column='M2_PL_TOT',
+                 cell_size=250.0):
+        """
+        Parameters:
+        -----------
+        buildings : GeoDataFrame
+            Building data from load_building_data
+        non_buildable : GeoDataFrame, optional
+            Water + railways (enables the corrected density)
+        all_non_buildable : GeoDataFrame, optional
+            Water + railways + green spaces (enables the ultra-corrected density)
+        value_column : str
+            Building floor area column
+        cell_size : float, default 250.0
+            Bucket size in metres of the fallback grid index
+        """
+        if buildings.crs != CRS_PARIS:
+            buildings = buildings.to_crs(CRS_PARIS)
+        points = shapely.point_on_surface(buildings.geometry.values)
+        self.x = shapely.get_x(points)
+        self.y = shapely.get_y(points)
+        self.values = buildings[value_column].fillna(0).to_numpy(dtype=np.float64)
+
+        self.masks = {}
+        if non_buildable is not None:
+            self.masks[('corrected', 'corrected')] = cached_mask_index(non_buildable, CRS_PARIS)
+        if all_non_buildable is not None:
+            self.masks[('ultra', 'ultra_corrected')] = cached_mask_index(all_non_buildable, CRS_PARIS)
+
+        try:
+            from scipy.spatial import cKDTree
+            self.tree = cKDTree(np.column_stack([self.x, self.y]))
+        except ImportError:
+            self.tree = None
+            self._build_grid(cell_size)
+
+    def _build_grid(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.x0, self.y0 = self.x.min(), self.y.min()
+        self.n_cols = int((self.x.max() - self.x0) // self.cell_size) + 1
+        self.n_rows = int((self.y.max() - self.y0) // self.cell_size) + 1
+
+        cols = ((self.x - self.x0) // self.cell_size).astype(np.int64)
+        rows = ((self.y - self.y0) // self.cell_size).astype(np.int64)
+        keys = rows * self.n_cols + cols
+        self.order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=self.n_rows * self.n_cols)
+        self.cell_start = np.concatenate([[0], np.cumsum(counts)])
+
+    def _grid_pairs(self, qx, qy, radius):
+        """(query, building) pairs within radius, scanning the cells around each query."""
+        reach = int(np.ceil(radius / self.cell_size))
+        qcol = np.floor((qx - self.x0) / self.cell_size).astype(np.int64)
+        qrow = np.floor((qy - self.y0) / self.cell_size).astype(np.int64)
+
+        query_parts, building_parts = [], []
+        for drow in range(-reach, reach + 1):
+            for dcol in range(-reach, reach + 1):
+                row, col = qrow + drow, qcol + dcol
+                inside = (row >= 0) & (row < self.n_rows) & (col >= 0) & (col < self.n_cols)
+                queries = np.flatnonzero(inside)
+                keys = row[queries] * self.n_cols + col[queries]
+                start, stop = self.cell_start[keys], self.cell_start[keys + 1]
+                lengths = stop - start
+                if lengths.sum() == 0:
+                    continue
+                query_idx = np.repeat(queries, lengths)
+                offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                building_idx = self.order[np.repeat(start, lengths) + offsets]
+                query_parts.append(query_idx)
+                building_parts.append(building_idx)
+
+        if not query_parts:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        query_idx = np.concatenate(query_parts)
+        building_idx = np.concatenate(building_parts)
+        dist2 = (self.x[building_idx] - qx[query_idx]) ** 2 + (self.y[building_idx] - qy[query_idx]) ** 2
+        keep = dist2 <= radius ** 2
+        return query_idx[keep], building_idx[keep]
+
+    def _pairs(self, qx, qy, radius):
+        """(query, building) pairs with the building point within radius of the query point."""
+        if self.tree is None:
+            return self._grid_pairs(qx, qy, radius)
+        neighbours = self.tree.query_ball_point(np.column_stack([qx, qy]), r=radius)
+        lengths = np.array([len(found) for found in neighbours], dtype=np.int64)
+        if lengths.sum() == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return np.repeat(np.arange(len(qx)), lengths), np.concatenate(neighbours).astype(np.int64)
+
+    def query(self, x, y, radii, crs=CRS_WGS84, chunk_size=50_000):
+        """
+        Floor area, building count and densities within each radius of each point.
+
+        Parameters:
+        -----------
+        x, y : array-like
+            Query coordinates (longitude/latitude in WGS84 by default)
+        radii : float or list of float
+            Radii in metres
+        crs : str
+            CRS of the coordinates ('EPSG:4326' or 'EPSG:2154')
+        chunk_size : int
+            Number of points processed at once (bounds memory use)
+
+        Returns:
+        --------
+        DataFrame
+            One row per (point, radius): point, radius_m, building_volume_m2, building_count,
+            total_area_m2, density_m2_m2_raw and, when masks are provided,
+            buildable_area_m2_{corrected,ultra} and density_m2_m2_{corrected,ultra_corrected}
+        """
+        qx, qy = to_lambert93(x, y, crs)
+        qx, qy = np.atleast_1d(qx), np.atleast_1d(qy)
+        n = len(qx)
+        radii = np.atleast_1d(np.asarray(radii, dtype=np.float64))
+        print(f"Querying {n} points at {len(radii)} radii...")
+
+        tables = []
+        for radius in radii:
+            volume = np.zeros(n)
+            count = np.zeros(n, dtype=np.int64)
+            covered = {key: np.zeros(n) for key in self.masks}
+            for start in range(0, n, chunk_size):
+                stop = min(start + chunk_size, n)
+                query_idx, building_idx = self._pairs(qx[start:stop], qy[start:stop], radius)
+                volume[start:stop] = np.bincount(query_idx, weights=self.values[building_idx], minlength=stop - start)
+                count[start:stop] = np.bincount(query_idx, minlength=stop - start)
+                if self.masks:
+                    discs = shapely.buffer(shapely.points(qx[start:stop], qy[start:stop]), radius, quad_segs=16)
+                    for key, mask_index in self.masks.items():
+                        covered[key][start:stop] = mask_index.covered_area(discs)
+
+            # Exact disc area (buffers are polygonal approximations)
+            total_area = np.full(n, np.pi * radius ** 2)
+            table = pd.DataFrame({
+                'point': np.arange(n),
+                'radius_m': radius,
+                'building_volume_m2': volume,
+                'building_count': count,
+                'total_area_m2': total_area,
+                'density_m2_m2_raw': volume / total_area,
+            })
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for (suffix, density_suffix), area in covered.items():
+                    buildable = np.clip(total_area - area, 0, None)
+                    table[f'buildable_area_m2_{suffix}'] = buildable
+                    table[f'density_m2_m2_{density_suffix}'] = np.nan_to_num(volume / buildable, nan=0.0, posinf=0.0)
+            tables.append(table)
+
+        return pd.concat(tables, ignore_index=True)
+
+def floor_area_within(x, y, radii, buildings, non_buildable=None, all_non_buildable=None, crs=CRS_WGS84):
+    """
+    Built floor area, building count and densities within radii of many points.
+
+    Convenience wrapper around BuildingPointIndex; keep the index around to run
+    several query batches against the same buildings.
+
+    Parameters:
+    -----------
+    x, y : array-like
+        Query coordinates
+    radii : float or list of float
+        Radii in metres
+    buildings : GeoDataFrame
+        Building data from load_building_data
+    non_buildable : GeoDataFrame, optional
+        Water + railways
+    all_non_buildable : GeoDataFrame, optional
+        Water + railways + green spaces
+    crs : str
+        CRS of the coordinates
+
+    Returns:
+    --------
+    DataFrame
+    """
+    index = BuildingPointIndex(buildings, non_buildable, all_non_buildable)
+    return index.query(x, y, radii, crs=crs)
@@ -0,0 +1,429 @@
+"""
+Raster Density Index
+Fine rasters of building floor area (M2_PL_TOT) and buildable-land fraction stored as
+summed-area tables (integral images), answering the approximate density of any
+axis-aligned window in O(1) and of any rasterized polygon in O(perimeter)
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+
+class RasterGrid:
+    """
+    Regular pixel grid in Lambert 93.
+
+    Row 0 is the southernmost row (y increases with the row index), so pixel
+    (row, col) covers [x0 + col*res, x0 + (col+1)*res] x [y0 + row*res, y0 + (row+1)*res].
+    """
+
+    def __init__(self, bounds, resolution):
+        """
+        Parameters:
+        -----------
+        bounds : tuple
+            (xmin, ymin, xmax, ymax) in metres
+        resolution : float
+            Pixel size in metres
+        """
+        self.resolution = float(resolution)
+        self.x0 = np.floor(bounds[0] / resolution) * resolution
+        self.y0 = np.floor(bounds[1] / resolution) * resolution
+        self.n_cols = int(np.ceil((bounds[2] - self.x0) / resolution))
+        self.n_rows = int(np.ceil((bounds[3] - self.y0) / resolution))
+
+    @property
+    def shape(self):
+        return self.n_rows, self.n_cols
+
+    @property
+    def pixel_area(self):
+        return self.resolution ** 2
+
+    def pixel_of(self, x, y):
+        """
+        Vectorized (row, col) of coordinates, and a validity mask.
+        """
+        col = np.floor((np.asarray(x) - self.x0) / self.resolution).astype(np.int64)
+        row = np.floor((np.asarray(y) - self.y0) / self.resolution).astype(np.int64)
+        valid = (col >= 0) & (col < self.n_cols) & (row >= 0) & (row < self.n_rows)
+        return row, col, valid
+
+    def window(self, bounds):
+        """
+        Pixel window (row0, row1, col0, col1), end-exclusive, of pixels whose centre lies in bounds.
+        """
+        res = self.resolution
+        col0 = int(np.ceil((bounds[0] - self.x0) / res - 0.5))
+        col1 = int(np.floor((bounds[2] - self.x0) / res - 0.5)) + 1
+        row0 = int(np.ceil((bounds[1] - self.y0) / res - 0.5))
+        row1 = int(np.floor((bounds[3] - self.y0) / res - 0.5)) + 1
+        return (max(row0, 0), min(row1, self.n_rows), max(col0, 0), min(col1, self.n_cols))
+
+def polygon_row_spans(geometry, grid):
+    """
+    Scanline decomposition of a polygon into pixel spans (even-odd rule on pixel centres).
+
+    Work is proportional to the perimeter of the polygon measured in pixels: each edge
+    only contributes crossings for the pixel rows it spans.
+
+    Parameters:
+    -----------
+    geometry : shapely Polygon or MultiPolygon
+        Polygon in the grid CRS
+    grid : RasterGrid
+        Target grid
+
+    Returns:
+    --------
+    tuple of ndarray
+        (rows, first columns, last columns + 1) of every non-empty span
+    """
+    empty = (np.array([], dtype=np.int64),) * 3
+    rings = shapely.get_rings(shapely.get_parts(geometry))
+    if len(rings) == 0:
+        return empty
+
+    # All ring edges as (xa, ya) -> (xb, yb)
+    coords, ring_idx = shapely.get_coordinates(rings, return_index=True)
+    same_ring = ring_idx[1:] == ring_idx[:-1]
+    xa, ya = coords[:-1, 0][same_ring], coords[:-1, 1][same_ring]
+    xb, yb = coords[1:, 0][same_ring], coords[1:, 1][same_ring]
+
+    # Pixel-row centres crossed by each edge (half-open rule avoids double counting vertices)
+    res = grid.resolution
+    y_low, y_high = np.minimum(ya, yb), np.maximum(ya, yb)
+    r_start = np.ceil((y_low - grid.y0) / res - 0.5).astype(np.int64)
+    r_stop = np.ceil((y_high - grid.y0) / res - 0.5).astype(np.int64)
+    r_start = np.clip(r_start, 0, grid.n_rows)
+    r_stop = np.clip(r_stop, 0, grid.n_rows)
+    n_cross = np.clip(r_stop - r_start, 0, None)
+    if n_cross.sum() == 0:
+        return empty
+
+    edge = np.repeat(np.arange(len(xa)), n_cross)
+    offsets = np.arange(n_cross.sum()) - np.repeat(np.cumsum(n_cross) - n_cross, n_cross)
+    rows = r_start[edge] + offsets
+    y_centre = grid.y0 + (rows + 0.5) * res
+    t = (y_centre - ya[edge]) / (yb[edge] - ya[edge])
+    x_cross = xa[edge] + t * (xb[edge] - xa[edge])
+
+    # Pair sorted crossings row by row: [x0, x1], [x2, x3]...
+    order = np.lexsort((x_cross, rows))
+    rows, x_cross = rows[order], x_cross[order]
+    rows, x_left, x_right = rows[0::2], x_cross[0::2], x_cross[1::2]
+
+    c_start = np.clip(np.ceil((x_left - grid.x0) / res - 0.5).astype(np.int64), 0, grid.n_cols)
+    c_stop = np.clip(np.floor((x_right - grid.x0) / res - 0.5).astype(np.int64) + 1, 0, grid.n_cols)
+    keep = c_stop > c_start
+    return rows[keep], c_start[keep], c_stop[keep]
+
+def rasterize_polygons(geometries, grid):
+    """
+    Boolean raster of the pixels whose centre lies inside any of the geometries.
+
+    Uses rasterio when installed and the scanline decomposition otherwise.
+
+    Parameters:
+    -----------
+    geometries : array-like of shapely geometries
+        Polygons in the grid CRS
+    grid : RasterGrid
+        Target grid
+
+    Returns:
+    --------
+    ndarray of bool, shape grid.shape
+    """
+    geometries = [geom for geom in np.asarray(geometries, dtype=object).ravel()
+                  if geom is not None and not geom.is_empty]
+    if not geometries:
+        return np.zeros(grid.shape, dtype=bool)
+    try:
+        from rasterio import features
+        from rasterio.transform import Affine
+        # rasterio rows go north to south: flip to keep row 0 in the south
+        transform = Affine(grid.resolution, 0, grid.x0, 0, -grid.resolution, grid.y0 + grid.n_rows * grid.resolution)
+        burned = features.rasterize(((geom, 1) for geom in geometries), out_shape=grid.shape,
+                                    transform=transform, fill=0, dtype='uint8')
+        return burned[::-1].astype(bool)
+    except ImportError:
+        # Span starts and ends accumulated in a difference image, one cumsum per row
+        diff = np.zeros((grid.n_rows, grid.n_cols + 1), dtype=np.int32)
+        for geom in geometries:
+            for part in shapely.get_parts(geom):
+                rows, c_start, c_stop = polygon_row_spans(part, grid)
+                np.add.at(diff, (rows, c_start), 1)
+                np.add.at(diff, (rows, c_stop), -1)
+        return np.cumsum(diff, axis=1)[:, :-1] > 0
+
+def polygon_spans(geometries, grid):
+    """
+    Scanline spans of many polygons, tagged with the position of their polygon.
+
+    Returns:
+    --------
+    tuple of ndarray
+        (polygon positions, rows, first columns, last columns + 1)
+    """
+    no_spans = (np.array([], dtype=np.int64),) * 3
+    parts = [polygon_row_spans(geom, grid) if geom is not None and not geom.is_empty else no_spans
+             for geom in np.asarray(geometries, dtype=object)]
+    if not parts:
+        return (np.array([], dtype=np.int64),) * 4
+    owner = np.repeat(np.arange(len(parts)), [len(rows) for rows, _, _ in parts])
+    rows, c_start, c_stop = (np.concatenate(arrays) for arrays in zip(*parts))
+    return owner, rows, c_start, c_stop
+
+def zone_pixel_sums(geometries, grid, rasters=()):
+    """
+    Pixel counts and raster sums per polygon, from per-row prefix sums over the scanline spans.
+
+    Parameters:
+    -----------
+    geometries : array-like of shapely geometries
+        Polygons in the grid CRS
+    grid : RasterGrid
+        Pixel grid
+    rasters : sequence of ndarray
+        Rasters (shape grid.shape) to sum inside each polygon
+
+    Returns:
+    --------
+    tuple of ndarray
+        (pixel count per polygon, [sum per polygon for each raster])
+    """
+    n = len(geometries)
+    owner, rows, c_start, c_stop = polygon_spans(geometries, grid)
+    counts = np.bincount(owner, weights=(c_stop - c_start).astype(np.float64), minlength=n)
+    sums = []
+    for raster in rasters:
+        prefix = raster if raster.shape[1] == grid.n_cols + 1 else row_prefix_sums(raster)
+        sums.append(np.bincount(owner, weights=prefix[rows, c_stop] - prefix[rows, c_start], minlength=n))
+    return counts, sums
+
+def raster_buildable_areas(zone_geometries, mask_geometries, resolution=5.0):
+    """
+    Approximate buildable area per zone by pixel counting.
+
+    Zones and masks are rasterized on a common grid; the masked share of each
+    zone's pixels is applied to its exact area, so the only approximation is the
+    mask boundary discretization. Zones too small to contain a pixel centre fall
+    back to exact differencing.
+
+    Parameters:
+    -----------
+    zone_geometries : array-like of shapely geometries
+        Zones in Lambert 93
+    mask_geometries : array-like of shapely geometries
+        Non-buildable areas in Lambert 93
+    resolution : float, default 5.0
+        Pixel size in metres
+
+    Returns:
+    --------
+    ndarray
+        Buildable area per zone in m²
+    """
+    zone_geometries = np.asarray(zone_geometries, dtype=object)
+    mask_geometries = np.asarray(mask_geometries, dtype=object)
+    zone_area = shapely.area(zone_geometries)
+    if len(zone_geometries) == 0 or len(mask_geometries) == 0:
+        return zone_area
+
+    grid = RasterGrid(shapely.total_bounds(zone_geometries), resolution)
+    mask = rasterize_polygons(mask_geometries, grid)
+    pixels, (masked,) = zone_pixel_sums(zone_geometries, grid, [mask.astype(np.float64)])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buildable = zone_area * (1.0 - np.where(pixels > 0, masked / pixels, 0.0))
+
+    missing = np.flatnonzero(pixels == 0)
+    if len(missing):
+        mask_union = shapely.union_all(mask_geometries)
+        buildable[missing] = shapely.area(shapely.difference(zone_geometries[missing], mask_union))
+    return buildable
+
+def rasterize_point_values(x, y, values, grid):
+    """
+    Raster of point values summed per pixel.
+
+    Returns:
+    --------
+    ndarray of float64, shape grid.shape
+    """
+    rows, cols, valid = grid.pixel_of(x, y)
+    flat = rows[valid] * grid.n_cols + cols[valid]
+    sums = np.bincount(flat, weights=np.asarray(values, dtype=np.float64)[valid], minlength=grid.n_rows * grid.n_cols)
+    return sums.reshape(grid.shape)
+
+def integral_image(raster):
+    """
+    Summed-area table with a leading zero row and column: S[r, c] = raster[:r, :c].sum().
+    """
+    table = np.zeros((raster.shape[0] + 1, raster.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(raster, axis=0, dtype=np.float64), axis=1, out=table[1:, 1:])
+    return table
+
+def row_prefix_sums(raster):
+    """
+    Per-row prefix sums with a leading zero column: P[r, c] = raster[r, :c].sum().
+    """
+    table = np.zeros((raster.shape[0], raster.shape[1] + 1), dtype=np.float64)
+    np.cumsum(raster, axis=1, dtype=np.float64, out=table[:, 1:])
+    return table
+
+class DensityRasterIndex:
+    """
+    Summed-area tables of building floor area and buildable land for constant-time
+    approximate density queries.
+    """
+
+    def __init__(self, grid, floor_area, buildable):
+        """
+        Parameters:
+        -----------
+        grid : RasterGrid
+            Pixel grid
+        floor_area : ndarray
+            Building floor area (m²) summed per pixel
+        buildable : ndarray
+            Buildable fraction of each pixel (0 to 1)
+        """
+        self.grid = grid
+        self.floor_sat = integral_image(floor_area)
+        self.buildable_sat = integral_image(buildable)
+        self.floor_rows = row_prefix_sums(floor_area)
+        self.buildable_rows = row_prefix_sums(buildable)
+
+    @classmethod
+    def build(cls, buildings, boundary, non_buildable=None, resolution=5.0, value_column='M2_PL_TOT'):
+        """
+        Build the index from the pipeline inputs.
+
+        Parameters:
+        -----------
+        buildings : GeoDataFrame
+            Building data from load_building_data (Lambert 93)
+        boundary : shapely geometry
+            Study area in Lambert 93 (e.g. gridding.paris_boundary(geo))
+        non_buildable : GeoDataFrame, optional
+            Non-buildable union (load_non_buildable_areas or load_all_nonbuildable_areas)
+        resolution : float, default 5.0
+            Pixel size in metres
+        value_column : str
+            Building floor area column
+
+        Returns:
+        --------
+        DensityRasterIndex
+        """
+        grid = RasterGrid(boundary.bounds, resolution)
+        print(f"Building {grid.n_rows} x {grid.n_cols} density raster at {resolution:g} m...")
+
+        if buildings.crs != CRS_PARIS:
+            buildings = buildings.to_crs(CRS_PARIS)
+        points = shapely.point_on_surface(buildings.geometry.values)
+        floor_area = rasterize_point_values(shapely.get_x(points), shapely.get_y(points),
+                                            buildings[value_column].fillna(0).to_numpy(), grid)
+
+        buildable = rasterize_polygons([boundary], grid)
+        if non_buildable is not None and not non_buildable.empty:
+            mask = non_buildable.to_crs(CRS_PARIS) if non_buildable.crs != CRS_PARIS else non_buildable
+            buildable &= ~rasterize_polygons(mask.geometry.values, grid)
+
+        return cls(grid, floor_area, buildable.astype(np.float64))
+
+    def _window_sums(self, bounds):
+        row0, row1, col0, col1 = self.grid.window(bounds)
+        if row1 <= row0 or col1 <= col0:
+            return 0.0, 0.0
+        def box_sum(sat):
+            return sat[row1, col1] - sat[row0, col1] - sat[row1, col0] + sat[row0, col0]
+        return box_sum(self.floor_sat), box_sum(self.buildable_sat)
+
+    def window_density(self, xmin, ymin, xmax, ymax):
+        """
+        Approximate floor area, buildable area and density of an axis-aligned window, in O(1).
+
+        Returns:
+        --------
+        dict
+            floor_area_m2, buildable_area_m2, density_m2_m2
+        """
+        floor_area, buildable_pixels = self._window_sums((xmin, ymin, xmax, ymax))
+        buildable_area = buildable_pixels * self.grid.pixel_area
+        return {
+            'floor_area_m2': floor_area,
+            'buildable_area_m2': buildable_area,
+            'density_m2_m2': floor_area / buildable_area if buildable_area > 0 else 0.0,
+        }
+
+    def polygon_sums(self, geometry):
+        """
+        Floor area and buildable area inside a rasterized polygon, in O(perimeter).
+
+        Returns:
+        --------
+        tuple
+            (floor area m², buildable area m²)
+        """
+        rows, c_start, c_stop = polygon_row_spans(geometry, self.grid)
+        if len(rows) == 0:
+            return 0.0, 0.0
+        floor_area = (self.floor_rows[rows, c_stop] - self.floor_rows[rows, c_start]).sum()
+        buildable = (self.buildable_rows[rows, c_stop] - self.buildable_rows[rows, c_start]).sum()
+        return floor_area, buildable * self.grid.pixel_area
+
+    def polygon_density(self, geometries):
+        """
+        Approximate densities for polygons.
+
+        Parameters:
+        -----------
+        geometries : array-like of shapely geometries
+            Polygons in Lambert 93
+
+        Returns:
+        --------
+        DataFrame
+            floor_area_m2, buildable_area_m2, density_m2_m2 per polygon
+        """
+        _, (floor_area, buildable) = zone_pixel_sums(np.asarray(geometries, dtype=object), self.grid,
+                                                     [self.floor_rows, self.buildable_rows])
+        buildable = buildable * self.grid.pixel_area
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density = np.where(buildable > 0, floor_area / buildable, 0.0)
+        return pd.DataFrame({'floor_area_m2': floor_area, 'buildable_area_m2': buildable, 'density_m2_m2': density})
+
+    def error_report(self, exact_buildable_gdf):
+        """
+        Compare approximate buildable areas with exact create_buildable_geometries results.
+
+        Parameters:
+        -----------
+        exact_buildable_gdf : GeoDataFrame
+            Output of create_buildable_geometries for the same mask (Lambert 93)
+
+        Returns:
+        --------
+        DataFrame
+            exact and approximate buildable areas with absolute and relative errors per zone
+        """
+        zones = exact_buildable_gdf.to_crs(CRS_PARIS) if exact_buildable_gdf.crs != CRS_PARIS else exact_buildable_gdf
+        approx = self.polygon_density(zones.geometry.values)
+        report = pd.DataFrame({
+            'exact_buildable_area_m2': zones['buildable_area_m2'].to_numpy(),
+            'approx_buildable_area_m2': approx['buildable_area_m2'].to_numpy(),
+        }, index=zones.index)
+        report['abs_error_m2'] = report['approx_buildable_area_m2'] - report['exact_buildable_area_m2']
+        report['rel_error_pct'] = (report['abs_error_m2'] / report['exact_buildable_area_m2'] * 100).replace(
+            [np.inf, -np.inf], np.nan)
+
+        print(f"Raster approximation at {self.grid.resolution:g} m: "
+              f"mean |error| {report['rel_error_pct'].abs().mean():.3f}%, "
+              f"max |error| {report['rel_error_pct'].abs().max():.3f}%")
+        return report
@@ -0,0 +1,144 @@
+"""
+Test fixtures: a local stand-in for the Explore API v2.1 export endpoint
+"""
+
+import csv
+import io
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+# Datasets served by the stand-in portal: {dataset_id: records}
+DATASETS = {
+    'iris': [
+        {'depcom': '75101', 'nom': 'Saint-Germain-l\'Auxerrois 1', 'geo_shape': (2.33, 48.86)},
+        {'depcom': '75102', 'nom': 'Gaillon 1', 'geo_shape': (2.34, 48.87)},
+        {'depcom': '75120', 'nom': 'Charonne 1', 'geo_shape': (2.40, 48.85)},
+        {'depcom': '92012', 'nom': 'Boulogne 1', 'geo_shape': (2.24, 48.83)},
+        {'depcom': '93066', 'nom': 'Saint-Denis 1', 'geo_shape': (2.36, 48.94)},
+    ],
+}
+BROKEN_DATASET = 'broken'  # always answers 500
+
+_STARTSWITH = re.compile(r'^startswith\((\w+), "([^"]*)"\)$')
+_EQUALS = re.compile(r"^(\w+)\s*=\s*'([^']*)'$")
+_IN_BBOX = re.compile(r'^in_bbox\((\w+), ([-\d.]+), ([-\d.]+), ([-\d.]+), ([-\d.]+)\)$')
+
+def _clause_filter(clause):
+    """Predicate of one ODSQL clause among the few the stand-in understands (None otherwise)."""
+    match = _STARTSWITH.match(clause)
+    if match:
+        field, prefix = match.groups()
+        return lambda record: str(record.get(field, '')).startswith(prefix)
+    match = _EQUALS.match(clause)
+    if match:
+        field, value = match.groups()
+        return lambda record: str(record.get(field)) == value
+    match = _IN_BBOX.match(clause)
+    if match:
+        field = match.group(1)
+        lat_min, lon_min, lat_max, lon_max = map(float, match.groups()[1:])
+        return lambda record: (lon_min <= record[field][0] <= lon_max and lat_min <= record[field][1] <= lat_max)
+    return None
+
+def _split_where(where):
+    """Clauses of a where= parameter built by DatasetRequest ('(a) AND (b)')."""
+    if not where:
+        return []
+    return where.strip()[1:-1].split(') AND (')
+
+def _geojson_point(lon_lat):
+    return {'type': 'Point', 'coordinates': list(lon_lat)}
+
+class _PortalHandler(BaseHTTPRequestHandler):
+    """Export endpoint honouring where=, select= and limit= on DATASETS."""
+
+    def _error(self, status, message):
+        body = json.dumps({'error_code': 'ODSQLError', 'message': message}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.received.append({'path': url.path, 'params': params})
+
+        match = re.match(r'^/api/explore/v2\.1/catalog/datasets/([^/]+)/exports/(\w+)$', url.path)
+        if not match:
+            return self._error(404, f"Unknown path {url.path}")
+        dataset_id, fmt = match.groups()
+        if dataset_id == BROKEN_DATASET:
+            return self._error(500, "Internal server error")
+        if dataset_id not in DATASETS:
+            return self._error(404, f"Unknown dataset {dataset_id}")
+        if fmt not in ('csv', 'geojson'):
+            return self._error(400, f"Unsupported export format {fmt}")
+
+        records = DATASETS[dataset_id]
+        for clause in _split_where(params.get('where')):
+            predicate = _clause_filter(clause)
+            if predicate is None:
+                return self._error(400, f"ODSQL query is malformed: {clause} "
+                                        f"Clause(s) containing the error(s): where.")
+            records = [record for record in records if predicate(record)]
+
+        fields = list(records[0]) if records else list(DATASETS[dataset_id][0])
+        if 'select' in params:
+            fields = [field.strip() for field in params['select'].split(',')]
+            unknown = [field for field in fields if field not in DATASETS[dataset_id][0]]
+            if unknown:
+                return self._error(400, f"Unknown field {unknown[0]} in select clause")
+        if 'limit' in params and int(params['limit']) >= 0:
+            records = records[:int(params['limit'])]
+
+        if fmt == 'csv':
+            out = io.StringIO()
+            writer = csv.writer(out, delimiter=params.get('delimiter', ';'))
+            writer.writerow(fields)
+            for record in records:
+                writer.writerow([json.dumps(_geojson_point(record[field])) if field == 'geo_shape'
+                                 else record[field] for field in fields])
+            body, content_type = out.getvalue().encode('utf-8'), 'text/csv'
+        else:
+            features = [{'type': 'Feature',
+                         'geometry': _geojson_point(record['geo_shape']) if 'geo_shape' in fields else None,
+                         'properties': {field: record[field] for field in fields if field != 'geo_shape'}}
+                        for record in records]
+            body = json.dumps({'type': 'FeatureCollection', 'features': features}).encode('utf-8')
+            content_type = 'application/geo+json'
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture(scope='session')
+def _portal_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PortalHandler)
+    server.received = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def portal(_portal_server):
+    """
+    Stand-in portal: .base_url is an Explore API v2.1 root, .received the requests
+    it got during the test ({'path', 'params'} dicts, in order).
+    """
+    _portal_server.received.clear()
+    _portal_server.base_url = f"http://127.0.0.1:{_portal_server.server_address[1]}/api/explore/v2.1"
+    return _portal_server
@@ -0,0 +1,114 @@
+import http.client
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from daemon import _Handler, _allowed_hosts, _resolve_output_dir
+
+class _StubState:
+    """WarmState stand-in serving a fixed density table."""
+
+    def status(self):
+        return {'loaded_at': 0}
+
+    def density(self, level, variants=None):
+        return pd.DataFrame({'level': [level], 'density_m2_m2_raw': [1.5]})
+
+@pytest.fixture
+def daemon_server(tmp_path):
+    """Start a daemon handler over a stub state; call with the server's output_dir."""
+    servers = []
+
+    def start(output_dir=str(tmp_path)):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        server.state = _StubState()
+        server.allowed_hosts = _allowed_hosts('127.0.0.1', server.server_address[1])
+        server.output_dir = output_dir
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def _request(server, method, path, body=None, headers=None):
+    """Send a request with explicit headers; returns (status, decoded JSON body)."""
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def _post_json(server, path, payload):
+    return _request(server, 'POST', path, json.dumps(payload),
+                    {'Content-Type': 'application/json', 'Host': f"127.0.0.1:{server.server_address[1]}"})
+
+def test_allowed_hosts_of_a_loopback_bind():
+    hosts = _allowed_hosts('127.0.0.1', 8765)
+
+    assert {'127.0.0.1:8765', 'localhost:8765', '[::1]:8765'} <= hosts
+    assert 'evil.example:8765' not in hosts
+
+def test_foreign_host_is_rejected(daemon_server):
+    server = daemon_server()
+
+    status, body = _request(server, 'GET', '/status', headers={'Host': 'evil.example'})
+    assert status == 403
+    assert 'Host' in body['error']
+
+    status, _ = _request(server, 'GET', '/status', headers={'Host': f"localhost:{server.server_address[1]}"})
+    assert status == 200
+
+def test_form_encoded_post_is_rejected(daemon_server):
+    server = daemon_server()
+
+    status, _ = _request(server, 'POST', '/density', 'level=iris',
+                         {'Content-Type': 'application/x-www-form-urlencoded',
+                          'Host': f"127.0.0.1:{server.server_address[1]}"})
+    assert status == 415
+
+def test_output_dir_outside_root_is_refused(tmp_path):
+    with pytest.raises(PermissionError):
+        _resolve_output_dir(str(tmp_path), '../x')
+    with pytest.raises(PermissionError):
+        _resolve_output_dir(str(tmp_path), '/etc')
+
+def test_symlink_escaping_root_is_refused(tmp_path):
+    root = tmp_path / 'out'
+    root.mkdir()
+    os.symlink(tmp_path, root / 'link')
+
+    with pytest.raises(PermissionError):
+        _resolve_output_dir(str(root), 'link/x')
+
+def test_saving_disabled_without_output_dir(daemon_server):
+    with pytest.raises(PermissionError):
+        _resolve_output_dir(None, 'x')
+
+    server = daemon_server(output_dir=None)
+    status, body = _post_json(server, '/density', {'level': 'iris', 'output_dir': 'x'})
+    assert status == 403
+    assert '--output-dir' in body['error']
+
+def test_escaping_output_dir_is_refused_before_computing(daemon_server, tmp_path):
+    server = daemon_server()
+
+    status, _ = _post_json(server, '/density', {'level': 'iris', 'output_dir': '../x'})
+    assert status == 403
+    assert not (tmp_path.parent / 'x').exists()
+
+def test_nested_output_dir_is_created(daemon_server, tmp_path):
+    server = daemon_server()
+
+    status, body = _post_json(server, '/density', {'level': 'iris', 'output_dir': 'runs/2024'})
+    assert status == 200
+    assert body['records'] == [{'level': 'iris', 'density_m2_m2_raw': 1.5}]
+    assert (tmp_path / 'runs' / '2024' / 'paris_iris_complete.csv').exists()
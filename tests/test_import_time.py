@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous budget: importing pandas, geopandas and shapely dominates, plotting
+# libraries alone would add about as much again
+IMPORT_TIME_BUDGET_S = 5.0
+PLOTTING_MODULES = ('matplotlib', 'seaborn', 'folium')
+
+def _importtime(module):
+    """{module name: cumulative import time in µs} from python -X importtime."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def test_extract_does_not_import_plotting_libraries():
+    times = _importtime('extract_density_dataframes')
+
+    assert 'extract_density_dataframes' in times
+    imported = [name for name in times if name.split('.')[0] in PLOTTING_MODULES]
+    assert imported == []
+
+def test_extract_import_time_budget():
+    times = _importtime('extract_density_dataframes')
+
+    assert times['extract_density_dataframes'] / 1e6 < IMPORT_TIME_BUDGET_S
@@ -0,0 +1,59 @@
+from itertools import combinations
+
+import numpy as np
+import geopandas as gpd
+import pytest
+import shapely
+
+from overlaps import OverlapMatrix
+from unionengine import union_layers
+
+CRS_PARIS = 'EPSG:2154'
+
+@pytest.fixture
+def zones():
+    """3 × 3 grid of 100 m zones."""
+    x0, y0 = np.meshgrid(np.arange(3) * 100.0, np.arange(3) * 100.0)
+    boxes = shapely.box(x0.ravel(), y0.ravel(), x0.ravel() + 100, y0.ravel() + 100)
+    return gpd.GeoDataFrame({'zone': range(9)}, geometry=list(boxes), crs=CRS_PARIS)
+
+@pytest.fixture
+def components():
+    """Overlapping water, rail and green masks, unioned as load_mask_components does."""
+    def layer(*geometries):
+        return union_layers([gpd.GeoDataFrame(geometry=list(geometries), crs=CRS_PARIS)])
+
+    return {
+        # A river across the grid and a pond overlapping it
+        'water': layer(shapely.box(-10, 120, 310, 160), shapely.Point(150, 150).buffer(40)),
+        # Tracks crossing the river, as two overlapping features
+        'rail': layer(shapely.box(60, -10, 90, 310), shapely.box(60, 200, 250, 230)),
+        # Parks overlapping both
+        'green': layer(shapely.box(40, 40, 180, 140), shapely.Point(240, 220).buffer(35)),
+    }
+
+def _exact_buildable(zones, components, names):
+    """Buildable area from an exact overlay against the union of the components."""
+    mask = shapely.union_all([components[name].geometry.union_all() for name in names])
+    return zones.area.to_numpy() - zones.intersection(mask).area.to_numpy()
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+def test_inclusion_exclusion_matches_exact_overlay(zones, components, size):
+    matrix = OverlapMatrix(zones, components)
+
+    for names in combinations(components, size):
+        buildable = matrix.buildable_area(names)
+        np.testing.assert_allclose(buildable['buildable_area_m2'].to_numpy(),
+                                   _exact_buildable(zones, components, names), atol=1e-6)
+
+def test_buildable_percentage_and_index(zones, components):
+    zones = zones.set_index(zones['zone'] + 100)
+    buildable = OverlapMatrix(zones, components).buildable_area(['water', 'rail'])
+
+    assert buildable.index.equals(zones.index)
+    expected = np.round(_exact_buildable(zones, components, ['water', 'rail']) / zones.area.to_numpy() * 100, 1)
+    np.testing.assert_allclose(buildable['buildable_percentage'].to_numpy(), expected)
+
+def test_unknown_component_is_rejected(zones, components):
+    with pytest.raises(KeyError):
+        OverlapMatrix(zones, components).covered_area(['water', 'roads'])
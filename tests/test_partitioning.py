@@ -0,0 +1,64 @@
+import numpy as np
+import geopandas as gpd
+import pytest
+import shapely
+
+from annexfunctions import aggregate_by_geographic_division
+from building_store import BuildingStore, compile_building_store
+from partitioning import aggregate_partitioned, plan_partitions, spatial_order
+
+CRS_PARIS = 'EPSG:2154'
+BUDGET_MB = 0.1  # a few dozen synthetic buildings per partition
+
+@pytest.fixture
+def zones():
+    """4 × 4 grid of 250 m zones, plus one zone without buildings."""
+    x0, y0 = np.meshgrid(np.arange(4) * 250.0, np.arange(4) * 250.0)
+    boxes = list(shapely.box(x0.ravel(), y0.ravel(), x0.ravel() + 250, y0.ravel() + 250))
+    boxes.append(shapely.box(5000, 5000, 5100, 5100))
+    return gpd.GeoDataFrame({'zone': [f'z{i}' for i in range(len(boxes))]}, geometry=boxes, crs=CRS_PARIS)
+
+@pytest.fixture
+def buildings():
+    """Small boxes, some straddling zone edges, some MultiPolygons, one missing value."""
+    rng = np.random.default_rng(0)
+    n = 600
+    x, y = rng.uniform(0, 990, n), rng.uniform(0, 990, n)
+    size = rng.uniform(2, 30, n)
+    geometries = list(shapely.box(x, y, x + size, y + size))
+    for i in range(0, n, 50):
+        geometries[i] = shapely.MultiPolygon([geometries[i], shapely.box(x[i] + 40, y[i], x[i] + 45, y[i] + 5)])
+    values = rng.uniform(50, 2000, n)
+    values[7] = np.nan
+    return gpd.GeoDataFrame({'M2_PL_TOT': values}, geometry=geometries, crs=CRS_PARIS)
+
+@pytest.mark.parametrize('agg_method', ['sum', 'count', 'mean', 'max', 'min'])
+@pytest.mark.parametrize('source', ['geodataframe', 'store'])
+def test_partitioned_matches_spatial_join(zones, buildings, tmp_path, agg_method, source):
+    data = buildings if source == 'geodataframe' else BuildingStore(compile_building_store(buildings, tmp_path))
+
+    result = aggregate_partitioned(data, zones, agg_method=agg_method, memory_budget_mb=BUDGET_MB)
+    expected = aggregate_by_geographic_division(buildings, zones, 'M2_PL_TOT', agg_method)
+
+    column = 'M2_PL_TOT_count' if agg_method == 'count' else f'M2_PL_TOT_{agg_method}'
+    assert list(result['zone']) == list(expected['zone'])
+    np.testing.assert_allclose(result[column].to_numpy(), expected[column].fillna(0).to_numpy(), rtol=1e-9)
+    assert result[column].iloc[-1] == 0
+
+def test_budget_splits_into_several_partitions(buildings):
+    vertex_counts = shapely.get_num_coordinates(buildings.geometry.values)
+    partitions = plan_partitions(vertex_counts, BUDGET_MB)
+
+    assert len(partitions) > 5
+    assert partitions[0][0] == 0 and partitions[-1][1] == len(buildings)
+    assert all(stop == start for (_, stop), (start, _) in zip(partitions[:-1], partitions[1:]))
+
+def test_store_slices_match_spatially_ordered_buildings(buildings, tmp_path):
+    store = BuildingStore(compile_building_store(buildings, tmp_path))
+    ordered = buildings.geometry.values[spatial_order(shapely.bounds(buildings.geometry.values))]
+
+    for start, stop in [(0, 10), (37, 181), (550, len(buildings))]:
+        sliced = store.geometries(start, stop)
+        assert len(sliced) == stop - start
+        # Polygons are stored as single-part MultiPolygons
+        assert shapely.equals(sliced, np.asarray(ordered[start:stop], dtype=object)).all()
@@ -0,0 +1,109 @@
+import pytest
+import requests
+
+import portal as portal_module
+from portal import CSV_OPTIONS, DatasetRequest, QueryRejected
+
+def test_csv_export_pushes_where_select_and_limit(portal):
+    df = (DatasetRequest(portal.base_url, 'iris')
+          .where('startswith(depcom, "751")')
+          .select('depcom', 'nom')
+          .limit(2)
+          .read_csv())
+
+    assert len(portal.received) == 1
+    assert portal.received[0]['path'] == '/api/explore/v2.1/catalog/datasets/iris/exports/csv'
+    assert portal.received[0]['params'] == {
+        **CSV_OPTIONS,
+        'select': 'depcom,nom',
+        'where': '(startswith(depcom, "751"))',
+        'limit': '2',
+    }
+    assert list(df.columns) == ['depcom', 'nom']
+    assert df['depcom'].astype(str).tolist() == ['75101', '75102']
+
+def test_geojson_export_combines_clauses(portal):
+    gdf = (DatasetRequest(portal.base_url, 'iris')
+           .where('startswith(depcom, "75")')
+           .within_bbox('geo_shape', bbox=(2.35, 48.80, 2.45, 48.90))
+           .read_geojson())
+
+    params = portal.received[0]['params']
+    assert params['where'] == ('(startswith(depcom, "75")) AND '
+                               '(in_bbox(geo_shape, 48.8, 2.35, 48.9, 2.45))')
+    assert 'select' not in params and 'limit' not in params
+    assert gdf['depcom'].astype(str).tolist() == ['75120']
+    assert gdf.geometry.iloc[0].x == pytest.approx(2.40)
+
+def test_rejected_where_falls_back_to_full_export(portal):
+    df = DatasetRequest(portal.base_url, 'iris').where('unsupported(depcom)').read_csv()
+
+    assert len(portal.received) == 2
+    assert portal.received[0]['params']['where'] == '(unsupported(depcom))'
+    assert portal.received[1]['params'] == CSV_OPTIONS
+    assert len(df) == 5
+
+def test_rejected_select_without_fallback_raises(portal):
+    with pytest.raises(QueryRejected):
+        DatasetRequest(portal.base_url, 'iris').select('missing_field').read_csv(fallback=False)
+    assert len(portal.received) == 1
+
+def test_server_errors_are_not_retried_unfiltered(portal):
+    with pytest.raises(requests.HTTPError):
+        DatasetRequest(portal.base_url, 'broken').where('startswith(depcom, "751")').read_csv()
+    assert len(portal.received) == 1
+
+def test_unfiltered_request_sends_no_filters(portal):
+    request = DatasetRequest(portal.base_url, 'iris').where("depcom='75101'").select('nom')
+
+    assert request.is_filtered()
+    assert not request.unfiltered().is_filtered()
+    df = request.unfiltered().read_csv()
+    assert portal.received[0]['params'] == CSV_OPTIONS
+    assert len(df) == 5
+
+def test_geodataframe_negotiates_format_with_filters(portal):
+    gdf = (DatasetRequest(portal.base_url, 'iris')
+           .where('startswith(depcom, "751")')
+           .select('depcom', 'geo_shape')
+           .read_geodataframe('geo_shape', formats=['fgb', 'csv']))
+
+    assert [request['path'].rsplit('/', 1)[1] for request in portal.received] == ['fgb', 'csv']
+    assert all(request['params']['where'] == '(startswith(depcom, "751"))' for request in portal.received)
+    assert gdf.attrs['export_format'] == 'csv'
+    assert gdf['depcom'].astype(str).tolist() == ['75101', '75102', '75120']
+    assert gdf.crs == 'EPSG:4326'
+
+def test_geodataframe_retries_unfiltered_once_in_a_served_format(portal):
+    gdf = (DatasetRequest(portal.base_url, 'iris')
+           .where('unsupported(depcom)')
+           .read_geodataframe('geo_shape', formats=['fgb', 'geojson', 'csv']))
+
+    formats = [request['path'].rsplit('/', 1)[1] for request in portal.received]
+    assert formats == ['fgb', 'geojson', 'csv', 'geojson']
+    assert 'where' not in portal.received[-1]['params']
+    assert gdf.attrs['export_format'] == 'geojson'
+    assert len(gdf) == 5
+
+def test_geodataframe_without_fallback_does_not_download_everything(portal):
+    with pytest.raises(ValueError, match='No export format'):
+        DatasetRequest(portal.base_url, 'iris').where('unsupported(depcom)').read_geodataframe(
+            'geo_shape', formats=['geojson', 'csv'], fallback=False)
+    assert all('where' in request['params'] for request in portal.received)
+
+def test_geodataframe_skips_parquet_without_engine(portal, monkeypatch):
+    monkeypatch.setitem(portal_module.FORMAT_MODULES, 'parquet', ('missing_parquet_engine',))
+
+    gdf = DatasetRequest(portal.base_url, 'iris').where('startswith(depcom, "751")').read_geodataframe('geo_shape')
+
+    formats = [request['path'].rsplit('/', 1)[1] for request in portal.received]
+    assert 'parquet' not in formats
+    assert formats == ['fgb', 'geojson']
+    assert gdf.attrs['export_format'] == 'geojson'
+
+def test_geodataframe_requests_parquet_with_engine(portal, monkeypatch):
+    monkeypatch.setitem(portal_module.FORMAT_MODULES, 'parquet', ('json',))
+
+    DatasetRequest(portal.base_url, 'iris').read_geodataframe('geo_shape', formats=['parquet', 'csv'])
+
+    assert [request['path'].rsplit('/', 1)[1] for request in portal.received] == ['parquet', 'csv']
@@ -0,0 +1,163 @@
+"""
+Tiled Union Engine
+Union of large polygon sets (water, rail, green-space masks): geometries are exploded to
+polygon parts and deduplicated by WKB, the city is cut into tiles, the parts are clipped to
+their tiles and each tile is unioned in a parallel worker,
+and the result is returned either as one geometry or as a tiled GeoDataFrame usable by
+tile-local overlays
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from concurrent.futures import ProcessPoolExecutor
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+DEFAULT_TILE_SIZE = 1000.0  # metres
+
+def dedupe_geometries(geometries):
+    """
+    Drop missing, empty and duplicate geometries.
+
+    Geometries are normalized before hashing their WKB, so copies differing only in
+    ring orientation or starting vertex are recognised as duplicates.
+
+    Parameters:
+    -----------
+    geometries : array-like of shapely geometries
+
+    Returns:
+    --------
+    ndarray of shapely geometries
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    geometries = geometries[~(pd.isna(geometries) | shapely.is_empty(geometries))]
+    if len(geometries) == 0:
+        return geometries
+    keys = shapely.to_wkb(shapely.normalize(geometries))
+    _, first = np.unique(keys, return_index=True)
+    return geometries[np.sort(first)]
+
+def _union_tile(tile_wkb):
+    """
+    Union the pieces of one tile, already clipped to it (runs in a worker process).
+
+    Returns:
+    --------
+    bytes
+        WKB of the tile union
+    """
+    return shapely.to_wkb(shapely.union_all(shapely.from_wkb(tile_wkb)))
+
+def _clip_to_tiles(parts, boxes, tile_idx, part_idx):
+    """
+    Clip candidate parts to their tiles, keeping polygonal pieces only.
+
+    Returns:
+    --------
+    tuple of ndarray
+        (tile index, piece) pairs; edge contacts (lines, points) are dropped
+    """
+    clipped = shapely.intersection(parts[part_idx], boxes[tile_idx])
+    pieces, source = shapely.get_parts(clipped, return_index=True)
+    # Collections may hold multipolygons
+    pieces, nested = shapely.get_parts(pieces, return_index=True)
+    source = source[nested]
+    keep = (shapely.get_type_id(pieces) == shapely.GeometryType.POLYGON) & (shapely.area(pieces) > 0)
+    return tile_idx[source[keep]], pieces[keep]
+
+def _tile_grid(total_bounds, tile_size):
+    xmin, ymin, xmax, ymax = total_bounds
+    xs = np.arange(np.floor(xmin / tile_size) * tile_size, xmax, tile_size)
+    ys = np.arange(np.floor(ymin / tile_size) * tile_size, ymax, tile_size)
+    x0, y0 = np.meshgrid(xs, ys)
+    x0, y0 = x0.ravel(), y0.ravel()
+    return np.column_stack([x0, y0, x0 + tile_size, y0 + tile_size])
+
+def tiled_union(geometries, tile_size=DEFAULT_TILE_SIZE, workers=None, as_tiles=False, crs=CRS_PARIS):
+    """
+    Union polygons tile by tile, in parallel.
+
+    Parameters:
+    -----------
+    geometries : array-like of shapely geometries
+        Polygons in a projected CRS
+    tile_size : float, default 1000
+        Tile side in CRS units
+    workers : int, optional
+        Worker processes (default: one per CPU; 1 runs in-process)
+    as_tiles : bool, default False
+        Return a GeoDataFrame with one (clipped) union per non-empty tile instead of a
+        single merged geometry
+    crs : str
+        CRS of the geometries (for the tiled GeoDataFrame)
+
+    Returns:
+    --------
+    shapely geometry or GeoDataFrame
+    """
+    empty = gpd.GeoDataFrame({'tile_id': []}, geometry=[], crs=crs) if as_tiles else shapely.Polygon()
+    # Multipolygons (e.g. the whole Seine) are split so each tile only gets the parts it needs
+    parts = dedupe_geometries(shapely.get_parts(dedupe_geometries(geometries)))
+    if len(parts) == 0:
+        return empty
+
+    tiles = _tile_grid(shapely.total_bounds(parts), tile_size)
+    boxes = shapely.box(*tiles.T)
+    tile_idx, part_idx = shapely.STRtree(parts).query(boxes, predicate='intersects')
+    tile_idx, pieces = _clip_to_tiles(parts, boxes, tile_idx, part_idx)
+    if len(tile_idx) == 0:
+        return empty
+
+    # Group clipped pieces by tile (WKB is cheap to ship to worker processes)
+    wkb = shapely.to_wkb(pieces)
+    order = np.argsort(tile_idx, kind='stable')
+    tile_idx, wkb = tile_idx[order], wkb[order]
+    used_tiles, starts = np.unique(tile_idx, return_index=True)
+    jobs = np.split(wkb, starts[1:])
+
+    print(f"  Tiled union: {len(parts)} unique polygon parts over {len(jobs)} tiles of {tile_size:g} m")
+    if workers == 1 or len(jobs) == 1:
+        results = [_union_tile(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_union_tile, jobs))
+
+    pieces = shapely.from_wkb(results)
+    keep = ~shapely.is_empty(pieces)
+    if as_tiles:
+        return gpd.GeoDataFrame({'tile_id': used_tiles[keep]}, geometry=pieces[keep], crs=crs)
+    # Tile pieces only touch along tile edges, so the final merge is cheap
+    return shapely.union_all(pieces[keep])
+
+def union_layers(layers, tile_size=DEFAULT_TILE_SIZE, workers=None, as_tiles=False, crs=CRS_PARIS):
+    """
+    Union several layers into one mask GeoDataFrame.
+
+    Parameters:
+    -----------
+    layers : list of GeoDataFrame
+        Layers in crs (empty layers are skipped)
+    tile_size, workers, as_tiles :
+        See tiled_union
+    crs : str
+        Projected CRS of the layers
+
+    Returns:
+    --------
+    GeoDataFrame
+        One feature (or one feature per tile with as_tiles), like the former unary_union masks
+    """
+    arrays = [layer.geometry.values for layer in layers if layer is not None and not layer.empty]
+    if not arrays:
+        return gpd.GeoDataFrame({'geometry': []}, crs=crs)
+    geometries = np.concatenate([np.asarray(array, dtype=object) for array in arrays])
+
+    result = tiled_union(geometries, tile_size=tile_size, workers=workers, as_tiles=as_tiles, crs=crs)
+    if as_tiles:
+        return result
+    if result.is_empty:
+        return gpd.GeoDataFrame({'geometry': []}, crs=crs)
+    return gpd.GeoDataFrame({'geometry': [result]}, crs=crs)
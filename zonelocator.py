@@ -0,0 +1,232 @@
+"""
+Zone Locator
+Answers "which arrondissement/quartier/IRIS contains this coordinate and what is its density?"
+for single points and vectorized batches, using the GeoDataParis layers and the density
+tables produced by extract_density_dataframes
+"""
+
+import numpy as np
+import pandas as pd
+import shapely
+from pathlib import Path
+
+from geoclass import GeoDataParis
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+CRS_WGS84 = 'EPSG:4326'
+LEVELS = ['arrondissements', 'quartiers', 'iris']
+
+# Identifier column of each density table, and candidate identifier columns of the layers
+LEVEL_KEYS = {
+    'arrondissements': ('arr_id', ['c_ar']),
+    'quartiers': ('quartier_id', ['c_qu', 'c_qa']),
+    'iris': ('iris_code', ['CODE_IRIS', 'iris_code', 'code_iris']),
+}
+
+DENSITY_METRICS = ['density_m2_m2_raw', 'density_m2_m2_corrected', 'density_m2_m2_ultra_corrected']
+
+_transformers = {}
+
+def to_lambert93(x, y, crs=CRS_WGS84):
+    """
+    Convert coordinate arrays to Lambert 93.
+
+    Parameters:
+    -----------
+    x, y : array-like
+        Coordinates (longitude/latitude for WGS84)
+    crs : str
+        CRS of the input coordinates
+
+    Returns:
+    --------
+    tuple of ndarray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if crs in (CRS_PARIS, 2154):
+        return x, y
+    if crs not in _transformers:
+        from pyproj import Transformer
+        _transformers[crs] = Transformer.from_crs(crs, CRS_PARIS, always_xy=True)
+    return _transformers[crs].transform(x, y)
+
+class ZoneLocator:
+    """
+    Point and batch lookup of zones and density metrics over the three geographic levels.
+
+    Layers are reprojected to Lambert 93 and indexed once (STRtree over prepared
+    polygons); zone identifiers and density metrics are stored as NumPy arrays
+    aligned with the layer rows, so a batch lookup is one tree query, one
+    vectorized predicate and a few array gathers per level.
+    """
+
+    def __init__(self, geo=None, density_tables=None, levels=None, metrics=None):
+        """
+        Parameters:
+        -----------
+        geo : GeoDataParis, optional
+            Layer manager (a new one is created and the needed layers loaded if not provided)
+        density_tables : dict, optional
+            {level: DataFrame} as produced by extract_density_dataframes (no metrics if not provided)
+        levels : list of str, optional
+            Levels to index (default: all three)
+        metrics : list of str, optional
+            Density table columns returned with each lookup
+        """
+        self.geo = geo if geo is not None else GeoDataParis()
+        self.levels = list(levels) if levels is not None else list(LEVELS)
+        self.metrics = list(metrics) if metrics is not None else list(DENSITY_METRICS)
+        density_tables = density_tables or {}
+
+        self.indexes = {}
+        self.zone_ids = {}
+        self.zone_metrics = {}
+        for level in self.levels:
+            getattr(self.geo, f"load_{level}")()
+            index = self.geo.get_index(level, CRS_PARIS)
+            shapely.prepare(index.geometries)
+            self.indexes[level] = index
+
+            layer = self.geo.get_projected(level, CRS_PARIS)
+            self.zone_ids[level], self.zone_metrics[level] = self._align_table(
+                level, layer, density_tables.get(level)
+            )
+
+    def _align_table(self, level, layer, table):
+        """
+        Align a density table with the layer rows.
+
+        Returns:
+        --------
+        tuple
+            (object array of zone ids, {metric: float array})
+        """
+        table_key, layer_candidates = LEVEL_KEYS[level]
+        layer_key = next((col for col in layer_candidates if col in layer.columns), None)
+        zone_ids = (layer[layer_key].to_numpy(dtype=object) if layer_key is not None
+                    else np.arange(len(layer)).astype(object))
+
+        metrics = {}
+        if table is None:
+            return zone_ids, metrics
+
+        if layer_key is not None and table_key in table.columns:
+            # Match on identifiers (compared as strings: CSV round-trips change dtypes)
+            positions = pd.Index(table[table_key].astype(str)).get_indexer(pd.Index(zone_ids).astype(str))
+        elif len(table) == len(layer):
+            positions = np.arange(len(layer))
+        else:
+            print(f"Warning: cannot align {level} density table with the layer, metrics skipped")
+            return zone_ids, metrics
+
+        for metric in self.metrics:
+            if metric in table.columns:
+                values = table[metric].to_numpy(dtype=np.float64)
+                metrics[metric] = np.where(positions >= 0, values[np.clip(positions, 0, None)], np.nan)
+        return zone_ids, metrics
+
+    @classmethod
+    def from_csv(cls, data_dir='data', geo=None, levels=None, metrics=None):
+        """
+        Build a locator from the CSV tables written by extract_density_dataframes.
+
+        Parameters:
+        -----------
+        data_dir : str
+            Directory containing paris_{level}_complete.csv
+        geo : GeoDataParis, optional
+            Layer manager
+        levels, metrics : list of str, optional
+            See ZoneLocator
+
+        Returns:
+        --------
+        ZoneLocator
+        """
+        levels = list(levels) if levels is not None else list(LEVELS)
+        tables = {}
+        for level in levels:
+            path = Path(data_dir) / f"paris_{level}_complete.csv"
+            if path.exists():
+                tables[level] = pd.read_csv(path)
+        return cls(geo=geo, density_tables=tables, levels=levels, metrics=metrics)
+
+    def _zone_positions(self, level, points):
+        """
+        Position of the zone containing each point (-1 outside every zone).
+
+        Points on a shared boundary are assigned to the first matching zone.
+        """
+        input_idx, zone_idx = self.indexes[level].query(points, predicate='intersects')
+        positions = np.full(len(points), -1, dtype=np.int64)
+        if len(input_idx):
+            order = np.lexsort((zone_idx, input_idx))
+            input_idx, zone_idx = input_idx[order], zone_idx[order]
+            unique_inputs, first = np.unique(input_idx, return_index=True)
+            positions[unique_inputs] = zone_idx[first]
+        return positions
+
+    def locate_batch(self, x, y, crs=CRS_WGS84, chunk_size=1_000_000):
+        """
+        Look up zones and density metrics for arrays of coordinates.
+
+        Parameters:
+        -----------
+        x, y : array-like
+            Coordinates (longitude/latitude in WGS84 by default)
+        crs : str
+            CRS of the coordinates ('EPSG:4326' or 'EPSG:2154')
+        chunk_size : int
+            Number of points processed at once (bounds memory use)
+
+        Returns:
+        --------
+        DataFrame
+            One row per point: {level}_id and {level}_{metric} for each level
+        """
+        x, y = to_lambert93(x, y, crs)
+        x = np.atleast_1d(x)
+        y = np.atleast_1d(y)
+        n = len(x)
+
+        positions = {level: np.empty(n, dtype=np.int64) for level in self.levels}
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            points = shapely.points(x[start:stop], y[start:stop])
+            for level in self.levels:
+                positions[level][start:stop] = self._zone_positions(level, points)
+
+        columns = {}
+        for level in self.levels:
+            pos = positions[level]
+            inside = pos >= 0
+            safe = np.where(inside, pos, 0)
+
+            ids = np.full(n, None, dtype=object)
+            ids[inside] = self.zone_ids[level][pos[inside]]
+            columns[f"{level}_id"] = ids
+
+            for metric, values in self.zone_metrics[level].items():
+                columns[f"{level}_{metric}"] = np.where(inside, values[safe], np.nan)
+
+        return pd.DataFrame(columns)
+
+    def locate(self, x, y, crs=CRS_WGS84):
+        """
+        Look up the zones and density metrics of a single coordinate.
+
+        Parameters:
+        -----------
+        x, y : float
+            Coordinate (longitude/latitude in WGS84 by default)
+        crs : str
+            CRS of the coordinate
+
+        Returns:
+        --------
+        dict
+            {level}_id and {level}_{metric} for each level (None/NaN outside Paris)
+        """
+        return self.locate_batch([x], [y], crs=crs, chunk_size=1).iloc[0].to_dict()
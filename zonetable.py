@@ -0,0 +1,161 @@
+"""
+Zone Table
+Index-aligned table of the zones of one geographic level: every zone gets a stable integer
+id (its position in the layer), the geometry is stored once, and metrics are NumPy columns
+aligned on the zone ids, so adding a metric is an array assignment instead of a merge
+"""
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+# Constants
+CRS_PARIS = 'EPSG:2154'  # Lambert 93
+
+def safe_ratio(numerator, denominator):
+    """
+    Element-wise ratio with infinite and undefined results set to 0.
+
+    Same convention as calculate_density and calculate_corrected_density.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.asarray(numerator, dtype=np.float64) / np.asarray(denominator, dtype=np.float64)
+    return np.nan_to_num(ratio, nan=0.0, posinf=0.0, neginf=0.0)
+
+class ZoneTable:
+    """
+    Zones of one level with metrics as aligned NumPy columns.
+
+    Zone id i is row i of the source layer; the layer's own index is kept as labels,
+    so pandas Series indexed like the layer are aligned once on assignment. Layer
+    attributes are columns too, and the geometry array is shared, never copied.
+    """
+
+    def __init__(self, geo_divisions_gdf, level=None):
+        """
+        Parameters:
+        -----------
+        geo_divisions_gdf : GeoDataFrame
+            Geographic divisions of one level
+        level : str, optional
+            Level name ('arrondissements', 'quartiers', 'iris')
+        """
+        self.level = level
+        self.labels = geo_divisions_gdf.index
+        self.zone_id = np.arange(len(geo_divisions_gdf))
+        self.geometry_name = geo_divisions_gdf.geometry.name
+        self.geometry = geo_divisions_gdf.geometry.values
+        self.crs = geo_divisions_gdf.crs
+        self.source_columns = list(geo_divisions_gdf.columns)
+        self.columns = {col: geo_divisions_gdf[col].to_numpy() for col in geo_divisions_gdf.columns
+                        if col != self.geometry_name}
+        self._areas = {}
+
+    def __len__(self):
+        return len(self.zone_id)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __setitem__(self, name, values):
+        self.columns[name] = self._align(values)
+
+    def _align(self, values):
+        """Turn a scalar, a labelled Series or an array into a column aligned on zone ids."""
+        if isinstance(values, pd.Series):
+            if not values.index.equals(self.labels):
+                values = values.reindex(self.labels)
+            return values.to_numpy()
+        if np.ndim(values) == 0:
+            return np.full(len(self), values)
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError(f"Expected {len(self)} values (one per zone), got {len(values)}")
+        return values
+
+    def area(self, crs=CRS_PARIS):
+        """
+        Zone areas in a projected CRS (computed once per CRS).
+
+        Returns:
+        --------
+        ndarray
+            Area in CRS units² per zone id
+        """
+        key = str(crs)
+        if key not in self._areas:
+            geometry = gpd.GeoSeries(self.geometry, crs=self.crs)
+            if crs is not None and self.crs != crs:
+                geometry = geometry.to_crs(crs)
+            self._areas[key] = shapely.area(np.asarray(geometry.values, dtype=object))
+        return self._areas[key]
+
+    def positions(self, labels):
+        """
+        Zone ids of layer index labels (-1 for unknown labels).
+
+        Returns:
+        --------
+        ndarray of int
+        """
+        return self.labels.get_indexer(labels)
+
+    def aggregate(self, name, zone_idx, values=None):
+        """
+        Add a column summing values over (zone id, value) pairs, e.g. from a spatial join.
+
+        Parameters:
+        -----------
+        name : str
+            Column name
+        zone_idx : ndarray of int
+            Zone id of each pair
+        values : ndarray, optional
+            Value of each pair (NaN counts as 0); None counts pairs
+
+        Returns:
+        --------
+        ndarray
+            The new column
+        """
+        weights = None if values is None else np.nan_to_num(np.asarray(values, dtype=np.float64))
+        self.columns[name] = np.bincount(zone_idx, weights=weights, minlength=len(self))
+        return self.columns[name]
+
+    def to_frame(self, columns=None):
+        """
+        Metrics as a DataFrame indexed by the layer labels (no geometry).
+
+        Returns:
+        --------
+        DataFrame
+        """
+        columns = [col for col in (columns or self.columns) if col != self.geometry_name]
+        return pd.DataFrame({col: self.columns[col] for col in columns}, index=self.labels)
+
+    def to_geodataframe(self, columns=None):
+        """
+        GeoDataFrame of the zones with the requested columns, sharing the stored geometry.
+
+        Parameters:
+        -----------
+        columns : list of str, optional
+            Columns in output order (default: the layer columns, then added metrics);
+            the geometry column may appear in the list to fix its position, otherwise
+            it comes last
+
+        Returns:
+        --------
+        GeoDataFrame
+        """
+        if columns is None:
+            columns = self.source_columns + [col for col in self.columns if col not in self.source_columns]
+        columns = list(columns)
+        if self.geometry_name not in columns:
+            columns.append(self.geometry_name)
+        data = {col: self.geometry if col == self.geometry_name else self.columns[col] for col in columns}
+        return gpd.GeoDataFrame(data, geometry=self.geometry_name, crs=self.crs, index=self.labels)